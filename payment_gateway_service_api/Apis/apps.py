@@ -4,3 +4,25 @@ from django.apps import AppConfig
 class ApisConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'Apis'
+
+    def ready(self):
+        from django.conf import settings
+        from django.db.backends.signals import connection_created
+        from . import memory_diagnostics, tracing
+        from .slow_queries import install_slow_query_log
+
+        if settings.TRACING_EXPORTER == "file":
+            exporter = tracing.JsonLinesFileExporter(settings.TRACING_FILE_PATH)
+        else:
+            exporter = tracing.InMemoryCollector(settings.TRACING_MAX_SPANS)
+        tracing.configure(settings.TRACING_SAMPLE_RATE, exporter)
+
+        connection_created.connect(
+            install_slow_query_log, dispatch_uid="Apis.slow_queries"
+        )
+        connection_created.connect(
+            memory_diagnostics.track_connection,
+            dispatch_uid="Apis.memory_diagnostics",
+        )
+        if settings.TRACEMALLOC_ENABLED:
+            memory_diagnostics.start(settings.TRACEMALLOC_FRAMES)
@@ -0,0 +1,147 @@
+import threading
+import time
+from typing import Dict, Optional, Tuple
+from django.conf import settings
+from django.core.cache import caches
+from drf_spectacular.extensions import OpenApiAuthenticationExtension
+from rest_framework import exceptions
+from rest_framework.authentication import BaseAuthentication, get_authorization_header
+from rest_framework.permissions import BasePermission
+from .models import MerchantAPIKey, hash_api_key
+import logging
+
+logger = logging.getLogger(__name__)
+
+API_KEY_KEYWORD = "Api-Key"
+_VERSION_CACHE_KEY = "merchant-api-keys:revocation-version"
+
+
+class VerifiedKeyCache:
+    """
+    Keys verified against the database in this process, by digest, so that
+    steady-state authentication makes no query. An entry is trusted for
+    API_KEY_CACHE_TTL_SECONDS and only while the revocation version it was
+    verified under is current. The version lives in a Django cache, read at most
+    every API_KEY_VERSION_CHECK_SECONDS, so with a shared backend a revocation
+    reaches every worker within seconds.
+    """
+
+    def __init__(self):
+        self._entries: Dict[str, Tuple[MerchantAPIKey, float, int]] = {}
+        self._lock = threading.Lock()
+        self._version = 0
+        self._version_checked_at = float("-inf")
+
+    def version(self) -> int:
+        now = time.monotonic()
+        if now - self._version_checked_at >= settings.API_KEY_VERSION_CHECK_SECONDS:
+            self._version = (
+                caches[settings.API_KEY_CACHE_ALIAS].get(_VERSION_CACHE_KEY) or 0
+            )
+            self._version_checked_at = now
+        return self._version
+
+    def get(self, digest: str) -> Optional[MerchantAPIKey]:
+        entry = self._entries.get(digest)
+        if entry is None:
+            return None
+        api_key, verified_at, version = entry
+        if (
+            time.monotonic() - verified_at >= settings.API_KEY_CACHE_TTL_SECONDS
+            or version != self.version()
+        ):
+            self._entries.pop(digest, None)
+            return None
+        return api_key
+
+    def put(self, digest: str, api_key: MerchantAPIKey):
+        with self._lock:
+            if len(self._entries) >= settings.API_KEY_CACHE_MAX_ENTRIES:
+                self._entries.clear()
+            self._entries[digest] = (api_key, time.monotonic(), self.version())
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._version_checked_at = float("-inf")
+
+
+verified_keys = VerifiedKeyCache()
+
+
+def bump_revocation_version():
+    """Invalidates the keys verified by every process sharing the cache."""
+    cache = caches[settings.API_KEY_CACHE_ALIAS]
+    cache.add(_VERSION_CACHE_KEY, 0, timeout=None)
+    try:
+        cache.incr(_VERSION_CACHE_KEY)
+    except ValueError:
+        # Evicted between add() and incr(): any other value invalidates too
+        cache.set(_VERSION_CACHE_KEY, 1, timeout=None)
+    verified_keys.clear()
+
+
+class MerchantAPIKeyAuthentication(BaseAuthentication):
+    """
+    Authenticates requests carrying `Authorization: Api-Key <key>` as the
+    key's merchant, with the MerchantAPIKey as request.auth.
+    """
+
+    def authenticate(self, request):
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != API_KEY_KEYWORD.lower().encode():
+            return None
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed("Invalid API key header.")
+        try:
+            raw_key = auth[1].decode()
+        except UnicodeError:
+            raise exceptions.AuthenticationFailed("Invalid API key.")
+
+        digest = hash_api_key(raw_key)
+        api_key = verified_keys.get(digest)
+        if api_key is None:
+            api_key = (
+                MerchantAPIKey.objects.select_related("merchant")
+                .filter(key_hash=digest, revoked_at__isnull=True)
+                .first()
+            )
+            if api_key is None or not api_key.merchant.is_active:
+                raise exceptions.AuthenticationFailed("Invalid or revoked API key.")
+            verified_keys.put(digest, api_key)
+        return api_key.merchant, api_key
+
+    def authenticate_header(self, request):
+        return API_KEY_KEYWORD
+
+
+class MerchantAPIKeyScheme(OpenApiAuthenticationExtension):
+    """Documents MerchantAPIKeyAuthentication as an apiKey security scheme."""
+
+    target_class = MerchantAPIKeyAuthentication
+    name = "MerchantAPIKey"
+
+    def get_security_definition(self, auto_schema):
+        return {
+            "type": "apiKey",
+            "in": "header",
+            "name": "Authorization",
+            "description": f"Merchant API key, sent as `{API_KEY_KEYWORD} <key>`.",
+        }
+
+
+class HasAPIKeyScope(BasePermission):
+    """
+    Allows requests authenticated with a MerchantAPIKey granted every scope in
+    the view's `required_scopes`.
+    """
+
+    message = "The API key is missing a required scope."
+
+    def has_permission(self, request, view):
+        api_key = request.auth
+        if not isinstance(api_key, MerchantAPIKey):
+            return False
+        return all(
+            api_key.has_scope(scope) for scope in getattr(view, "required_scopes", ())
+        )
@@ -1,10 +1,14 @@
 from dataclasses import dataclass
+from typing import Optional, Sequence
 import uuid
 from .payments_ports_and_adapters import (
     GatewayProcessPaymentResponseDTO,
     PaymentDetails,
     PaymentGatewayInterface,
 )
+from .pre_checks_ports_and_adapters import PaymentAttemptDTO, PaymentPreCheckInterface
+from .resilience import Deadline, GatewayRetryableError
+from .tracing import traced
 from .repositories_ports_and_adapters import (
     ClientRepositoryInterface,
     CreateTransactionDTO,
@@ -26,6 +30,8 @@ class InitialPaymentRequestDTO:
     - payment_gateway_name: The name of the payment gateway to use.
     - is_permanent: Whether the payment is for a permanent service or not.
     - amount: The amount to be charged for the payment.
+    - deadline: Optional deadline by which the gateway call must have finished.
+    - bank_token: Optional token of the bank account to charge.
     """
 
     client_email: str
@@ -33,6 +39,8 @@ class InitialPaymentRequestDTO:
     payment_gateway_name: str
     is_permanent: bool = False
     amount: float = 0.0
+    deadline: Optional[Deadline] = None
+    bank_token: Optional[str] = None
 
 
 @dataclass
@@ -56,16 +64,21 @@ class PaymentServiceCore:
     based on webhook data from payment gateways.
     It uses the PaymentGatewayInterface to interact with different payment gateways
     and the ClientRepositoryInterface to manage client data and transactions.
+    Payments go through the PaymentPreCheckInterface pre-checks, in order,
+    before a transaction is created for them.
     """
 
     def __init__(
         self,
         gateway_adapter: PaymentGatewayInterface,
         client_repository: ClientRepositoryInterface,
+        pre_checks: Sequence[PaymentPreCheckInterface] = (),
     ):
         self.gateway_adapter = gateway_adapter
         self.client_repository = client_repository
+        self.pre_checks = pre_checks
 
+    @traced
     def initiate_payment(
         self, request_data: InitialPaymentRequestDTO
     ) -> InitiatedPaymentResponseDTO:
@@ -75,16 +88,27 @@ class PaymentServiceCore:
         client = self.client_repository.get_client_by_email(request_data.client_email)
 
         if not client:
-            logger.error(f"Client with email {request_data.client_email} not found")
+            logger.error("Client with email %s not found", request_data.client_email)
             raise ValueError(f"Client with email {request_data.client_email} not found")
 
         latest_order_id, amount = (
             self.client_repository.get_latest_order_and_amount_for_client(client.id)
         )
         if not latest_order_id:
-            logger.error(f"No order found for client {client.id}")
+            logger.error("No order found for client %s", client.id)
             raise ValueError(f"No order found for client {client.id}")
 
+        if self.pre_checks:
+            attempt = PaymentAttemptDTO(
+                client_id=client.id,
+                amount=amount,
+                currency=request_data.currency,
+                gateway_name=request_data.payment_gateway_name,
+                bank_token=request_data.bank_token,
+            )
+            for pre_check in self.pre_checks:
+                pre_check.evaluate(attempt)
+
         transaction_ref = str(uuid.uuid4())
 
         create_transaction_dto = CreateTransactionDTO(
@@ -106,11 +130,23 @@ class PaymentServiceCore:
             client_email=client.email,
             client_name=client.full_name,
             is_permanent=request_data.is_permanent,
+            deadline=request_data.deadline,
         )
+        if request_data.bank_token:
+            payment_details_for_gateway.bank_token = request_data.bank_token
 
-        gateway_response_dto = self.gateway_adapter.process_payment(
-            payment_details_for_gateway
-        )
+        try:
+            gateway_response_dto = self.gateway_adapter.process_payment(
+                payment_details_for_gateway
+            )
+        except GatewayRetryableError:
+            # The gateway was never called, e.g. its bulkhead was full: the
+            # transaction will not be settled by a webhook or the sweeper
+            self.client_repository.update_payment_transaction(
+                initial_transaction.id,
+                UpdateTransactionDTO(id=initial_transaction.id, status="failed"),
+            )
+            raise
 
         update_transaction_dto = UpdateTransactionDTO(
             id=initial_transaction.id,
@@ -126,6 +162,7 @@ class PaymentServiceCore:
             gateway_response=gateway_response_dto,
         )
 
+    @traced
     def update_model_from_webhook(self, request_data):
         """
         Handles updating data using information gotten from the payment gateway webhook.
@@ -143,7 +180,8 @@ class PaymentServiceCore:
         )
         if not transaction_model_id:
             logger.error(
-                f"Transaction with reference {gateway_webhook_data.internal_transaction_ref} not found"
+                "Transaction with reference %s not found",
+                gateway_webhook_data.internal_transaction_ref,
             )
             raise ValueError(
                 f"Transaction with reference {gateway_webhook_data.internal_transaction_ref} not found"
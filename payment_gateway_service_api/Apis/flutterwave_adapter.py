@@ -0,0 +1,156 @@
+from typing import Any, Dict, Optional
+from django.conf import settings
+from . import json_codec, webhook_schemas
+from .payments_ports_and_adapters import (
+    GatewayProcessPaymentResponseDTO,
+    GatewayVerificationDTO,
+    GatewayWebhookEventDTO,
+    PaymentDetails,
+    PaymentGatewayInterface,
+    normalize_gateway_status,
+)
+from .structured_logging import log_payload
+from .tracing import traced
+from .transport import gateway_request
+from .verification_cache import cached_verification
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class FlutterWaveAdapter(PaymentGatewayInterface):
+    """
+    Implements the PaymentGatewayInterface for the FlutterWave payment gateway.
+
+    Unique behavior:
+    - Processes payments by sending requests to FlutterWave's payment endpoint.
+    - Handles webhook notifications specific to FlutterWave's format.
+    - Verifies transactions using FlutterWave's verification API.
+    """
+
+    gateway_name = "FlutterWave"
+
+    def __init__(self, secret_key: Optional[str] = None):
+        self.headers = {
+            "accept": "application/json",
+            "Authorization": f"Bearer {secret_key or settings.FLUTTERWAVE_SECRET_KEY}",
+            "Content-Type": "application/json",
+        }
+
+    @traced
+    def process_payment(
+        self, payment_details: PaymentDetails
+    ) -> GatewayProcessPaymentResponseDTO:
+        """
+        Processes a payment using FlutterWave's API.
+        This method takes payment details, constructs a request to FlutterWave's API,
+        and returns a DTO with the result of the payment attempt.
+        :param payment_details: PaymentDetails object containing all necessary information for the payment.
+        :return: GatewayProcessPaymentResponseDTO containing the success status, gateway reference, and raw response data.
+        """
+        endpoint = settings.FLUTTERWAVE_BANK_TRANSFER_ENDPOINT
+        payload = {
+            "amount": payment_details.amount,
+            "email": payment_details.client_email,
+            "currency": payment_details.currency,
+            "tx_ref": payment_details.tx_ref,
+            "full_name": payment_details.client_name,
+            "is_permanent": payment_details.is_permanent,
+        }
+        response = gateway_request(
+            self.gateway_name,
+            "POST",
+            endpoint,
+            deadline=payment_details.deadline,
+            json=payload,
+            headers=self.headers,
+        )
+        data = json_codec.response_json(response)
+        success = data.get("status") == "success"
+        gateway_ref = None
+        if success:
+            meta = data.get("meta", {})
+            authorization = meta.get("Authorization", {})
+            gateway_ref = authorization.get("transfer_reference")
+            logger.info(
+                "Processing payment: success=%s, gateway_ref=%s", success, gateway_ref
+            )
+            log_payload(
+                logger, "create-payment", "FlutterWave charge response: %s", data
+            )
+
+        return GatewayProcessPaymentResponseDTO(
+            success=success, gateway_ref=gateway_ref, raw_response=data
+        )
+
+    @traced
+    def handle_webhook(self, request_data) -> GatewayWebhookEventDTO:
+        """
+        Handles webhook notifications from FlutterWave.
+        This method processes the incoming webhook data, extracts relevant information,
+        and returns a DTO with the transaction details.
+        :param request_data: Raw data from the webhook notification.
+        :return: GatewayWebhookEventDTO containing the internal transaction reference, gateway reference, new status, and amount.
+        :raises ValueError: If the event does not match the gateway's webhook schema.
+        """
+
+        data = webhook_schemas.validate_webhook(self.gateway_name, request_data)
+        transaction_ref = data["tx_ref"]
+        status = data["status"]
+        gateway_ref = data.get("flw_ref") or ""
+        amount = data["amount"]
+        logger.info(
+            "Handling webhook: tx_ref=%s, status=%s, gateway_ref=%s, amount=%s",
+            transaction_ref,
+            status,
+            gateway_ref,
+            amount,
+        )
+        return GatewayWebhookEventDTO(
+            internal_transaction_ref=transaction_ref,
+            gateway_ref=gateway_ref,
+            new_status=status,
+            amount=amount,
+        )
+
+    @traced
+    @cached_verification
+    def verify_payment(self, transaction_ref: str) -> dict:
+        """
+        Verifies a payment using FlutterWave's verification API.
+        This method constructs a request to FlutterWave's verification endpoint
+        and returns the verification result.
+        :param transaction_ref: The transaction reference to verify.
+        :return: A dictionary containing the verification result.
+        """
+        endpoint = settings.FLUTTERWAVE_VERIFICATION_URL.format(
+            transaction_ref=transaction_ref
+        )
+        response = gateway_request(
+            self.gateway_name,
+            "GET",
+            endpoint,
+            idempotent=True,
+            headers=self.headers,
+        )
+        return json_codec.response_json(response)
+
+    def parse_verification(
+        self, transaction_ref: str, raw_verification: Dict[str, Any]
+    ) -> GatewayVerificationDTO:
+        """
+        Parses a response from FlutterWave's verification API.
+        The charges endpoint returns a list of charges for the tx_ref, the most recent first.
+        :param transaction_ref: The transaction reference that was verified.
+        :param raw_verification: The raw verification response.
+        :return: GatewayVerificationDTO with the normalized status.
+        """
+        data = raw_verification.get("data") or {}
+        if isinstance(data, list):
+            data = data[0] if data else {}
+        return GatewayVerificationDTO(
+            internal_transaction_ref=data.get("tx_ref") or transaction_ref,
+            status=normalize_gateway_status(data.get("status") or "pending"),
+            gateway_ref=data.get("flw_ref"),
+            amount=data.get("amount"),
+        )
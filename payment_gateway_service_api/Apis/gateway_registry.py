@@ -0,0 +1,26 @@
+from typing import Dict, List, Type
+from django.conf import settings
+from django.utils.module_loading import import_string
+from .payments_ports_and_adapters import PaymentGatewayInterface
+
+_gateway_classes: Dict[str, Type[PaymentGatewayInterface]] = {}
+
+
+def gateway_names() -> List[str]:
+    """Names of the gateways of PAYMENT_GATEWAYS, as stored on PaymentTransaction."""
+    return list(settings.PAYMENT_GATEWAYS)
+
+
+def get_gateway_class(gateway_name: str) -> Type[PaymentGatewayInterface]:
+    """
+    The adapter class PAYMENT_GATEWAYS names for a gateway. Its module is imported
+    on first use, so a worker only loads the adapters of gateways it talks to,
+    and the class is then kept for the life of the process.
+    """
+    path = settings.PAYMENT_GATEWAYS.get(gateway_name)
+    if path is None:
+        raise ValueError(f"Unknown payment gateway {gateway_name}")
+    gateway_class = _gateway_classes.get(path)
+    if gateway_class is None:
+        gateway_class = _gateway_classes[path] = import_string(path)
+    return gateway_class
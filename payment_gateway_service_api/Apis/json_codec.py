@@ -0,0 +1,78 @@
+from typing import Any, Union
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+import json
+import requests
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+# JSON for the API and gateway responses goes through orjson when it is
+# installed and the standard library otherwise, in which case the parser and
+# renderer below behave exactly like DRF's own.
+HAS_ORJSON = orjson is not None
+
+# DRF's encoder covers the types orjson does not, e.g. Decimal and lazy strings
+_drf_encoder = JSONEncoder()
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    """Decodes JSON; raises ValueError (json.JSONDecodeError) on invalid input."""
+    if HAS_ORJSON:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(obj: Any) -> bytes:
+    """Encodes to compact UTF-8 JSON, serializing types like DRF's encoder."""
+    if HAS_ORJSON:
+        return orjson.dumps(
+            obj, default=_drf_encoder.default, option=orjson.OPT_NON_STR_KEYS
+        )
+    return json.dumps(
+        obj, cls=JSONEncoder, ensure_ascii=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def response_json(response: requests.Response) -> Any:
+    """
+    Decodes the body of a gateway response, like response.json() does, raising
+    requests.exceptions.JSONDecodeError when it is not JSON.
+    """
+    try:
+        return loads(response.content)
+    except ValueError as e:
+        raise requests.exceptions.JSONDecodeError(str(e), response.text, 0) from e
+
+
+class FastJSONParser(JSONParser):
+    """JSONParser decoding with orjson when available."""
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if not HAS_ORJSON:
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except ValueError as exc:
+            raise ParseError(f"JSON parse error - {exc}")
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer encoding with orjson when available. Indented output, as
+    requested by the browsable API or an `indent` media type parameter, is left
+    to DRF.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if not HAS_ORJSON or self.get_indent(
+            accepted_media_type, renderer_context or {}
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b""
+        return dumps(data)
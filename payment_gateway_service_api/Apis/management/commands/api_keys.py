@@ -0,0 +1,60 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from Apis.models import API_KEY_SCOPES, MerchantAPIKey
+
+
+class Command(BaseCommand):
+    """
+    Issues, lists and revokes merchant API keys. The raw key is only printed
+    when it is issued.
+    """
+
+    help = "Manage merchant API keys."
+
+    def add_arguments(self, parser):
+        subparsers = parser.add_subparsers(dest="action", required=True)
+
+        issue = subparsers.add_parser("issue", help="Issue a key for a merchant.")
+        issue.add_argument("email", help="Email of the merchant account.")
+        issue.add_argument("--name", default="default")
+        issue.add_argument(
+            "--scope",
+            action="append",
+            dest="scopes",
+            choices=API_KEY_SCOPES,
+            help="Scope to grant; repeat for several. Defaults to every scope.",
+        )
+
+        listing = subparsers.add_parser("list", help="List keys, newest first.")
+        listing.add_argument("--email", help="Only the keys of this merchant.")
+
+        revoke = subparsers.add_parser("revoke", help="Revoke a key.")
+        revoke.add_argument("prefix", help="Public prefix of the key.")
+
+    def handle(self, *args, **options):
+        if options["action"] == "issue":
+            try:
+                merchant = get_user_model().objects.get(email=options["email"])
+                api_key, raw_key = MerchantAPIKey.issue(
+                    merchant, options["name"], options["scopes"] or API_KEY_SCOPES
+                )
+            except (get_user_model().DoesNotExist, ValueError) as e:
+                raise CommandError(str(e)) from e
+            self.stdout.write(f"Issued {api_key}. Store it now, it is not kept:")
+            self.stdout.write(raw_key)
+        elif options["action"] == "list":
+            api_keys = MerchantAPIKey.objects.select_related("merchant")
+            if options["email"]:
+                api_keys = api_keys.filter(merchant__email=options["email"])
+            for api_key in api_keys:
+                state = "active" if api_key.is_active else "revoked"
+                self.stdout.write(
+                    f"{api_key.prefix}  {api_key.merchant.email}  {api_key.name}  "
+                    f"scopes={','.join(api_key.scopes)}  {state}"
+                )
+        else:
+            api_key = MerchantAPIKey.objects.filter(prefix=options["prefix"]).first()
+            if api_key is None:
+                raise CommandError(f"No API key with prefix {options['prefix']}")
+            api_key.revoke()
+            self.stdout.write(f"Revoked {api_key}")
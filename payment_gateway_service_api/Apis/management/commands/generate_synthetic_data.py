@@ -0,0 +1,306 @@
+import itertools
+import random
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import UNUSABLE_PASSWORD_PREFIX
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from clients.utils import Address
+from Orders.models import OrderItem, Orders, PaymentTransaction
+from Products.models import Products
+
+ClientModel = get_user_model()
+
+CITIES = [
+    ("Lagos", "Lagos", "NG"),
+    ("Abuja", "FCT", "NG"),
+    ("Port Harcourt", "Rivers", "NG"),
+    ("Ibadan", "Oyo", "NG"),
+    ("Enugu", "Enugu", "NG"),
+    ("Accra", "Greater Accra", "GH"),
+    ("Nairobi", "Nairobi", "KE"),
+    ("Kumasi", "Ashanti", "GH"),
+]
+FIRST_NAMES = ["Ada", "Chidi", "Emeka", "Ngozi", "Tunde", "Kemi", "Bola", "Femi"]
+LAST_NAMES = ["Okafor", "Adeyemi", "Eze", "Bello", "Okoro", "Balogun", "Nwosu"]
+
+
+@contextmanager
+def explicit_timestamps(*models):
+    """
+    Lets generated rows keep their own created_at/updated_at, which auto_now and
+    auto_now_add would otherwise overwrite with the current time.
+    """
+    fields = [
+        (field, field.auto_now, field.auto_now_add)
+        for model in models
+        for field in model._meta.concrete_fields
+        if getattr(field, "auto_now", False) or getattr(field, "auto_now_add", False)
+    ]
+    for field, _, _ in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in fields:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def parse_mix(value: str) -> tuple:
+    """
+    Parses "success=0.85,failed=0.08,pending=0.07" into the names and cumulative
+    weights taken by random.choices.
+    """
+    try:
+        pairs = [part.split("=") for part in value.split(",")]
+        names = [name.strip() for name, _ in pairs]
+        weights = [float(weight) for _, weight in pairs]
+    except ValueError as e:
+        raise CommandError(f"Invalid mix {value!r}: {str(e)}") from e
+    return names, list(itertools.accumulate(weights))
+
+
+class Command(BaseCommand):
+    """
+    Generates a large, reproducible dataset for benchmarks and index decisions.
+
+    Orders per client follow a power law (a few clients order a lot, most order
+    a little), product popularity follows a Zipf distribution, and payment
+    statuses and gateways follow configurable mixes. Rows are written with
+    batched bulk_create, one transaction per batch of clients. bulk_create sends
+    no signals, so order totals are computed while generating.
+    """
+
+    help = "Generate synthetic clients, products, orders and payment transactions."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--clients", type=int, default=100000)
+        parser.add_argument("--products", type=int, default=5000)
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument(
+            "--orders-alpha",
+            type=float,
+            default=1.3,
+            help="Pareto exponent of orders per client; lower is more skewed.",
+        )
+        parser.add_argument("--max-orders-per-client", type=int, default=500)
+        parser.add_argument(
+            "--no-order-rate",
+            type=float,
+            default=0.2,
+            help="Fraction of clients without any order.",
+        )
+        parser.add_argument("--mean-items-per-order", type=float, default=2.5)
+        parser.add_argument(
+            "--product-zipf", type=float, default=1.1, help="Zipf exponent."
+        )
+        parser.add_argument(
+            "--status-mix", default="success=0.85,failed=0.08,pending=0.07"
+        )
+        parser.add_argument("--gateway-mix", default="PayStack=0.55,FlutterWave=0.45")
+        parser.add_argument(
+            "--retry-rate",
+            type=float,
+            default=0.1,
+            help="Fraction of orders with a failed attempt before the final one.",
+        )
+        parser.add_argument("--days", type=int, default=365)
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.rng = random.Random(options["seed"])
+        self.now = timezone.now()
+        self.status_mix = parse_mix(options["status_mix"])
+        self.gateway_mix = parse_mix(options["gateway_mix"])
+        self.email_prefix = f"synthetic-{options['seed']}-"
+        self.ref_counter = itertools.count()
+        if ClientModel.objects.filter(email__startswith=self.email_prefix).exists():
+            raise CommandError(
+                f"Data for seed {options['seed']} already exists; use another --seed."
+            )
+
+        started = time.monotonic()
+        self.unusable_password = f"{UNUSABLE_PASSWORD_PREFIX}synthetic"
+        with explicit_timestamps(ClientModel, Products, Orders, PaymentTransaction):
+            self.products = self.create_products()
+            counts = {"clients": 0, "orders": 0, "items": 0, "transactions": 0}
+            batch_size = options["batch_size"]
+            for first in range(0, options["clients"], batch_size):
+                last = min(first + batch_size, options["clients"])
+                with transaction.atomic():
+                    batch_counts = self.create_client_batch(first, last)
+                for key, value in batch_counts.items():
+                    counts[key] += value
+                self.stdout.write(
+                    f"{last}/{options['clients']} clients, {counts['orders']} orders, "
+                    f"{counts['items']} items, {counts['transactions']} transactions "
+                    f"({time.monotonic() - started:.0f}s)"
+                )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Generated {len(self.products)} products and {counts} "
+                f"in {time.monotonic() - started:.0f}s"
+            )
+        )
+
+    def random_time(self, after=None):
+        start = after or self.now - timedelta(days=self.options["days"])
+        span = (self.now - start).total_seconds()
+        return start + timedelta(seconds=self.rng.random() * span)
+
+    def create_products(self):
+        rng = self.rng
+        products = []
+        for index in range(self.options["products"]):
+            created_at = self.random_time()
+            products.append(
+                Products(
+                    name=f"Synthetic product {self.options['seed']}-{index}",
+                    quantity=rng.randint(0, 1000),
+                    description="Synthetic product",
+                    price=Decimal(
+                        min(rng.lognormvariate(8.5, 1.0), 9_999_999)
+                    ).quantize(Decimal("0.01")),
+                    is_available=rng.random() > 0.05,
+                    created_at=created_at,
+                    updated_at=created_at,
+                )
+            )
+        products = Products.objects.bulk_create(
+            products, batch_size=self.options["batch_size"]
+        )
+        # Zipf popularity: the product at rank r is picked with weight 1 / r^s
+        weights = [
+            1 / (rank ** self.options["product_zipf"])
+            for rank in range(1, len(products) + 1)
+        ]
+        self.product_cum_weights = list(itertools.accumulate(weights))
+        return products
+
+    def orders_for_client(self) -> int:
+        if self.rng.random() < self.options["no_order_rate"]:
+            return 0
+        return min(
+            int(self.rng.paretovariate(self.options["orders_alpha"])),
+            self.options["max_orders_per_client"],
+        )
+
+    def pick(self, mix: tuple) -> str:
+        names, cum_weights = mix
+        return self.rng.choices(names, cum_weights=cum_weights)[0]
+
+    def create_client_batch(self, first: int, last: int) -> dict:
+        rng = self.rng
+        addresses = []
+        for _ in range(first, last):
+            city, state, country = rng.choice(CITIES)
+            addresses.append(
+                Address(
+                    street_line1=f"{rng.randint(1, 400)} Synthetic Street",
+                    city=city,
+                    state_province=state,
+                    postal_code=f"{rng.randint(100000, 999999)}",
+                    country=country,
+                )
+            )
+        addresses = Address.objects.bulk_create(addresses)
+
+        clients = []
+        for index, address in zip(range(first, last), addresses):
+            created_at = self.random_time()
+            clients.append(
+                ClientModel(
+                    email=f"{self.email_prefix}{index}@example.com",
+                    password=self.unusable_password,
+                    first_name=rng.choice(FIRST_NAMES),
+                    last_name=rng.choice(LAST_NAMES),
+                    house_address=address,
+                    date_joined=created_at,
+                    created_at=created_at,
+                    updated_at=created_at,
+                )
+            )
+        clients = ClientModel.objects.bulk_create(clients)
+
+        orders, order_lines = [], []
+        for client in clients:
+            for _ in range(self.orders_for_client()):
+                created_at = self.random_time(after=client.created_at)
+                item_count = 1 + int(
+                    rng.expovariate(
+                        1 / max(self.options["mean_items_per_order"] - 1, 0.01)
+                    )
+                )
+                products = rng.choices(
+                    self.products, cum_weights=self.product_cum_weights, k=item_count
+                )
+                lines = [
+                    (product, min(1 + int(rng.expovariate(1.0)), 10))
+                    for product in products
+                ]
+                # A failed attempt may precede the one that settles the order
+                attempts = (
+                    ["failed"] if rng.random() < self.options["retry_rate"] else []
+                )
+                attempts.append(self.pick(self.status_mix))
+                orders.append(
+                    Orders(
+                        client_id=client.pk,
+                        status=attempts[-1],
+                        total_amount=sum(p.price * q for p, q in lines),
+                        shipping_address_id=client.house_address_id,
+                        billing_address_id=client.house_address_id,
+                        created_at=created_at,
+                        updated_at=created_at,
+                    )
+                )
+                order_lines.append((lines, attempts))
+        orders = Orders.objects.bulk_create(
+            orders, batch_size=self.options["batch_size"]
+        )
+
+        items, transactions = [], []
+        for order, (lines, attempts) in zip(orders, order_lines):
+            items.extend(
+                OrderItem(order_id=order.pk, product_id=product.pk, quantity=quantity)
+                for product, quantity in lines
+            )
+            attempted_at = order.created_at
+            for status in attempts:
+                attempted_at += timedelta(seconds=rng.randint(5, 900))
+                transactions.append(self.transaction(order, status, attempted_at))
+        OrderItem.objects.bulk_create(items, batch_size=self.options["batch_size"])
+        PaymentTransaction.objects.bulk_create(
+            transactions, batch_size=self.options["batch_size"]
+        )
+        return {
+            "clients": len(clients),
+            "orders": len(orders),
+            "items": len(items),
+            "transactions": len(transactions),
+        }
+
+    def transaction(self, order, status: str, created_at) -> PaymentTransaction:
+        gateway_name = self.pick(self.gateway_mix)
+        ref = uuid.UUID(int=self.rng.getrandbits(128), version=4)
+        gateway_ref = None
+        if status != "pending":
+            gateway_ref = f"{gateway_name[:3].upper()}-{self.options['seed']}-{next(self.ref_counter)}"
+        updated_at = created_at + timedelta(seconds=self.rng.randint(1, 600))
+        return PaymentTransaction(
+            order_id=order.pk,
+            client_id=order.client_id,
+            amount=order.total_amount,
+            status=status,
+            transaction_ref=str(ref),
+            gateway_ref=gateway_ref,
+            gateway_name=gateway_name,
+            created_at=created_at,
+            updated_at=min(updated_at, self.now) if status != "pending" else created_at,
+        )
@@ -0,0 +1,93 @@
+from django.core.management.base import BaseCommand, CommandError
+from Apis import profiling
+
+
+class Command(BaseCommand):
+    """
+    Lists, shows and diffs the request profiles written by ProfilingMiddleware,
+    and issues signed X-Profile header values.
+    """
+
+    help = "Inspect stored request profiles."
+
+    def add_arguments(self, parser):
+        subparsers = parser.add_subparsers(dest="action", required=True)
+
+        subparsers.add_parser("list", help="List stored profiles, newest first.")
+
+        show = subparsers.add_parser("show", help="Show the top frames of a profile.")
+        show.add_argument("profile_id")
+        show.add_argument("--limit", type=int, default=25)
+        show.add_argument(
+            "--sort", choices=("cumulative", "self"), default="cumulative"
+        )
+        show.add_argument(
+            "--sql", action="store_true", help="Also list the SQL queries."
+        )
+
+        diff = subparsers.add_parser(
+            "diff", help="Show the frames whose time changed most between profiles."
+        )
+        diff.add_argument("before")
+        diff.add_argument("after")
+        diff.add_argument("--limit", type=int, default=25)
+        diff.add_argument(
+            "--sort", choices=("cumulative", "self"), default="cumulative"
+        )
+
+        token = subparsers.add_parser(
+            "token", help="Print a signed X-Profile header value."
+        )
+        token.add_argument(
+            "--mode", choices=profiling.PROFILING_MODES, default="cprofile"
+        )
+
+    def handle(self, *args, **options):
+        store = profiling.get_profile_store()
+        try:
+            if options["action"] == "list":
+                for summary in store.list():
+                    self.stdout.write(
+                        f"{summary['id']}  {summary['method']} {summary['path']} "
+                        f"status={summary['status']} mode={summary['mode']} "
+                        f"duration={summary['duration']:.3f}s sql={summary['sql_count']}"
+                    )
+            elif options["action"] == "show":
+                profile = store.load(options["profile_id"])
+                self.stdout.write(
+                    f"{profile['method']} {profile['path']} "
+                    f"duration={profile['duration']:.3f}s trace_id={profile['trace_id']}"
+                )
+                self.stdout.write(
+                    f"{'cumulative':>12} {'self':>10} {'calls':>8}  function"
+                )
+                for frame in profiling.top_frames(
+                    profile, options["limit"], options["sort"]
+                ):
+                    calls = frame["calls"] if frame["calls"] is not None else "-"
+                    self.stdout.write(
+                        f"{frame['cumulative']:>12.6f} {frame['self']:>10.6f} "
+                        f"{calls:>8}  {frame['function']}"
+                    )
+                if options["sql"]:
+                    for query in profile["sql"]:
+                        self.stdout.write(f"{query['duration']:.6f}s  {query['sql']}")
+            elif options["action"] == "diff":
+                rows = profiling.diff_frames(
+                    store.load(options["before"]),
+                    store.load(options["after"]),
+                    options["limit"],
+                    options["sort"],
+                )
+                self.stdout.write(
+                    f"{'before':>10} {'after':>10} {'delta':>10}  function"
+                )
+                for row in rows:
+                    self.stdout.write(
+                        f"{row['before']:>10.6f} {row['after']:>10.6f} "
+                        f"{row['delta']:>+10.6f}  {row['function']}"
+                    )
+            else:
+                self.stdout.write(profiling.issue_token(options["mode"]))
+        except ValueError as e:
+            raise CommandError(str(e)) from e
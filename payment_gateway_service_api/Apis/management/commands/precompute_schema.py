@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from Apis import openapi_schema
+
+
+class Command(BaseCommand):
+    """
+    Generates the OpenAPI schema served at /api/schema/ for the current code
+    version, e.g. at deploy time, so no worker has to generate it.
+    """
+
+    help = "Precompute the OpenAPI schema for the current code version."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--keep-stale",
+            action="store_true",
+            help="Keep the schema files of other code versions.",
+        )
+
+    def handle(self, *args, **options):
+        version = openapi_schema.code_version()
+        path = openapi_schema.write_schema(
+            openapi_schema.generate_schema(), version, prune=not options["keep_stale"]
+        )
+        openapi_schema.clear_cache()
+        self.stdout.write(f"Wrote the OpenAPI schema of version {version} to {path}")
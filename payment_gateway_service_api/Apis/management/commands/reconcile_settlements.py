@@ -0,0 +1,124 @@
+import json
+import sys
+import time
+from decimal import Decimal, InvalidOperation
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime
+from Apis.reconciliation import (
+    RECONCILIATION_KEY_FIELDS,
+    ReconciliationSummaryDTO,
+    reconcile_settlement_file,
+)
+
+
+class Command(BaseCommand):
+    """
+    Reconciles a gateway settlement report against PaymentTransaction rows.
+    The settlement file is streamed and merge-joined against the database, so it
+    must be sorted by its reference column. Mismatches are written as JSON lines.
+    """
+
+    help = "Reconcile a gateway settlement file (CSV or JSON lines) against payment transactions."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "settlement_file", help="Path to the settlement file, or - for stdin."
+        )
+        parser.add_argument("--format", choices=["csv", "jsonl"], default=None)
+        parser.add_argument(
+            "--key",
+            choices=RECONCILIATION_KEY_FIELDS,
+            default="transaction_ref",
+            help="PaymentTransaction field the settlement reference column maps to.",
+        )
+        parser.add_argument(
+            "--gateway", default=None, help="Only reconcile this gateway_name."
+        )
+        parser.add_argument("--since", default=None, help="ISO datetime, inclusive.")
+        parser.add_argument("--until", default=None, help="ISO datetime, exclusive.")
+        parser.add_argument("--ref-column", default="reference")
+        parser.add_argument("--amount-column", default="amount")
+        parser.add_argument("--status-column", default="status")
+        parser.add_argument(
+            "--amount-scale",
+            default="1",
+            help="Divisor applied to settlement amounts, e.g. 100 for amounts in kobo.",
+        )
+        parser.add_argument(
+            "--output", default=None, help="Write mismatches here instead of stdout."
+        )
+
+    def handle(self, *args, **options):
+        path = options["settlement_file"]
+        file_format = options["format"] or (
+            "jsonl" if path.endswith((".jsonl", ".json")) else "csv"
+        )
+
+        created_after = self._parse_datetime(options["since"])
+        created_before = self._parse_datetime(options["until"])
+        amount_scale = self._parse_amount_scale(options["amount_scale"])
+        summary = ReconciliationSummaryDTO()
+
+        try:
+            stream = (
+                sys.stdin if path == "-" else open(path, newline="", encoding="utf-8")
+            )
+        except OSError as e:
+            raise CommandError(f"Could not open settlement file: {e}") from e
+        output = (
+            open(options["output"], "w", encoding="utf-8")
+            if options["output"]
+            else self.stdout
+        )
+        started = time.perf_counter()
+        try:
+            mismatches = reconcile_settlement_file(
+                stream,
+                file_format=file_format,
+                key_field=options["key"],
+                gateway_name=options["gateway"],
+                created_after=created_after,
+                created_before=created_before,
+                ref_column=options["ref_column"],
+                amount_column=options["amount_column"],
+                status_column=options["status_column"],
+                amount_scale=amount_scale,
+                summary=summary,
+            )
+            for mismatch in mismatches:
+                output.write(json.dumps(mismatch.to_dict()) + "\n")
+        except ValueError as e:
+            raise CommandError(str(e)) from e
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+            if output is not self.stdout:
+                output.close()
+
+        elapsed = time.perf_counter() - started
+        rows_per_second = (summary.settlement_rows + summary.database_rows) / max(
+            elapsed, 1e-9
+        )
+        self.stderr.write(
+            f"Reconciled {summary.settlement_rows} settlement rows against "
+            f"{summary.database_rows} transactions in {elapsed:.2f}s "
+            f"({rows_per_second:,.0f} rows/s): matched={summary.matched} "
+            f"mismatches={dict(summary.mismatches)}"
+        )
+
+    def _parse_datetime(self, value):
+        if not value:
+            return None
+        parsed = parse_datetime(value)
+        if parsed is None:
+            raise CommandError(f"Invalid datetime: {value}")
+        return parsed
+
+    def _parse_amount_scale(self, value):
+        try:
+            amount_scale = Decimal(value)
+        except InvalidOperation:
+            amount_scale = None
+        if amount_scale is None or not amount_scale.is_finite() or amount_scale <= 0:
+            raise CommandError(f"Invalid amount scale: {value}")
+        return amount_scale
@@ -0,0 +1,45 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from Apis.gateway_registry import gateway_names
+from Apis.services import get_gateway_adapter
+from Apis.sweeper import PendingTransactionSweeper
+
+
+class Command(BaseCommand):
+    """
+    Runs the pending transaction sweeper.
+    Several instances can run at once; each claims its own batches of stale rows.
+    """
+
+    help = "Verify stale pending payment transactions against their gateways."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once", action="store_true", help="Run a single sweep and exit."
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=settings.SWEEPER_INTERVAL_SECONDS,
+            help="Seconds to sleep between sweeps that did not fill a batch.",
+        )
+
+    def handle(self, *args, **options):
+        gateway_adapters = {
+            gateway_name: get_gateway_adapter(gateway_name)
+            for gateway_name in gateway_names()
+        }
+        sweeper = PendingTransactionSweeper.from_settings(gateway_adapters)
+        try:
+            if options["once"]:
+                result = sweeper.sweep_once()
+                self.stdout.write(
+                    f"claimed={result.claimed} verified={result.verified} "
+                    f"updated={result.updated} errors={result.errors}"
+                )
+            else:
+                sweeper.run(options["interval"])
+        except KeyboardInterrupt:
+            self.stdout.write("Sweeper stopped.")
+        finally:
+            sweeper.shutdown()
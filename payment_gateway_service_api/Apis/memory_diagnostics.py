@@ -0,0 +1,114 @@
+import os
+import threading
+import tracemalloc
+import weakref
+from typing import Any, Dict, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Allocation sites left out of the report. They are skipped in the compared
+# statistics: filtering the snapshots themselves takes far longer.
+_IGNORED_FILES = {tracemalloc.__file__, "<frozen importlib._bootstrap>", "<unknown>"}
+
+_baseline: Optional[tracemalloc.Snapshot] = None
+_baseline_lock = threading.Lock()
+_connections = weakref.WeakSet()
+
+
+def start(frames: int = 10):
+    """Starts tracemalloc, if needed, and takes the baseline snapshot."""
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+        logger.info("tracemalloc started with %s frames per allocation", frames)
+    reset_baseline()
+
+
+def reset_baseline():
+    """Allocation sites are reported as growth since the latest baseline."""
+    global _baseline
+    if not tracemalloc.is_tracing():
+        return
+    with _baseline_lock:
+        _baseline = tracemalloc.take_snapshot()
+
+
+def track_connection(sender, connection, **kwargs):
+    """connection_created receiver keeping a weak reference to every connection."""
+    _connections.add(connection)
+
+
+def open_db_connections() -> int:
+    """Number of database connections opened in this process and not yet closed."""
+    return sum(1 for wrapper in list(_connections) if wrapper.connection is not None)
+
+
+def open_file_count() -> Optional[int]:
+    """Number of open file descriptors, None where /proc is not available."""
+    try:
+        return len(os.listdir("/proc/self/fd"))
+    except OSError:
+        return None
+
+
+def rss_bytes() -> Optional[int]:
+    """Current resident set size, None where /proc is not available."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+def top_allocations(limit: int) -> List[Dict[str, Any]]:
+    """
+    Allocation sites whose memory grew the most since the baseline, with the
+    stack that allocated it, most recent call last.
+    """
+    if _baseline is None:
+        return []
+    snapshot = tracemalloc.take_snapshot()
+    with _baseline_lock:
+        stats = snapshot.compare_to(_baseline, "traceback")
+    sites = []
+    for stat in stats:
+        if len(sites) >= limit:
+            break
+        if stat.size_diff <= 0 or stat.traceback[-1].filename in _IGNORED_FILES:
+            continue
+        sites.append(
+            {
+                "size_diff_bytes": stat.size_diff,
+                "size_bytes": stat.size,
+                "count_diff": stat.count_diff,
+                # Formatted without source lines: reading them would fill the
+                # linecache and show up as growth in the next report
+                "traceback": [
+                    f"{frame.filename}:{frame.lineno}" for frame in stat.traceback
+                ],
+            }
+        )
+    return sites
+
+
+def memory_report(limit: int = 25) -> Dict[str, Any]:
+    """
+    Memory, file and database connection usage of this process.
+    - traced_*_bytes: Python allocations seen by tracemalloc, None when it is off.
+    - top_allocations: Growth per allocation site since the baseline.
+    """
+    tracing = tracemalloc.is_tracing()
+    traced_current, traced_peak = (
+        tracemalloc.get_traced_memory() if tracing else (None, None)
+    )
+    return {
+        "pid": os.getpid(),
+        "tracemalloc": tracing,
+        "traced_current_bytes": traced_current,
+        "traced_peak_bytes": traced_peak,
+        "rss_bytes": rss_bytes(),
+        "open_files": open_file_count(),
+        "db_connections": open_db_connections(),
+        "threads": threading.active_count(),
+        "top_allocations": top_allocations(limit) if tracing else [],
+    }
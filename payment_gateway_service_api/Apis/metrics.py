@@ -0,0 +1,412 @@
+import atexit
+import glob
+import json
+import os
+import threading
+import uuid
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence, Tuple
+from django.conf import settings
+import logging
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows, where Gunicorn does not run
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+)
+QUERY_COUNT_BUCKETS = (1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+LAG_BUCKETS = (0.1, 0.5, 1.0, 5.0, 15.0, 60.0, 300.0, 900.0, 3600.0)
+
+# Totals of exited workers, kept in the multiprocess directory
+AGGREGATE_FILENAME = "metrics-aggregate.json"
+# Metric types whose values outlive the process that recorded them; any other
+# type, such as a gauge, is dropped with its process
+CUMULATIVE_TYPES = ("counter", "histogram")
+
+
+class MetricsRegistry:
+    """Holds every metric of this process and snapshots them for exposition."""
+
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+
+    def snapshot(self) -> Dict[str, dict]:
+        return {name: metric.snapshot() for name, metric in self._metrics.items()}
+
+
+REGISTRY = MetricsRegistry()
+
+
+class Counter:
+    """Monotonic counter with labels. Exposed as `<name>` of type counter."""
+
+    kind = "counter"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        registry: MetricsRegistry = REGISTRY,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def inc(self, *labelvalues, amount: float = 1.0):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0.0) + amount
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            samples = {json.dumps(key): value for key, value in self._values.items()}
+        return {
+            "type": self.kind,
+            "help": self.documentation,
+            "labelnames": self.labelnames,
+            "samples": samples,
+        }
+
+
+class Histogram:
+    """
+    Histogram with fixed buckets and labels.
+    An observation is a bisect plus three additions under a lock, which keeps it
+    cheap enough for the request path.
+    """
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+        registry: MetricsRegistry = REGISTRY,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # Per label set: counts per bucket (+Inf last), then sum
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def observe(self, value: float, *labelvalues):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            values = self._values.get(labelvalues)
+            if values is None:
+                values = self._values[labelvalues] = [0] * (len(self.buckets) + 2)
+            values[index] += 1
+            values[-1] += value
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            samples = {
+                json.dumps(key): list(value) for key, value in self._values.items()
+            }
+        return {
+            "type": self.kind,
+            "help": self.documentation,
+            "labelnames": self.labelnames,
+            "buckets": self.buckets,
+            "samples": samples,
+        }
+
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Latency of HTTP requests per view.",
+    ("view", "method", "status"),
+)
+REQUEST_DB_QUERIES = Histogram(
+    "http_request_db_queries",
+    "Number of database queries per request.",
+    ("view",),
+    buckets=QUERY_COUNT_BUCKETS,
+)
+REQUEST_DB_TIME = Histogram(
+    "http_request_db_duration_seconds",
+    "Total database time per request.",
+    ("view",),
+)
+GATEWAY_CALL_LATENCY = Histogram(
+    "gateway_call_duration_seconds",
+    "Latency of calls to payment gateways, including retries.",
+    ("gateway", "outcome"),
+)
+WEBHOOK_LAG = Histogram(
+    "webhook_processing_lag_seconds",
+    "Time between a gateway event being created and its webhook being processed.",
+    ("gateway",),
+    buckets=LAG_BUCKETS,
+)
+BULKHEAD_REJECTIONS = Counter(
+    "gateway_bulkhead_rejections_total",
+    "Gateway calls rejected by a bulkhead.",
+    ("gateway",),
+)
+WEBHOOKS_REJECTED = Counter(
+    "webhooks_rejected_total",
+    "Webhooks rejected before parsing for a missing or invalid signature.",
+)
+
+REQUESTS_RATE_LIMITED = Counter(
+    "requests_rate_limited_total",
+    "Requests denied with a 429 because a token bucket was empty.",
+    ("scope",),
+)
+
+PAYMENTS_REJECTED = Counter(
+    "payments_rejected_total",
+    "Payments rejected by a velocity rule before reaching a gateway.",
+    ("rule",),
+)
+
+
+def merge_snapshots(snapshots: List[Dict[str, dict]]) -> Dict[str, dict]:
+    """Sums the snapshots of several processes into one."""
+    merged: Dict[str, dict] = {}
+    for snapshot in snapshots:
+        for name, metric in snapshot.items():
+            target = merged.setdefault(name, {**metric, "samples": {}})
+            for key, value in metric["samples"].items():
+                if key not in target["samples"]:
+                    target["samples"][key] = value
+                elif metric["type"] == "histogram":
+                    target["samples"][key] = [
+                        a + b for a, b in zip(target["samples"][key], value)
+                    ]
+                else:
+                    target["samples"][key] += value
+    return merged
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labelnames, labelvalues, extra: Optional[Tuple[str, str]] = None):
+    pairs = list(zip(labelnames, labelvalues))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def render_text(snapshot: Dict[str, dict]) -> str:
+    """Renders a snapshot in the Prometheus text exposition format (0.0.4)."""
+    lines = []
+    for name, metric in sorted(snapshot.items()):
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['type']}")
+        labelnames = metric["labelnames"]
+        for key, value in sorted(metric["samples"].items()):
+            labelvalues = json.loads(key)
+            if metric["type"] == "counter":
+                lines.append(f"{name}{_format_labels(labelnames, labelvalues)} {value}")
+                continue
+            cumulative = 0
+            for bound, count in zip(list(metric["buckets"]) + ["+Inf"], value[:-1]):
+                cumulative += count
+                labels = _format_labels(labelnames, labelvalues, ("le", str(bound)))
+                lines.append(f"{name}_bucket{labels} {cumulative}")
+            labels = _format_labels(labelnames, labelvalues)
+            lines.append(f"{name}_sum{labels} {value[-1]}")
+            lines.append(f"{name}_count{labels} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+class MultiProcessWriter:
+    """
+    File-backed multiprocess mode.
+    Every worker process periodically writes its snapshot to
+    <directory>/metrics-<pid>-<nonce>.json; the /metrics view sums all files,
+    so the numbers cover every Gunicorn worker whichever one serves the scrape.
+    The nonce is drawn when the process starts writing, so a new worker given
+    the pid of an old one never takes over its file. When a worker exits its
+    counters and histograms are folded into metrics-aggregate.json, see
+    mark_process_dead, so the totals never go down when workers are recycled.
+    """
+
+    def __init__(self, directory: str, interval: float):
+        self.directory = directory
+        self.interval = interval
+        self._pid = None
+        self._nonce = None
+        self._stopped = False
+        self._lock = threading.Lock()
+
+    @property
+    def path(self) -> str:
+        return os.path.join(self.directory, f"metrics-{self._pid}-{self._nonce}.json")
+
+    def ensure_started(self):
+        """Starts the flush thread once per process, including after a fork."""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._nonce = uuid.uuid4().hex[:12]
+            self._stopped = False
+            os.makedirs(self.directory, exist_ok=True)
+            thread = threading.Thread(
+                target=self._run, name="metrics-flusher", daemon=True
+            )
+            thread.start()
+            atexit.register(self.stop)
+
+    def _run(self):
+        event = threading.Event()
+        while not event.wait(self.interval):
+            try:
+                self.flush()
+            except OSError as e:
+                logger.warning("Could not write metrics snapshot: %s", e)
+
+    def flush(self):
+        with self._lock:
+            if self._stopped or self._pid != os.getpid():
+                return
+            _write_snapshot(self.path, REGISTRY.snapshot())
+
+    def stop(self):
+        """
+        Writes a last snapshot as the process exits, then folds it into the
+        aggregate.
+        """
+        with self._lock:
+            if self._stopped or self._pid != os.getpid():
+                return
+            self._stopped = True
+            try:
+                _write_snapshot(self.path, REGISTRY.snapshot())
+            except OSError as e:
+                logger.warning("Could not write metrics snapshot: %s", e)
+        mark_process_dead(os.getpid(), self.directory)
+
+    def collect(self) -> Dict[str, dict]:
+        self.ensure_started()
+        self.flush()
+        # Shared with other scrapes, so that a fold is never seen half done
+        with _aggregate_lock(self.directory, fcntl.LOCK_SH if fcntl else None):
+            paths = glob.glob(os.path.join(self.directory, "metrics-*.json"))
+            snapshots = [_read_snapshot(path) for path in paths]
+        return merge_snapshots([snapshot for snapshot in snapshots if snapshot])
+
+
+def _write_snapshot(path: str, snapshot: Dict[str, dict]):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(snapshot, f)
+    os.replace(tmp_path, path)
+
+
+def _read_snapshot(path: str) -> Optional[Dict[str, dict]]:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning("Skipping unreadable metrics file %s: %s", path, e)
+        return None
+
+
+@contextmanager
+def _aggregate_lock(directory: str, operation: Optional[int]):
+    with open(os.path.join(directory, "metrics-aggregate.lock"), "a") as lock_file:
+        if operation is not None:
+            fcntl.flock(lock_file, operation)
+        yield
+
+
+def mark_process_dead(pid: int, directory: Optional[str] = None):
+    """
+    Folds the counters and histograms of a process that exited into
+    metrics-aggregate.json and removes its files, as prometheus_client does.
+    Call it from Gunicorn's child_exit hook, which also runs for workers that
+    were killed before they could do it themselves:
+
+        def child_exit(server, worker):
+            from Apis.metrics import mark_process_dead
+
+            mark_process_dead(worker.pid)
+    """
+    directory = directory or settings.METRICS_MULTIPROC_DIR
+    if not directory:
+        return
+    # The worker itself and the Gunicorn master may both fold the same files
+    with _aggregate_lock(directory, fcntl.LOCK_EX if fcntl else None):
+        paths = glob.glob(os.path.join(directory, f"metrics-{pid}-*"))
+        if not paths:
+            return
+        aggregate_path = os.path.join(directory, AGGREGATE_FILENAME)
+        snapshots = [
+            _read_snapshot(path)
+            for path in [aggregate_path] + paths
+            if path.endswith(".json")
+        ]
+        aggregate = {
+            name: metric
+            for name, metric in merge_snapshots(
+                [snapshot for snapshot in snapshots if snapshot]
+            ).items()
+            if metric["type"] in CUMULATIVE_TYPES
+        }
+        _write_snapshot(aggregate_path, aggregate)
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+_writer = (
+    MultiProcessWriter(
+        settings.METRICS_MULTIPROC_DIR, settings.METRICS_FLUSH_INTERVAL_SECONDS
+    )
+    if settings.METRICS_MULTIPROC_DIR
+    else None
+)
+
+
+def ensure_multiprocess_writer():
+    if _writer is not None:
+        _writer.ensure_started()
+
+
+def collect() -> Dict[str, dict]:
+    """Returns the metrics of this process, or of all workers in multiprocess mode."""
+    if _writer is not None:
+        return _writer.collect()
+    return REGISTRY.snapshot()
@@ -0,0 +1,213 @@
+import random
+import time
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.handlers.exception import convert_exception_to_response
+from django.db import connection
+from django.utils.module_loading import import_string
+from . import metrics, profiling, tracing
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class RequestMetricsMiddleware:
+    """
+    Records request latency per view, and the number of database queries and
+    the total database time of each request.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics.ensure_multiprocess_writer()
+        db_stats = [0, 0.0]
+
+        def count_queries(execute, sql, params, many, context):
+            started = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                db_stats[0] += 1
+                db_stats[1] += time.perf_counter() - started
+
+        started = time.perf_counter()
+        with connection.execute_wrapper(count_queries):
+            response = self.get_response(request)
+        duration = time.perf_counter() - started
+
+        resolver_match = request.resolver_match
+        view = resolver_match.view_name if resolver_match else "unresolved"
+        metrics.REQUEST_LATENCY.observe(
+            duration, view, request.method, str(response.status_code)
+        )
+        metrics.REQUEST_DB_QUERIES.observe(db_stats[0], view)
+        metrics.REQUEST_DB_TIME.observe(db_stats[1], view)
+        return response
+
+
+class TracingMiddleware:
+    """
+    Starts the trace of each request. The trace id comes from the incoming
+    traceparent or X-Request-ID header, or is generated, and is returned to the
+    caller in the X-Trace-Id response header.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        trace_id, sampled, token = tracing.start_trace(
+            request.headers.get("traceparent"), request.headers.get("X-Request-ID")
+        )
+        request.trace_id = trace_id
+        try:
+            if not sampled:
+                response = self.get_response(request)
+            else:
+                with tracing.span(
+                    f"{request.method} {request.path}", method=request.method
+                ) as request_span:
+                    response = self.get_response(request)
+                    request_span.set_attribute("status", response.status_code)
+        finally:
+            tracing.end_trace(token)
+        response["X-Trace-Id"] = trace_id
+        return response
+
+
+class ProfilingMiddleware:
+    """
+    Profiles single requests on demand: requests carrying a valid signed
+    X-Profile header (see profiling.issue_token), plus a PROFILING_SAMPLE_RATE
+    fraction of all requests. The profile's top frames and the request's SQL
+    queries with their timings are written to the profile store.
+    Requests that are not profiled go straight to the view.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = settings.PROFILING_SAMPLE_RATE
+
+    def __call__(self, request):
+        token = request.headers.get(profiling.PROFILE_HEADER)
+        if token is not None:
+            mode = profiling.mode_from_token(token)
+        elif self.sample_rate and random.random() < self.sample_rate:
+            mode = settings.PROFILING_MODE
+        else:
+            mode = None
+        if mode is None:
+            return self.get_response(request)
+        return self.profile(request, mode)
+
+    def profile(self, request, mode: str):
+        queries = []
+
+        def record_query(execute, sql, params, many, context):
+            started = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                queries.append(
+                    {"sql": sql, "duration": round(time.perf_counter() - started, 6)}
+                )
+
+        profiler = profiling.make_profiler(mode)
+        started = time.perf_counter()
+        with connection.execute_wrapper(record_query):
+            try:
+                profiler.start()
+            except ValueError as e:
+                # cProfile refuses to run while another profiler is active
+                logger.warning("Could not profile %s: %s", request.path, e)
+                return self.get_response(request)
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.stop()
+        duration = time.perf_counter() - started
+
+        try:
+            profile_id = profiling.get_profile_store().save(
+                {
+                    "method": request.method,
+                    "path": request.path,
+                    "status": response.status_code,
+                    "mode": mode,
+                    "trace_id": getattr(request, "trace_id", None),
+                    "duration": round(duration, 6),
+                    "sql_count": len(queries),
+                    "sql": queries,
+                    "frames": profiling.top_frames(
+                        {"frames": profiler.frames()}, settings.PROFILING_TOP_FRAMES
+                    ),
+                }
+            )
+            response["X-Profile-Id"] = profile_id
+        except OSError as e:
+            logger.warning("Could not store profile of %s: %s", request.path, e)
+        return response
+
+
+class WebOnlyMiddleware:
+    """
+    Runs the WEB_ONLY_MIDDLEWARE stack (sessions, CSRF, authentication, messages)
+    for browser routes such as the admin, in the position of this middleware in
+    MIDDLEWARE. Requests for API_PATH_PREFIXES skip it entirely and go straight
+    to the rest of the stack: API views authenticate callers themselves.
+    The process_view, process_template_response and process_exception hooks of
+    the inner middleware are called like Django would, for browser routes only.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.api_prefixes = tuple(settings.API_PATH_PREFIXES)
+        self.view_hooks = []
+        self.template_response_hooks = []
+        self.exception_hooks = []
+        handler = get_response
+        for middleware_path in reversed(settings.WEB_ONLY_MIDDLEWARE):
+            try:
+                instance = import_string(middleware_path)(handler)
+            except MiddlewareNotUsed:
+                continue
+            if hasattr(instance, "process_view"):
+                self.view_hooks.insert(0, instance.process_view)
+            if hasattr(instance, "process_template_response"):
+                self.template_response_hooks.append(instance.process_template_response)
+            if hasattr(instance, "process_exception"):
+                self.exception_hooks.append(instance.process_exception)
+            handler = convert_exception_to_response(instance)
+        self.web_handler = handler
+
+    def __call__(self, request):
+        if request.path_info.startswith(self.api_prefixes):
+            return self.get_response(request)
+        return self.web_handler(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if request.path_info.startswith(self.api_prefixes):
+            return None
+        for hook in self.view_hooks:
+            response = hook(request, view_func, view_args, view_kwargs)
+            if response is not None:
+                return response
+        return None
+
+    def process_template_response(self, request, response):
+        if request.path_info.startswith(self.api_prefixes):
+            return response
+        for hook in self.template_response_hooks:
+            response = hook(request, response)
+        return response
+
+    def process_exception(self, request, exception):
+        if request.path_info.startswith(self.api_prefixes):
+            return None
+        for hook in self.exception_hooks:
+            response = hook(request, exception)
+            if response is not None:
+                return response
+        return None
@@ -0,0 +1,52 @@
+# Generated by Django 5.2 on 2026-10-19 02:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("Apis", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="VelocityWindow",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("counter", models.CharField(help_text="Velocity rule", max_length=50)),
+                (
+                    "key",
+                    models.CharField(
+                        help_text="Client or bank token digest", max_length=255
+                    ),
+                ),
+                (
+                    "buckets",
+                    models.JSONField(help_text="Buckets of the window, oldest first"),
+                ),
+                (
+                    "expires_at",
+                    models.DateTimeField(
+                        db_index=True,
+                        help_text="When nothing in the buckets counts any more",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("counter", "key"), name="unique_velocity_window"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,125 @@
+import hashlib
+import secrets
+from typing import Iterable, Tuple
+from django.conf import settings
+from django.db import models
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+API_KEY_PREFIX = "mk"
+
+# Scopes a merchant API key can be granted
+SCOPE_PAYMENTS_CREATE = "payments:create"
+API_KEY_SCOPES = (SCOPE_PAYMENTS_CREATE,)
+
+
+def hash_api_key(raw_key: str) -> str:
+    """
+    Digest stored for a key. Keys are long random tokens, so an unsalted
+    SHA-256 is enough and lets keys be looked up by their digest.
+    """
+    return hashlib.sha256(raw_key.encode()).hexdigest()
+
+
+class MerchantAPIKey(models.Model):
+    merchant = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="api_keys",
+        help_text="Account the key authenticates as",
+    )
+    name = models.CharField(max_length=100, help_text="What the key is used for")
+    prefix = models.CharField(
+        max_length=16,
+        unique=True,
+        editable=False,
+        help_text="Public part of the key, to tell keys apart",
+    )
+    key_hash = models.CharField(
+        max_length=64, unique=True, editable=False, help_text="SHA-256 of the key"
+    )
+    scopes = models.JSONField(
+        default=list, blank=True, help_text="Scopes granted to the key"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    revoked_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Merchant API Key"
+        verbose_name_plural = "Merchant API Keys"
+        ordering = ["-created_at"]
+
+    @classmethod
+    def issue(
+        cls, merchant, name: str, scopes: Iterable[str]
+    ) -> Tuple["MerchantAPIKey", str]:
+        """
+        Creates a key and returns it with the raw key, which is only shown
+        once: just its digest is stored.
+        """
+        scopes = list(scopes)
+        unknown = set(scopes) - set(API_KEY_SCOPES)
+        if unknown:
+            raise ValueError(f"Unknown scopes: {', '.join(sorted(unknown))}")
+        prefix = secrets.token_hex(4)
+        raw_key = f"{API_KEY_PREFIX}_{prefix}_{secrets.token_urlsafe(32)}"
+        api_key = cls.objects.create(
+            merchant=merchant,
+            name=name,
+            prefix=prefix,
+            key_hash=hash_api_key(raw_key),
+            scopes=scopes,
+        )
+        return api_key, raw_key
+
+    @property
+    def is_active(self) -> bool:
+        return self.revoked_at is None
+
+    def has_scope(self, scope: str) -> bool:
+        return scope in self.scopes
+
+    def revoke(self):
+        if self.revoked_at is None:
+            self.revoked_at = timezone.now()
+            self.save(update_fields=["revoked_at"])
+
+    def __str__(self):
+        return f"{self.name} ({API_KEY_PREFIX}_{self.prefix}...)"
+
+
+@receiver([post_delete, post_save], sender=MerchantAPIKey)
+def invalidate_verified_keys(sender, instance, created=False, **kwargs):
+    """
+    Revoking, changing or deleting a key makes every process drop the keys it
+    verified, see Apis.authentication.
+    """
+    if not created:
+        from .authentication import bump_revocation_version
+
+        bump_revocation_version()
+
+
+class VelocityWindow(models.Model):
+    """
+    Saved state of a velocity counter for one key, so that a restarted worker
+    resumes enforcing the velocity rules, see Apis.pre_checks_ports_and_adapters.
+    """
+
+    counter = models.CharField(max_length=50, help_text="Velocity rule")
+    key = models.CharField(max_length=255, help_text="Client or bank token digest")
+    buckets = models.JSONField(help_text="Buckets of the window, oldest first")
+    expires_at = models.DateTimeField(
+        db_index=True, help_text="When nothing in the buckets counts any more"
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["counter", "key"], name="unique_velocity_window"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.counter} {self.key}"
@@ -0,0 +1,147 @@
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+from django.conf import settings
+from drf_spectacular.settings import spectacular_settings
+import drf_spectacular
+from . import json_codec
+import logging
+
+logger = logging.getLogger(__name__)
+
+_SKIPPED_DIRS = {"__pycache__", "migrations", "benchmarks"}
+# Modules whose content can change the schema: routes, views, serializers, the
+# models their fields are derived from, the authentication scheme, and settings
+# (e.g. SPECTACULAR_SETTINGS)
+_SCHEMA_SOURCES = {
+    "urls.py",
+    "views.py",
+    "serializers.py",
+    "models.py",
+    "authentication.py",
+    "settings.py",
+}
+
+_lock = threading.Lock()
+_schema: Optional[Dict[str, Any]] = None
+_rendered: Dict[str, Tuple[bytes, str]] = {}
+_code_version: Optional[str] = None
+
+
+def source_fingerprint(root: Path) -> str:
+    """
+    Hash of the path and content of the modules under root that can change the
+    schema. Checking the code out again or touching a file leaves it unchanged.
+    """
+    digest = hashlib.sha1()
+    for directory, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(
+            name
+            for name in dirnames
+            if name not in _SKIPPED_DIRS and not name.startswith(".")
+        )
+        for filename in sorted(filenames):
+            if filename not in _SCHEMA_SOURCES:
+                continue
+            path = os.path.join(directory, filename)
+            digest.update(f"{os.path.relpath(path, root)}\n".encode())
+            with open(path, "rb") as f:
+                digest.update(hashlib.sha1(f.read()).digest())
+    return digest.hexdigest()[:12]
+
+
+def code_version() -> str:
+    """
+    Version the cached schema belongs to: the API version with CODE_VERSION
+    (e.g. the deployed commit) or, when unset, a fingerprint of the source files.
+    A deployment changing the code changes the version, and the schema is
+    generated again.
+    """
+    global _code_version
+    if _code_version is None:
+        version = settings.CODE_VERSION or source_fingerprint(settings.BASE_DIR)
+        _code_version = (
+            f"{spectacular_settings.VERSION}-{version}-"
+            f"spectacular{drf_spectacular.__version__}"
+        )
+    return _code_version
+
+
+def schema_path(version: str) -> Path:
+    return Path(settings.OPENAPI_SCHEMA_DIR) / f"openapi-{version}.json"
+
+
+def generate_schema() -> Dict[str, Any]:
+    """Generates the public schema like `manage.py spectacular` does."""
+    generator = spectacular_settings.DEFAULT_GENERATOR_CLASS()
+    return generator.get_schema(request=None, public=True)
+
+
+def write_schema(schema: Dict[str, Any], version: str, prune: bool = True) -> Path:
+    """
+    Writes the schema of `version` to OPENAPI_SCHEMA_DIR, atomically, and
+    removes the files of other versions unless prune is False.
+    """
+    path = schema_path(version)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary = path.with_suffix(f".{os.getpid()}.tmp")
+    temporary.write_bytes(json_codec.dumps(schema))
+    os.replace(temporary, path)
+    if prune:
+        for stale in path.parent.glob("openapi-*.json"):
+            if stale != path:
+                stale.unlink(missing_ok=True)
+    return path
+
+
+def load_schema() -> Dict[str, Any]:
+    """
+    The schema of the running code: read from the file written by
+    `manage.py precompute_schema` for this version, or generated once per
+    process and written there for the other workers.
+    """
+    global _schema
+    if _schema is not None:
+        return _schema
+    with _lock:
+        if _schema is not None:
+            return _schema
+        version = code_version()
+        path = schema_path(version)
+        try:
+            schema = json.loads(path.read_bytes())
+            logger.info("Loaded OpenAPI schema %s", path)
+        except (OSError, ValueError):
+            logger.info("Generating OpenAPI schema for version %s", version)
+            schema = generate_schema()
+            try:
+                write_schema(schema, version)
+            except OSError as e:
+                logger.warning("Could not write OpenAPI schema %s: %s", path, e)
+        _schema = schema
+        return _schema
+
+
+def rendered_schema(renderer) -> Tuple[bytes, str]:
+    """
+    The schema rendered by `renderer` (YAML or JSON) and its ETag. Each format
+    is rendered once per process.
+    """
+    cached = _rendered.get(renderer.media_type)
+    if cached is None:
+        body = renderer.render(load_schema(), renderer_context={})
+        etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+        cached = _rendered.setdefault(renderer.media_type, (body, etag))
+    return cached
+
+
+def clear_cache():
+    """Forgets the loaded schema, e.g. after precomputing it again."""
+    global _schema, _code_version
+    with _lock:
+        _schema = None
+        _code_version = None
+        _rendered.clear()
@@ -0,0 +1,10 @@
+from django.urls import path
+from .views import GatewayBulkheadStatusView, MemoryDiagnosticsView, SlowQueryLogView
+
+# Operational endpoints for staff. These are kept out of the /api/ prefix,
+# which is reserved for server-to-server payment traffic.
+urlpatterns = [
+    path("bulkheads/", GatewayBulkheadStatusView.as_view(), name="ops-bulkheads"),
+    path("slow-queries/", SlowQueryLogView.as_view(), name="ops-slow-queries"),
+    path("memory/", MemoryDiagnosticsView.as_view(), name="ops-memory"),
+]
@@ -1,12 +1,32 @@
 from abc import ABC, abstractmethod
 from dataclasses import dataclass, field
 from typing import Any, Dict, Optional
-from django.conf import settings
-import requests
-import paystack
-import logging
-
-logger = logging.getLogger(__name__)
+from .resilience import Deadline
+
+# Maps the status vocabulary of each gateway onto PaymentTransaction status choices.
+GATEWAY_STATUS_MAP = {
+    "success": "success",
+    "successful": "success",
+    "completed": "success",
+    "failed": "failed",
+    "abandoned": "failed",
+    "reversed": "failed",
+    "cancelled": "failed",
+    "pending": "pending",
+    "ongoing": "pending",
+    "processing": "pending",
+    "queued": "pending",
+}
+
+
+def normalize_gateway_status(status: Any) -> str:
+    """
+    Normalizes a gateway specific status (e.g. FlutterWave's "successful")
+    to one of the internal status choices: pending, success or failed.
+    Unknown statuses are returned lowercased so that callers can surface them.
+    """
+    status = str(status or "").strip().lower()
+    return GATEWAY_STATUS_MAP.get(status, status)
 
 
 @dataclass
@@ -23,6 +43,7 @@ class PaymentDetails:
         bank_code: Bank code for the payment.
         bank_phone: Phone number associated with the bank account.
         bank_token: Token for the bank account.
+        deadline: Optional deadline by which the gateway call must have finished.
     """
 
     tx_ref: str
@@ -34,6 +55,7 @@ class PaymentDetails:
     bank_code: str = "50211"
     bank_phone: str = "+2348100000000"
     bank_token: str = "123456"
+    deadline: Optional[Deadline] = None
 
 
 @dataclass
@@ -66,6 +88,21 @@ class GatewayWebhookEventDTO:
     amount: float
 
 
+@dataclass
+class GatewayVerificationDTO:
+    """Data Transfer Object for the result of verifying a payment with a payment gateway.
+    - internal_transaction_ref: Internal reference for the transaction.
+    - status: Normalized status of the transaction (pending, success or failed).
+    - gateway_ref: Reference from the payment gateway for the transaction, if reported.
+    - amount: Amount reported by the payment gateway, if any.
+    """
+
+    internal_transaction_ref: str
+    status: str
+    gateway_ref: Optional[str] = None
+    amount: Optional[float] = None
+
+
 class PaymentGatewayInterface(ABC):
     """Interface for payment gateway adapters.
     Methods in this interface should be implemented by all payment gateway adapters.
@@ -92,172 +129,9 @@ class PaymentGatewayInterface(ABC):
         """Verifies a payment via this gateway. Returns gateway-specific response."""
         pass
 
-
-class PayStackAdapter(PaymentGatewayInterface):
-    """
-    Implements the PaymentGatewayinterface for the FLuterWave payment gateway
-
-    Unique behaviour:
-    - Processes payment by sending requests to paystack's payment endpoint
-    - Handles webhook notifications specific to flutterwave's format.
-    - Verifies transaction using Paystack's verification API
-    """
-
-    def process_payment(
-        self, payment_details: PaymentDetails
-    ) -> GatewayProcessPaymentResponseDTO:
-        """
-        Processes a payment using Paystack's API.
-        This method takes payment details, constructs a request to Paystack's API,
-        and returns a DTO with the result of the payment attempt.
-        :param payment_details: PaymentDetails object containing all necessary information for the payment.
-        :return: GatewayProcessPaymentResponseDTO containing the success status, gateway reference, and raw response data.
-        """
-        paystack.api_key = settings.PAYSTACK_SECRET_KEY
-        amount = payment_details.amount * 100  # Paystack expects amount in kobo
-        bank = {
-            "code": payment_details.bank_code,
-            "phone": payment_details.bank_phone,
-            "token": payment_details.bank_token,
-        }
-
-        response = paystack.Charge.create(
-            email=payment_details.client_email,
-            amount=amount,
-            bank=bank,
-            reference=payment_details.tx_ref,
-        )
-        if response:
-            status = response.status
-            data = response.data
-            success = status == True
-            response_data = {
-                "data": response.data,
-                "message": response.message,
-                "status": response.status,
-            }
-            logger.info(f"Processing payment: success={success}, data={response_data}")
-        return GatewayProcessPaymentResponseDTO(
-            success=success,
-            gateway_ref=data.get("reference"),
-            raw_response=response_data,
-        )
-
-    def handle_webhook(self, request_data) -> GatewayWebhookEventDTO:
-        """
-        Handles webhook notifications from Paystack
-        This method processes the incoming webhook data, extracts relevant information,
-        and returns a DTO with the transaction details.
-        :param request_data: Raw data from the webhook notification.
-        :return: GatewayWebhookEventDTO containing the internal transaction reference, gateway reference, new status, and amount.
-        """
-
-        data = request_data.get("data", {})
-        transaction_ref = data.get("reference", "")
-        status = data.get("status", "")
-        gateway_ref = data.get("customer", "").get("customer_code", "")
-        amount = data.get("amount", 0.0) // 100  # Convert to Naira
-        logger.info(
-            f"Handling webhook: tx_ref={transaction_ref}, status={status}, gateway_ref={gateway_ref}, amount={amount}"
-        )
-        return GatewayWebhookEventDTO(
-            internal_transaction_ref=transaction_ref,
-            gateway_ref=gateway_ref,
-            new_status=status,
-            amount=amount,
-        )
-
-    def verify_payment(self, transaction_ref: str):
+    @abstractmethod
+    def parse_verification(
+        self, transaction_ref: str, raw_verification: Dict[str, Any]
+    ) -> GatewayVerificationDTO:
+        """Translates a gateway-specific verification response into a core DTO."""
         pass
-
-
-class FlutterWaveAdapter(PaymentGatewayInterface):
-    """
-    Implements the PaymentGatewayInterface for the FlutterWave payment gateway.
-
-    Unique behavior:
-    - Processes payments by sending requests to FlutterWave's payment endpoint.
-    - Handles webhook notifications specific to FlutterWave's format.
-    - Verifies transactions using FlutterWave's verification API.
-    """
-
-    headers = {
-        "accept": "application/json",
-        "Authorization": f"Bearer {settings.FLUTTERWAVE_SECRET_KEY}",
-        "Content-Type": "application/json",
-    }
-
-    def process_payment(
-        self, payment_details: PaymentDetails
-    ) -> GatewayProcessPaymentResponseDTO:
-        """
-        Processes a payment using FlutterWave's API.
-        This method takes payment details, constructs a request to FlutterWave's API,
-        and returns a DTO with the result of the payment attempt.
-        :param payment_details: PaymentDetails object containing all necessary information for the payment.
-        :return: GatewayProcessPaymentResponseDTO containing the success status, gateway reference, and raw response data.
-        """
-        endpoint = settings.FLUTTERWAVE_BANK_TRANSFER_ENDPOINT
-        payload = {
-            "amount": payment_details.amount,
-            "email": payment_details.client_email,
-            "currency": payment_details.currency,
-            "tx_ref": payment_details.tx_ref,
-            "full_name": payment_details.client_name,
-            "is_permanent": payment_details.is_permanent,
-        }
-        response = requests.post(endpoint, json=payload, headers=self.headers)
-        response.raise_for_status()
-        data = response.json()
-        success = data.get("status") == "success"
-        gateway_ref = None
-        if success:
-            meta = data.get("meta", {})
-            authorization = meta.get("Authorization", {})
-            gateway_ref = authorization.get("transfer_reference")
-            logger.info(
-                f"Processing payment: success={success}, gateway_ref={gateway_ref}, data={data}"
-            )
-
-        return GatewayProcessPaymentResponseDTO(
-            success=success, gateway_ref=gateway_ref, raw_response=data
-        )
-
-    def handle_webhook(self, request_data) -> GatewayWebhookEventDTO:
-        """
-        Handles webhook notifications from FlutterWave.
-        This method processes the incoming webhook data, extracts relevant information,
-        and returns a DTO with the transaction details.
-        :param request_data: Raw data from the webhook notification.
-        :return: GatewayWebhookEventDTO containing the internal transaction reference, gateway reference, new status, and amount.
-        """
-
-        data = request_data.get("data", {})
-        transaction_ref = data.get("tx_ref", "")
-        status = data.get("status", "")
-        gateway_ref = data.get("flw_ref", "")
-        amount = data.get("amount", 0.0)
-        logger.info(
-            f"Handling webhook: tx_ref={transaction_ref}, status={status}, gateway_ref={gateway_ref}, amount={amount}"
-        )
-        return GatewayWebhookEventDTO(
-            internal_transaction_ref=transaction_ref,
-            gateway_ref=gateway_ref,
-            new_status=status,
-            amount=amount,
-        )
-
-    def verify_payment(self, transaction_ref: str) -> dict:
-        """
-        Verifies a payment using FlutterWave's verification API.
-        This method constructs a request to FlutterWave's verification endpoint
-        and returns the verification result.
-        :param transaction_ref: The transaction reference to verify.
-        :return: A dictionary containing the verification result.
-        """
-        endpoint = settings.FLUTTERWAVE_VERIFICATION_URL.format(
-            transaction_ref=transaction_ref
-        )
-        response = requests.get(endpoint, headers=self.headers)
-        response.raise_for_status()
-        return response.json()
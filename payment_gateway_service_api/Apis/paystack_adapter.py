@@ -0,0 +1,163 @@
+from typing import Any, Dict, Optional
+from django.conf import settings
+from . import json_codec, webhook_schemas
+from .payments_ports_and_adapters import (
+    GatewayProcessPaymentResponseDTO,
+    GatewayVerificationDTO,
+    GatewayWebhookEventDTO,
+    PaymentDetails,
+    PaymentGatewayInterface,
+    normalize_gateway_status,
+)
+from .structured_logging import log_payload
+from .tracing import traced
+from .transport import gateway_request
+from .verification_cache import cached_verification
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class PayStackAdapter(PaymentGatewayInterface):
+    """
+    Implements the PaymentGatewayinterface for the FLuterWave payment gateway
+
+    Unique behaviour:
+    - Processes payment by sending requests to paystack's charge endpoint
+    - Handles webhook notifications specific to flutterwave's format.
+    - Verifies transaction using Paystack's verification API
+    """
+
+    gateway_name = "PayStack"
+
+    def __init__(self, secret_key: Optional[str] = None):
+        self.headers = {
+            "accept": "application/json",
+            "Authorization": f"Bearer {secret_key or settings.PAYSTACK_SECRET_KEY}",
+            "Content-Type": "application/json",
+        }
+
+    @traced
+    def process_payment(
+        self, payment_details: PaymentDetails
+    ) -> GatewayProcessPaymentResponseDTO:
+        """
+        Processes a payment using Paystack's API.
+        This method takes payment details, constructs a request to Paystack's API,
+        and returns a DTO with the result of the payment attempt.
+        :param payment_details: PaymentDetails object containing all necessary information for the payment.
+        :return: GatewayProcessPaymentResponseDTO containing the success status, gateway reference, and raw response data.
+        """
+        # Paystack expects the amount in kobo
+        amount = int(round(payment_details.amount * 100))
+        payload = {
+            "email": payment_details.client_email,
+            "amount": amount,
+            "bank": {
+                "code": payment_details.bank_code,
+                "phone": payment_details.bank_phone,
+                "token": payment_details.bank_token,
+            },
+            "reference": payment_details.tx_ref,
+        }
+        response = gateway_request(
+            self.gateway_name,
+            "POST",
+            settings.PAYSTACK_CHARGE_ENDPOINT,
+            deadline=payment_details.deadline,
+            json=payload,
+            headers=self.headers,
+        )
+        response_json = json_codec.response_json(response)
+        data = response_json.get("data") or {}
+        success = response_json.get("status") is True
+        response_data = {
+            "data": data,
+            "message": response_json.get("message"),
+            "status": response_json.get("status"),
+        }
+        logger.info(
+            "Processing payment: success=%s, gateway_ref=%s",
+            success,
+            data.get("reference"),
+        )
+        log_payload(
+            logger, "create-payment", "PayStack charge response: %s", response_data
+        )
+        return GatewayProcessPaymentResponseDTO(
+            success=success,
+            gateway_ref=data.get("reference"),
+            raw_response=response_data,
+        )
+
+    @traced
+    def handle_webhook(self, request_data) -> GatewayWebhookEventDTO:
+        """
+        Handles webhook notifications from Paystack
+        This method processes the incoming webhook data, extracts relevant information,
+        and returns a DTO with the transaction details.
+        :param request_data: Raw data from the webhook notification.
+        :return: GatewayWebhookEventDTO containing the internal transaction reference, gateway reference, new status, and amount.
+        :raises ValueError: If the event does not match the gateway's webhook schema.
+        """
+
+        data = webhook_schemas.validate_webhook(self.gateway_name, request_data)
+        transaction_ref = data["reference"]
+        status = data["status"]
+        gateway_ref = (data.get("customer") or {}).get("customer_code") or ""
+        amount = data["amount"] // 100  # Convert to Naira
+        logger.info(
+            "Handling webhook: tx_ref=%s, status=%s, gateway_ref=%s, amount=%s",
+            transaction_ref,
+            status,
+            gateway_ref,
+            amount,
+        )
+        return GatewayWebhookEventDTO(
+            internal_transaction_ref=transaction_ref,
+            gateway_ref=gateway_ref,
+            new_status=status,
+            amount=amount,
+        )
+
+    @traced
+    @cached_verification
+    def verify_payment(self, transaction_ref: str) -> dict:
+        """
+        Verifies a payment using Paystack's transaction verification API.
+        The request goes through the pooled HTTP session and results are cached
+        by reference, see verification_cache.
+        :param transaction_ref: The transaction reference to verify.
+        :return: A dictionary containing the verification result.
+        """
+        endpoint = settings.PAYSTACK_VERIFICATION_URL.format(
+            transaction_ref=transaction_ref
+        )
+        response = gateway_request(
+            self.gateway_name,
+            "GET",
+            endpoint,
+            idempotent=True,
+            headers=self.headers,
+        )
+        return json_codec.response_json(response)
+
+    def parse_verification(
+        self, transaction_ref: str, raw_verification: Dict[str, Any]
+    ) -> GatewayVerificationDTO:
+        """
+        Parses a response from Paystack's transaction verification API.
+        Paystack reports amounts in kobo and the transaction status under data.status.
+        :param transaction_ref: The transaction reference that was verified.
+        :param raw_verification: The raw verification response.
+        :return: GatewayVerificationDTO with the normalized status.
+        """
+        data = raw_verification.get("data") or {}
+        amount = data.get("amount")
+        gateway_id = data.get("id")
+        return GatewayVerificationDTO(
+            internal_transaction_ref=data.get("reference") or transaction_ref,
+            status=normalize_gateway_status(data.get("status") or "pending"),
+            gateway_ref=str(gateway_id) if gateway_id is not None else None,
+            amount=amount / 100 if amount is not None else None,
+        )
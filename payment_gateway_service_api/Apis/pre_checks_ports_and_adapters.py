@@ -0,0 +1,255 @@
+import atexit
+import hashlib
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+from django.conf import settings
+from django.db import DatabaseError, connection
+from django.utils.module_loading import import_string
+from . import metrics
+from .sliding_windows import DistinctWindowCounter, SlidingWindowCounter
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PaymentAttemptDTO:
+    """
+    Data Transfer Object for a payment about to be sent to a gateway.
+    - client_id: Unique identifier of the client paying.
+    - amount: Amount to be charged.
+    - currency: Currency in which the payment is made.
+    - gateway_name: Name of the payment gateway that will be called.
+    - bank_token: Token of the bank account or card charged, if given.
+    """
+
+    client_id: Any
+    amount: float
+    currency: str
+    gateway_name: str
+    bank_token: Optional[str] = None
+
+
+class PaymentRejectedError(Exception):
+    """
+    Raised by a pre-check to stop a payment before it reaches a gateway.
+    - rule: Name of the rule the payment broke.
+    - retry_after: Seconds after which the same payment would be admitted.
+    """
+
+    def __init__(self, message: str, rule: str, retry_after: float):
+        super().__init__(message)
+        self.rule = rule
+        self.retry_after = retry_after
+
+
+class PaymentPreCheckInterface(ABC):
+    """Interface for the checks a payment goes through before reaching a gateway."""
+
+    @abstractmethod
+    def evaluate(self, attempt: PaymentAttemptDTO) -> None:
+        """Raises PaymentRejectedError to reject the payment, else records it."""
+        pass
+
+
+class VelocityPreCheckAdapter(PaymentPreCheckInterface):
+    """
+    Implements the PaymentPreCheckInterface with the velocity rules of
+    VELOCITY_RULES, each a LIMIT over a sliding window of WINDOW_SECONDS:
+
+    - payments_per_client: payments admitted for a client.
+    - amount_per_client: total amount admitted for a client.
+    - clients_per_bank_token: distinct clients paying with a bank token.
+
+    The counters are kept in process, so a check takes microseconds and makes
+    no query, and each worker enforces the limits on the payments it sees.
+    When VELOCITY_PERSIST_INTERVAL_SECONDS is set, the keys that changed are
+    saved to VelocityWindow that often, and once more at exit. The counters are
+    restored from VelocityWindow when they are created.
+    Bank tokens are only kept as digests.
+    """
+
+    def __init__(self, rules: Optional[Dict[str, dict]] = None):
+        self.rules = rules if rules is not None else settings.VELOCITY_RULES
+        counter_classes = {
+            "payments_per_client": SlidingWindowCounter,
+            "amount_per_client": SlidingWindowCounter,
+            "clients_per_bank_token": DistinctWindowCounter,
+        }
+        unknown = set(self.rules) - set(counter_classes)
+        if unknown:
+            raise ValueError(f"Unknown velocity rules: {', '.join(sorted(unknown))}")
+        self.counters = {
+            name: counter_classes[name](rule["WINDOW_SECONDS"])
+            for name, rule in self.rules.items()
+        }
+        self._lock = threading.Lock()
+        self._persister_pid = None
+        try:
+            self.restore()
+        except DatabaseError as e:
+            logger.warning("Could not restore velocity windows: %s", e)
+
+    def _reject(self, rule: str, message: str, retry_after: float):
+        metrics.PAYMENTS_REJECTED.inc(rule)
+        raise PaymentRejectedError(message, rule, retry_after)
+
+    def evaluate(self, attempt: PaymentAttemptDTO) -> None:
+        self.ensure_persisting()
+        client = str(attempt.client_id)
+        amount = float(attempt.amount)
+        token = (
+            hashlib.sha256(attempt.bank_token.encode()).hexdigest()[:32]
+            if attempt.bank_token
+            else None
+        )
+        payments = self.counters.get("payments_per_client")
+        amounts = self.counters.get("amount_per_client")
+        clients = self.counters.get("clients_per_bank_token") if token else None
+        now = time.time()
+        with self._lock:
+            if payments is not None:
+                limit = self.rules["payments_per_client"]["LIMIT"]
+                if payments.total(client, now) + 1 > limit:
+                    self._reject(
+                        "payments_per_client",
+                        f"Client {client} reached {limit} payments",
+                        payments.retry_after(client, 1, now),
+                    )
+            if amounts is not None:
+                limit = self.rules["amount_per_client"]["LIMIT"]
+                excess = amounts.total(client, now) + amount - limit
+                if excess > 0:
+                    self._reject(
+                        "amount_per_client",
+                        f"Client {client} reached an amount of {limit}",
+                        amounts.retry_after(client, excess, now),
+                    )
+            if clients is not None:
+                limit = self.rules["clients_per_bank_token"]["LIMIT"]
+                if (
+                    not clients.contains(token, client, now)
+                    and clients.count(token, now) + 1 > limit
+                ):
+                    self._reject(
+                        "clients_per_bank_token",
+                        f"Bank token used by {limit} clients",
+                        clients.retry_after(token, now),
+                    )
+            if payments is not None:
+                payments.add(client, 1, now)
+            if amounts is not None:
+                amounts.add(client, amount, now)
+            if clients is not None:
+                clients.add(token, client, now)
+
+    def restore(self):
+        """Loads the windows saved by any worker that have not expired."""
+        from .models import VelocityWindow
+
+        rows = VelocityWindow.objects.filter(
+            counter__in=list(self.counters),
+            expires_at__gt=datetime.now(timezone.utc),
+        ).values_list("counter", "key", "buckets")
+        with self._lock:
+            for counter, key, buckets in rows:
+                self.counters[counter].load(key, buckets)
+
+    def persist(self):
+        """Saves the windows changed since the last call and drops expired ones."""
+        from .models import VelocityWindow
+
+        now = time.time()
+        windows: List[VelocityWindow] = []
+        with self._lock:
+            dirty = {}
+            for name, counter in self.counters.items():
+                counter.purge(now)
+                dirty[name] = counter.pop_dirty()
+                for key in dirty[name].intersection(counter.keys()):
+                    windows.append(
+                        VelocityWindow(
+                            counter=name,
+                            key=key,
+                            buckets=counter.state(key),
+                            expires_at=datetime.fromtimestamp(
+                                counter.expires_at(key), timezone.utc
+                            ),
+                        )
+                    )
+        try:
+            VelocityWindow.objects.bulk_create(
+                windows,
+                update_conflicts=True,
+                unique_fields=["counter", "key"],
+                update_fields=["buckets", "expires_at"],
+            )
+            VelocityWindow.objects.filter(
+                expires_at__lte=datetime.fromtimestamp(now, timezone.utc)
+            ).delete()
+        except DatabaseError as e:
+            logger.warning("Could not save velocity windows: %s", e)
+            with self._lock:
+                for name, keys in dirty.items():
+                    self.counters[name].mark_dirty(keys)
+
+    def ensure_persisting(self):
+        """Starts the persist thread once per process, including after a fork."""
+        if self._persister_pid == os.getpid():
+            return
+        with self._lock:
+            if self._persister_pid == os.getpid():
+                return
+            self._persister_pid = os.getpid()
+        interval = settings.VELOCITY_PERSIST_INTERVAL_SECONDS
+        if interval > 0:
+            threading.Thread(
+                target=self._run,
+                args=(interval,),
+                name="velocity-persister",
+                daemon=True,
+            ).start()
+            atexit.register(self._persist_at_exit)
+
+    def _persist_at_exit(self):
+        """Saves the windows one last time, unless their table is already gone."""
+        from .models import VelocityWindow
+
+        try:
+            tables = connection.introspection.table_names()
+        except DatabaseError:
+            return
+        if VelocityWindow._meta.db_table in tables:
+            self.persist()
+
+    def _run(self, interval: float):
+        event = threading.Event()
+        while not event.wait(interval):
+            self.persist()
+
+
+_pre_checks = {}
+_pre_checks_lock = threading.Lock()
+
+
+def get_pre_checks() -> List[PaymentPreCheckInterface]:
+    """The pre-checks of PAYMENT_PRE_CHECKS, created once per process."""
+    paths = tuple(settings.PAYMENT_PRE_CHECKS)
+    pre_checks = _pre_checks.get(paths)
+    if pre_checks is None:
+        with _pre_checks_lock:
+            if paths not in _pre_checks:
+                _pre_checks[paths] = [import_string(path)() for path in paths]
+            pre_checks = _pre_checks[paths]
+    return pre_checks
+
+
+def reset_pre_checks():
+    """Drops the pre-checks created so far, and their counters, e.g. between tests."""
+    with _pre_checks_lock:
+        _pre_checks.clear()
@@ -0,0 +1,236 @@
+import cProfile
+import json
+import os
+import pstats
+import sys
+import threading
+import uuid
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional
+from django.conf import settings
+from django.core import signing
+import logging
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "X-Profile"
+PROFILING_MODES = ("cprofile", "sampler")
+TOKEN_SALT = "Apis.profiling"
+# Fields shown when listing stored profiles
+SUMMARY_KEYS = ("id", "method", "path", "status", "mode", "duration", "sql_count")
+
+
+def issue_token(mode: str = "cprofile") -> str:
+    """Returns a signed value for the X-Profile header that profiles a request."""
+    if mode not in PROFILING_MODES:
+        raise ValueError(f"Unknown profiling mode {mode}")
+    return signing.TimestampSigner(salt=TOKEN_SALT).sign(mode)
+
+
+def mode_from_token(token: str) -> Optional[str]:
+    """Returns the profiling mode of a valid, unexpired token, otherwise None."""
+    try:
+        mode = signing.TimestampSigner(salt=TOKEN_SALT).unsign(
+            token, max_age=settings.PROFILING_TOKEN_MAX_AGE_SECONDS
+        )
+    except signing.BadSignature:
+        logger.warning("Ignoring request with an invalid profiling token")
+        return None
+    return mode if mode in PROFILING_MODES else None
+
+
+def _frame_name(filename: str, lineno: int, function: str) -> str:
+    return f"{filename}:{lineno}({function})"
+
+
+class CProfileProfiler:
+    """Deterministic profiler; exact call counts but slows the request down."""
+
+    mode = "cprofile"
+
+    def __init__(self):
+        self._profiler = cProfile.Profile()
+
+    def start(self):
+        self._profiler.enable()
+
+    def stop(self):
+        self._profiler.disable()
+
+    def frames(self) -> List[dict]:
+        stats = pstats.Stats(self._profiler).stats
+        return [
+            {
+                "function": _frame_name(*key),
+                "calls": calls,
+                "self": round(self_time, 6),
+                "cumulative": round(cumulative, 6),
+            }
+            for key, (_, calls, self_time, cumulative, _) in stats.items()
+        ]
+
+
+class StackSampler:
+    """
+    Statistical profiler. A background thread records the stack of the request
+    thread every `interval` seconds; times are estimated as samples * interval.
+    Much cheaper than cProfile, at the cost of missing short calls.
+    """
+
+    mode = "sampler"
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._thread_id = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._self_samples = Counter()
+        self._cumulative_samples = Counter()
+
+    def start(self):
+        self._thread_id = threading.get_ident()
+        self._thread = threading.Thread(
+            target=self._run, name="request-sampler", daemon=True
+        )
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is None:
+                continue
+            self._self_samples[self._key(frame)] += 1
+            seen = set()
+            while frame is not None:
+                key = self._key(frame)
+                if key not in seen:
+                    seen.add(key)
+                    self._cumulative_samples[key] += 1
+                frame = frame.f_back
+
+    @staticmethod
+    def _key(frame) -> str:
+        code = frame.f_code
+        return _frame_name(code.co_filename, code.co_firstlineno, code.co_name)
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def frames(self) -> List[dict]:
+        return [
+            {
+                "function": key,
+                "calls": None,
+                "self": round(self._self_samples[key] * self.interval, 6),
+                "cumulative": round(count * self.interval, 6),
+            }
+            for key, count in self._cumulative_samples.items()
+        ]
+
+
+def make_profiler(mode: str):
+    if mode == "sampler":
+        return StackSampler(settings.PROFILING_SAMPLER_INTERVAL_SECONDS)
+    return CProfileProfiler()
+
+
+class ProfileStore:
+    """
+    Directory of request profiles, one JSON file each, keeping only the newest
+    `max_profiles` files.
+    """
+
+    def __init__(self, directory: str, max_profiles: int):
+        self.directory = directory
+        self.max_profiles = max_profiles
+
+    def _paths(self) -> List[str]:
+        if not os.path.isdir(self.directory):
+            return []
+        names = sorted(
+            name for name in os.listdir(self.directory) if name.endswith(".json")
+        )
+        return [os.path.join(self.directory, name) for name in names]
+
+    def save(self, profile: dict) -> str:
+        """Writes a profile and removes the oldest ones beyond max_profiles."""
+        os.makedirs(self.directory, exist_ok=True)
+        # Ids sort by creation time, which is what rotation relies on
+        timestamp = datetime.now().strftime("%Y%m%dT%H%M%S%f")
+        profile_id = f"{timestamp}-{uuid.uuid4().hex[:8]}"
+        profile["id"] = profile_id
+        path = os.path.join(self.directory, f"{profile_id}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(profile, f)
+        for old_path in self._paths()[: -self.max_profiles]:
+            try:
+                os.remove(old_path)
+            except OSError as e:
+                logger.warning("Could not remove old profile %s: %s", old_path, e)
+        return profile_id
+
+    def list(self) -> List[dict]:
+        """Summaries of the stored profiles, newest first."""
+        summaries = []
+        for path in reversed(self._paths()):
+            profile = self._read(path)
+            if profile is not None:
+                summaries.append(
+                    {
+                        key: value
+                        for key, value in profile.items()
+                        if key in SUMMARY_KEYS
+                    }
+                )
+        return summaries
+
+    def load(self, profile_id: str) -> dict:
+        """
+        :raises ValueError: If no stored profile has this id.
+        """
+        profile = self._read(os.path.join(self.directory, f"{profile_id}.json"))
+        if profile is None:
+            raise ValueError(f"Profile {profile_id} not found")
+        return profile
+
+    @staticmethod
+    def _read(path: str) -> Optional[dict]:
+        try:
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+
+def get_profile_store() -> ProfileStore:
+    return ProfileStore(settings.PROFILING_DIR, settings.PROFILING_MAX_PROFILES)
+
+
+def top_frames(profile: dict, limit: int, sort_by: str = "cumulative") -> List[dict]:
+    return sorted(profile["frames"], key=lambda f: f[sort_by], reverse=True)[:limit]
+
+
+def diff_frames(
+    before: dict, after: dict, limit: int, sort_by: str = "cumulative"
+) -> List[Dict]:
+    """
+    Compares two profiles frame by frame.
+    :return: The frames whose time changed the most, with before, after and delta.
+    """
+    before_times = {f["function"]: f[sort_by] for f in before["frames"]}
+    after_times = {f["function"]: f[sort_by] for f in after["frames"]}
+    rows = []
+    for function in before_times.keys() | after_times.keys():
+        old = before_times.get(function, 0.0)
+        new = after_times.get(function, 0.0)
+        rows.append(
+            {
+                "function": function,
+                "before": old,
+                "after": new,
+                "delta": round(new - old, 6),
+            }
+        )
+    return sorted(rows, key=lambda row: abs(row["delta"]), reverse=True)[:limit]
@@ -0,0 +1,62 @@
+import time
+from contextlib import ContextDecorator
+from typing import Optional
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised when a block of code ran more queries or took longer than its budget."""
+
+
+class query_budget(ContextDecorator):
+    """
+    Test helper failing when the enclosed code runs more than max_queries SQL
+    queries, or takes more than max_seconds of wall time. The failure lists
+    every query that ran, so an added N+1 shows up directly in the test output.
+
+    Usable as a context manager:
+        with query_budget(3):
+            repository.get_client_by_email(email)
+    or as a decorator on a test method:
+        @query_budget(5, max_seconds=1.0)
+        def test_initiate_payment(self): ...
+    """
+
+    def __init__(
+        self,
+        max_queries: int,
+        max_seconds: Optional[float] = None,
+        using: str = DEFAULT_DB_ALIAS,
+    ):
+        self.max_queries = max_queries
+        self.max_seconds = max_seconds
+        self.using = using
+
+    def __enter__(self):
+        self._capture = CaptureQueriesContext(connections[self.using])
+        self._capture.__enter__()
+        self._started = time.perf_counter()
+        return self._capture
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        elapsed = time.perf_counter() - self._started
+        self._capture.__exit__(exc_type, exc_value, traceback)
+        if exc_type is not None:
+            return False
+
+        queries = self._capture.captured_queries
+        problems = []
+        if len(queries) > self.max_queries:
+            problems.append(f"{len(queries)} queries (budget {self.max_queries})")
+        if self.max_seconds is not None and elapsed > self.max_seconds:
+            problems.append(f"{elapsed:.3f}s (budget {self.max_seconds}s)")
+        if problems:
+            listing = "\n".join(
+                f"{index}. [{query['time']}s] {query['sql']}"
+                for index, query in enumerate(queries, start=1)
+            )
+            raise QueryBudgetExceeded(
+                f"Query budget exceeded: {', '.join(problems)}\n{listing}"
+            )
+        return False
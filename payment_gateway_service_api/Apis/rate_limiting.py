@@ -0,0 +1,243 @@
+import hashlib
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+from typing import Optional, Tuple
+from django.conf import settings
+from django.core.cache import caches
+import logging
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows: buckets are kept in the cache
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+def take_tokens(
+    tokens: float, elapsed: float, rate: float, capacity: float, cost: float
+) -> Tuple[float, float]:
+    """
+    Refills a bucket holding `tokens` for `elapsed` seconds and takes `cost`
+    from it if it can.
+    :return: The tokens left, and 0.0 if `cost` was taken or otherwise the
+             seconds to wait until it can be.
+    """
+    tokens = min(capacity, tokens + max(elapsed, 0.0) * rate)
+    if tokens >= cost:
+        return tokens - cost, 0.0
+    return tokens, (cost - tokens) / rate
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket.
+    Tokens are refilled continuously at `rate` per second up to `capacity`,
+    so short bursts are allowed while the long-run rate stays bounded.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        if rate <= 0:
+            raise ValueError("Token bucket rate must be positive")
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else rate)
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self, tokens: float = 1.0) -> float:
+        """
+        Takes `tokens` from the bucket if they are available.
+        :return: 0.0 if the tokens were taken, otherwise the seconds to wait
+                 until enough tokens will have been refilled.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens, wait = take_tokens(
+                self._tokens, now - self._updated_at, self.rate, self.capacity, tokens
+            )
+            self._updated_at = now
+            return wait
+
+    def acquire(self, tokens: float = 1.0, timeout: Optional[float] = None) -> bool:
+        """
+        Blocks until `tokens` are available or `timeout` seconds have passed.
+        :return: True if the tokens were taken, False on timeout.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait == 0.0:
+                return True
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            time.sleep(wait)
+
+
+def _key_hash(key: str) -> int:
+    # 0 marks an empty slot
+    return (
+        int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little")
+        or 1
+    )
+
+
+class SharedTokenBuckets:
+    """
+    Token buckets keyed by string, kept in a memory-mapped file so that every
+    worker process of the host that maps it shares them.
+
+    The file is a table of (key hash, tokens, updated at) slots. A key lives in
+    one of the PROBES slots following its hash; when they are all taken by
+    other keys, the one updated the longest ago is reused. Each check holds an
+    fcntl lock on those slots only, so checks for different keys rarely wait on
+    each other. Times are from the monotonic clock, which is shared by the
+    processes of a host. The file is not opened through a symbolic link, and
+    an existing file too small to hold a slot is refused.
+    """
+
+    PROBES = 8
+    _slot = struct.Struct("=Qdd")
+
+    def __init__(self, path: str, slots: int):
+        if fcntl is None:
+            raise OSError("Shared token buckets need fcntl")
+        if slots < 1:
+            raise ValueError("Shared token buckets need at least one slot")
+        self.path = path
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_NOFOLLOW, 0o600)
+        try:
+            size = os.fstat(self._fd).st_size
+            if size == 0:
+                size = (slots + self.PROBES) * self._slot.size
+                os.ftruncate(self._fd, size)
+            # A file created by another process keeps the size it was created with
+            self.slots = size // self._slot.size - self.PROBES
+            if self.slots < 1:
+                raise OSError(f"{path} is too small to hold a token bucket")
+            self._mmap = mmap.mmap(self._fd, size)
+        except OSError:
+            os.close(self._fd)
+            raise
+        # fcntl locks are held per process: threads of a process take turns first
+        self._lock = threading.Lock()
+
+    def try_acquire(
+        self, key: str, rate: float, capacity: float, cost: float = 1.0
+    ) -> float:
+        """
+        Takes `cost` tokens from the bucket of `key`, created full.
+        :return: 0.0 if the tokens were taken, otherwise the seconds to wait
+                 until enough tokens will have been refilled.
+        """
+        key_hash = _key_hash(key)
+        start = (key_hash % self.slots) * self._slot.size
+        length = self.PROBES * self._slot.size
+        with self._lock:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, length, start)
+            try:
+                now = time.monotonic()
+                position, tokens, updated_at = None, capacity, now
+                oldest, oldest_at = start, math.inf
+                for offset in range(start, start + length, self._slot.size):
+                    slot_hash, slot_tokens, slot_at = self._slot.unpack_from(
+                        self._mmap, offset
+                    )
+                    if slot_hash == key_hash:
+                        position, tokens, updated_at = offset, slot_tokens, slot_at
+                        break
+                    if slot_hash == 0:
+                        position = offset
+                        break
+                    if slot_at < oldest_at:
+                        oldest, oldest_at = offset, slot_at
+                if position is None:
+                    position = oldest
+                tokens, wait = take_tokens(
+                    tokens, now - updated_at, rate, capacity, cost
+                )
+                self._slot.pack_into(self._mmap, position, key_hash, tokens, now)
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, length, start)
+        return wait
+
+
+class CacheTokenBuckets:
+    """
+    Token buckets keyed by string, kept in a Django cache so that several
+    hosts can share them. The cache API has no compare-and-set, so requests
+    checked at the same instant on different workers may each take the same
+    token: the limit can be exceeded by about the number of workers.
+    """
+
+    def __init__(self, alias: str):
+        self.alias = alias
+
+    def try_acquire(
+        self, key: str, rate: float, capacity: float, cost: float = 1.0
+    ) -> float:
+        """
+        Takes `cost` tokens from the bucket of `key`, created full.
+        :return: 0.0 if the tokens were taken, otherwise the seconds to wait
+                 until enough tokens will have been refilled.
+        """
+        cache = caches[self.alias]
+        cache_key = f"token-bucket:{_key_hash(key):016x}"
+        # Wall clock time, as monotonic clocks differ between hosts
+        now = time.time()
+        tokens, updated_at = cache.get(cache_key) or (capacity, now)
+        tokens, wait = take_tokens(tokens, now - updated_at, rate, capacity, cost)
+        # Once full again the bucket is the same as a new one, and can be dropped
+        cache.set(
+            cache_key, (tokens, now), timeout=math.ceil((capacity - tokens) / rate) + 1
+        )
+        return wait
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def token_buckets():
+    """
+    The token bucket store selected by RATE_LIMIT_BACKEND: "shared_memory" for
+    SharedTokenBuckets at RATE_LIMIT_SHARED_MEMORY_PATH, falling back to the
+    cache when it cannot be mapped, or "cache" for CacheTokenBuckets in
+    RATE_LIMIT_CACHE_ALIAS.
+    """
+    config = (
+        settings.RATE_LIMIT_BACKEND,
+        settings.RATE_LIMIT_SHARED_MEMORY_PATH,
+        settings.RATE_LIMIT_CACHE_ALIAS,
+    )
+    store = _stores.get(config)
+    if store is not None:
+        return store
+    with _stores_lock:
+        if config not in _stores:
+            backend, path, alias = config
+            store = None
+            if backend == "shared_memory":
+                try:
+                    store = SharedTokenBuckets(
+                        path, settings.RATE_LIMIT_SHARED_MEMORY_SLOTS
+                    )
+                except OSError as e:
+                    logger.warning(
+                        "Keeping token buckets in the %s cache, as %s cannot be "
+                        "mapped: %s",
+                        alias,
+                        path,
+                        e,
+                    )
+            elif backend != "cache":
+                raise ValueError(f"Unknown RATE_LIMIT_BACKEND {backend}")
+            _stores[config] = store or CacheTokenBuckets(alias)
+        return _stores[config]
@@ -0,0 +1,325 @@
+import csv
+import json
+from collections import Counter
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, Iterable, Iterator, Optional, TextIO, Tuple
+from django.db import connection
+from django.db.models import F
+from django.db.models.functions import Collate
+from Orders.models import PaymentTransaction
+from .payments_ports_and_adapters import normalize_gateway_status
+import logging
+
+logger = logging.getLogger(__name__)
+
+MISSING_IN_DATABASE = "missing_in_database"
+MISSING_IN_SETTLEMENT = "missing_in_settlement"
+AMOUNT_MISMATCH = "amount_mismatch"
+STATUS_MISMATCH = "status_mismatch"
+DUPLICATE_IN_SETTLEMENT = "duplicate_in_settlement"
+
+RECONCILIATION_KEY_FIELDS = ("transaction_ref", "gateway_ref")
+
+# Binary collations make the database sort order match Python's string ordering,
+# which the merge-join relies on.
+BINARY_COLLATIONS = {"postgresql": "C", "sqlite": "BINARY", "mysql": "utf8mb4_bin"}
+
+CENT = Decimal("0.01")
+
+# (reference, amount, normalized status, line number)
+SettlementRow = Tuple[str, Decimal, str, int]
+# (reference, amount, normalized status)
+DatabaseRow = Tuple[str, Decimal, str]
+
+
+@dataclass
+class ReconciliationMismatchDTO:
+    """Data Transfer Object for a single reconciliation mismatch.
+    - kind: One of the mismatch kinds (missing_in_database, missing_in_settlement,
+      amount_mismatch, status_mismatch, duplicate_in_settlement).
+    - reference: The transaction_ref/gateway_ref the mismatch was found for.
+    - settlement_amount/settlement_status: Values reported by the gateway, if any.
+    - database_amount/database_status: Values stored on PaymentTransaction, if any.
+    - line_number: Line of the settlement file the record was read from, if any.
+    """
+
+    kind: str
+    reference: str
+    settlement_amount: Optional[Decimal] = None
+    database_amount: Optional[Decimal] = None
+    settlement_status: Optional[str] = None
+    database_status: Optional[str] = None
+    line_number: Optional[int] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "kind": self.kind,
+            "reference": self.reference,
+            "settlement_amount": (
+                str(self.settlement_amount)
+                if self.settlement_amount is not None
+                else None
+            ),
+            "database_amount": (
+                str(self.database_amount) if self.database_amount is not None else None
+            ),
+            "settlement_status": self.settlement_status,
+            "database_status": self.database_status,
+            "line_number": self.line_number,
+        }
+
+
+@dataclass
+class ReconciliationSummaryDTO:
+    """Data Transfer Object summarising a reconciliation run.
+    - settlement_rows: Number of records read from the settlement file.
+    - database_rows: Number of PaymentTransaction rows read from the database.
+    - matched: Number of references present on both sides with equal amount and status.
+    - mismatches: Count of mismatches per kind.
+    """
+
+    settlement_rows: int = 0
+    database_rows: int = 0
+    matched: int = 0
+    mismatches: Counter = field(default_factory=Counter)
+
+
+def _parse_amount(value: Any, amount_scale: Decimal, line_number: int) -> Decimal:
+    try:
+        return (Decimal(str(value).strip()) / amount_scale).quantize(CENT)
+    except (InvalidOperation, ValueError) as e:
+        raise ValueError(f"Invalid amount {value!r} on line {line_number}") from e
+
+
+def read_settlement_csv(
+    stream: TextIO,
+    ref_column: str = "reference",
+    amount_column: str = "amount",
+    status_column: str = "status",
+    amount_scale: Decimal = Decimal(1),
+) -> Iterator[SettlementRow]:
+    """
+    Streams settlement records from a CSV file with a header row.
+    Rows are yielded one at a time so memory does not grow with the file size.
+    :param amount_scale: Divisor applied to amounts, e.g. 100 for PayStack's kobo.
+    """
+    reader = csv.reader(stream)
+    header = next(reader, None)
+    if header is None:
+        return
+    try:
+        ref_index = header.index(ref_column)
+        amount_index = header.index(amount_column)
+        status_index = header.index(status_column)
+    except ValueError as e:
+        raise ValueError(f"Settlement file header is missing a column: {e}") from e
+
+    # Line 1 is the header
+    for line_number, row in enumerate(reader, start=2):
+        if not row:
+            continue
+        yield (
+            row[ref_index].strip(),
+            _parse_amount(row[amount_index], amount_scale, line_number),
+            normalize_gateway_status(row[status_index]),
+            line_number,
+        )
+
+
+def read_settlement_jsonl(
+    stream: TextIO,
+    ref_column: str = "reference",
+    amount_column: str = "amount",
+    status_column: str = "status",
+    amount_scale: Decimal = Decimal(1),
+) -> Iterator[SettlementRow]:
+    """
+    Streams settlement records from a JSON lines file, one JSON object per line.
+    """
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON on line {line_number}: {e}") from e
+        if not isinstance(record, dict):
+            raise ValueError(f"Expected a JSON object on line {line_number}")
+        reference = record.get(ref_column)
+        if reference is None:
+            raise ValueError(f"Missing {ref_column} on line {line_number}")
+        yield (
+            str(reference).strip(),
+            _parse_amount(record.get(amount_column), amount_scale, line_number),
+            normalize_gateway_status(record.get(status_column)),
+            line_number,
+        )
+
+
+def iter_database_transactions(
+    key_field: str = "transaction_ref",
+    gateway_name: Optional[str] = None,
+    created_after=None,
+    created_before=None,
+    chunk_size: int = 5000,
+) -> Iterator[DatabaseRow]:
+    """
+    Streams PaymentTransaction rows sorted by the reconciliation key.
+    values_list() with iterator() avoids model instantiation and caching of the
+    whole queryset, so memory stays bounded by chunk_size.
+    """
+    if key_field not in RECONCILIATION_KEY_FIELDS:
+        raise ValueError(
+            f"Reconciliation key must be one of {RECONCILIATION_KEY_FIELDS}, got {key_field}"
+        )
+
+    queryset = PaymentTransaction.objects.filter(**{f"{key_field}__isnull": False})
+    if gateway_name:
+        queryset = queryset.filter(gateway_name=gateway_name)
+    if created_after:
+        queryset = queryset.filter(created_at__gte=created_after)
+    if created_before:
+        queryset = queryset.filter(created_at__lt=created_before)
+
+    collation = BINARY_COLLATIONS.get(connection.vendor)
+    ordering = Collate(F(key_field), collation) if collation else F(key_field)
+    rows = (
+        queryset.order_by(ordering)
+        .values_list(key_field, "amount", "status")
+        .iterator(chunk_size=chunk_size)
+    )
+    for reference, amount, status in rows:
+        yield reference, amount, normalize_gateway_status(status)
+
+
+def merge_join(
+    settlement_rows: Iterable[SettlementRow],
+    database_rows: Iterable[DatabaseRow],
+    summary: Optional[ReconciliationSummaryDTO] = None,
+) -> Iterator[ReconciliationMismatchDTO]:
+    """
+    Merge-joins two streams sorted ascending by reference and yields mismatches.
+    Only the current row of each side is held in memory.
+    :raises ValueError: If the settlement stream is not sorted by reference.
+    """
+    if summary is None:
+        summary = ReconciliationSummaryDTO()
+    mismatches = summary.mismatches
+
+    settlement_iter = iter(settlement_rows)
+    database_iter = iter(database_rows)
+    settlement = next(settlement_iter, None)
+    database = next(database_iter, None)
+    previous_ref = None
+
+    while settlement is not None or database is not None:
+        if settlement is not None and previous_ref is not None:
+            if settlement[0] == previous_ref:
+                summary.settlement_rows += 1
+                mismatches[DUPLICATE_IN_SETTLEMENT] += 1
+                yield ReconciliationMismatchDTO(
+                    kind=DUPLICATE_IN_SETTLEMENT,
+                    reference=settlement[0],
+                    settlement_amount=settlement[1],
+                    settlement_status=settlement[2],
+                    line_number=settlement[3],
+                )
+                settlement = next(settlement_iter, None)
+                continue
+            if settlement[0] < previous_ref:
+                raise ValueError(
+                    f"Settlement file is not sorted by reference at line {settlement[3]}"
+                )
+
+        if database is None or (settlement is not None and settlement[0] < database[0]):
+            summary.settlement_rows += 1
+            mismatches[MISSING_IN_DATABASE] += 1
+            yield ReconciliationMismatchDTO(
+                kind=MISSING_IN_DATABASE,
+                reference=settlement[0],
+                settlement_amount=settlement[1],
+                settlement_status=settlement[2],
+                line_number=settlement[3],
+            )
+            previous_ref = settlement[0]
+            settlement = next(settlement_iter, None)
+        elif settlement is None or database[0] < settlement[0]:
+            summary.database_rows += 1
+            mismatches[MISSING_IN_SETTLEMENT] += 1
+            yield ReconciliationMismatchDTO(
+                kind=MISSING_IN_SETTLEMENT,
+                reference=database[0],
+                database_amount=database[1],
+                database_status=database[2],
+            )
+            database = next(database_iter, None)
+        else:
+            summary.settlement_rows += 1
+            summary.database_rows += 1
+            reference, settlement_amount, settlement_status, line_number = settlement
+            _, database_amount, database_status = database
+            matched = True
+            if settlement_amount != database_amount:
+                matched = False
+                mismatches[AMOUNT_MISMATCH] += 1
+                yield ReconciliationMismatchDTO(
+                    kind=AMOUNT_MISMATCH,
+                    reference=reference,
+                    settlement_amount=settlement_amount,
+                    database_amount=database_amount,
+                    line_number=line_number,
+                )
+            if settlement_status != database_status:
+                matched = False
+                mismatches[STATUS_MISMATCH] += 1
+                yield ReconciliationMismatchDTO(
+                    kind=STATUS_MISMATCH,
+                    reference=reference,
+                    settlement_status=settlement_status,
+                    database_status=database_status,
+                    line_number=line_number,
+                )
+            if matched:
+                summary.matched += 1
+            previous_ref = reference
+            settlement = next(settlement_iter, None)
+            database = next(database_iter, None)
+
+
+def reconcile_settlement_file(
+    stream: TextIO,
+    file_format: str = "csv",
+    key_field: str = "transaction_ref",
+    gateway_name: Optional[str] = None,
+    created_after=None,
+    created_before=None,
+    ref_column: str = "reference",
+    amount_column: str = "amount",
+    status_column: str = "status",
+    amount_scale: Decimal = Decimal(1),
+    summary: Optional[ReconciliationSummaryDTO] = None,
+) -> Iterator[ReconciliationMismatchDTO]:
+    """
+    Reconciles a settlement file against PaymentTransaction rows.
+    The settlement file must be sorted by the reference column (e.g. `sort -t, -k1,1`
+    with LC_ALL=C). Mismatches are yielded as they are found.
+    """
+    readers = {"csv": read_settlement_csv, "jsonl": read_settlement_jsonl}
+    if file_format not in readers:
+        raise ValueError(f"Unsupported settlement file format: {file_format}")
+
+    settlement_rows = readers[file_format](
+        stream,
+        ref_column=ref_column,
+        amount_column=amount_column,
+        status_column=status_column,
+        amount_scale=amount_scale,
+    )
+    database_rows = iter_database_transactions(
+        key_field=key_field,
+        gateway_name=gateway_name,
+        created_after=created_after,
+        created_before=created_before,
+    )
+    return merge_join(settlement_rows, database_rows, summary)
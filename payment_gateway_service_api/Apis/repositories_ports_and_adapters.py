@@ -1,8 +1,10 @@
+import threading
 from abc import ABC, abstractmethod
-from typing import Optional, Any
-from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+from dataclasses import dataclass, replace
 from django.contrib.auth import get_user_model
 from Orders.models import PaymentTransaction, Orders
+from .tracing import traced
 import logging
 
 logger = logging.getLogger(__name__)
@@ -129,6 +131,7 @@ class DjangoClientRepositoryAdapter(ClientRepositoryInterface):
     and retrieve the latest order for a client.
     """
 
+    @traced
     def get_client_by_email(self, email: str) -> Optional[ClientDTO]:
         """Retrieve client details by email.
         Args:
@@ -138,16 +141,17 @@ class DjangoClientRepositoryAdapter(ClientRepositoryInterface):
         """
         try:
             client_model = ClientModel.objects.get(email=email)
-            logger.info(f"Client found: {client_model.email}")
+            logger.info("Client found: %s", client_model.email)
             return ClientDTO(
                 id=client_model.pk,
                 email=client_model.email,
                 full_name=client_model.get_full_name(),
             )
         except ClientModel.DoesNotExist:
-            logger.error(f"Client with email {email} does not exist.")
+            logger.error("Client with email %s does not exist.", email)
             return None
 
+    @traced
     def get_transaction_by_id(self, transaction_ref):
         """Retrieve a payment transaction by its Internal Transaction ID- UUID.
         Args:
@@ -157,17 +161,19 @@ class DjangoClientRepositoryAdapter(ClientRepositoryInterface):
         Raises:
             ValueError: If the transaction reference is not found in the webhook data.
         """
-        transaction_model = PaymentTransaction.objects.get(
+        transaction_model = PaymentTransaction.objects.filter(
             transaction_ref=transaction_ref
-        )
+        ).first()
         if not transaction_model:
             logger.error(
-                f"Transaction reference {transaction_ref} not found in the webhook data."
+                "Transaction reference %s not found in the webhook data.",
+                transaction_ref,
             )
             raise ValueError("Transaction reference not found in the webhook data")
-        logger.info(f"Transaction found: {transaction_model.transaction_ref}")
+        logger.info("Transaction found: %s", transaction_model.transaction_ref)
         return transaction_model.pk
 
+    @traced
     def get_latest_order_and_amount_for_client(
         self, client_id: Any
     ) -> list[int | None]:
@@ -184,13 +190,17 @@ class DjangoClientRepositoryAdapter(ClientRepositoryInterface):
                 float(order.total_amount) if order.total_amount is not None else 0.0
             )
             logger.info(
-                f"Latest order found for client ID {client_id}: Order ID {order.pk}, Amount {amount}"
+                "Latest order found for client ID %s: Order ID %s, Amount %s",
+                client_id,
+                order.pk,
+                amount,
             )
             return [order.pk, amount]
         except Orders.DoesNotExist:
-            logger.error(f"No orders found for client ID {client_id}.")
+            logger.error("No orders found for client ID %s.", client_id)
             return [None, None]
 
+    @traced
     def create_payment_transaction(
         self, transaction_data: CreateTransactionDTO
     ) -> PaymentTransactionDTO:
@@ -212,7 +222,9 @@ class DjangoClientRepositoryAdapter(ClientRepositoryInterface):
         if not transaction_model:
             logger.error("Failed to create payment transaction.")
             raise ValueError("Failed to create payment transaction.")
-        logger.info(f"Payment transaction created: {transaction_model.transaction_ref}")
+        logger.info(
+            "Payment transaction created: %s", transaction_model.transaction_ref
+        )
         return PaymentTransactionDTO(
             id=transaction_model.pk,
             transaction_ref=transaction_model.transaction_ref,
@@ -224,6 +236,7 @@ class DjangoClientRepositoryAdapter(ClientRepositoryInterface):
             gateway_ref=transaction_model.gateway_ref,
         )
 
+    @traced
     def update_payment_transaction(
         self, transaction_id: Any, update_data: UpdateTransactionDTO
     ) -> PaymentTransactionDTO:
@@ -249,7 +262,7 @@ class DjangoClientRepositoryAdapter(ClientRepositoryInterface):
 
             transaction_model.save()
             logger.info(
-                f"Payment transaction updated: {transaction_model.transaction_ref}"
+                "Payment transaction updated: %s", transaction_model.transaction_ref
             )
             return PaymentTransactionDTO(
                 id=transaction_model.pk,
@@ -263,6 +276,96 @@ class DjangoClientRepositoryAdapter(ClientRepositoryInterface):
             )
         except PaymentTransaction.DoesNotExist:
             logger.error(
-                f"Payment transaction with ID {transaction_id} does not exist."
+                "Payment transaction with ID %s does not exist.", transaction_id
+            )
+            return None
+
+
+class InMemoryClientRepositoryAdapter(ClientRepositoryInterface):
+    """In-memory adapter for the ClientRepositoryInterface.
+    Records live in lists indexed by id - 1, with dict indexes by email and
+    transaction reference, so every lookup is O(1) and involves no database.
+    Useful as a fast test double and for benchmarking the core layer on its own.
+    Clients and orders are added with add_client() and add_order().
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clients: List[ClientDTO] = []
+        self._client_ids_by_email: Dict[str, int] = {}
+        self._orders: List[Tuple[int, Any, float]] = []
+        self._latest_order_by_client: Dict[Any, int] = {}
+        self._transactions: List[PaymentTransactionDTO] = []
+        self._transaction_ids_by_ref: Dict[str, int] = {}
+
+    def add_client(self, email: str, full_name: str) -> ClientDTO:
+        with self._lock:
+            client = ClientDTO(
+                id=len(self._clients) + 1, email=email, full_name=full_name
+            )
+            self._clients.append(client)
+            self._client_ids_by_email[email] = client.id
+            return client
+
+    def add_order(self, client_id: Any, amount: float) -> int:
+        """Adds an order for a client; it becomes the client's latest order."""
+        with self._lock:
+            order_id = len(self._orders) + 1
+            self._orders.append((order_id, client_id, amount))
+            self._latest_order_by_client[client_id] = order_id
+            return order_id
+
+    def get_client_by_email(self, email: str) -> Optional[ClientDTO]:
+        client_id = self._client_ids_by_email.get(email)
+        if client_id is None:
+            return None
+        return self._clients[client_id - 1]
+
+    def get_transaction_by_id(self, transaction_ref):
+        """Returns the id of the transaction with this reference, or None."""
+        return self._transaction_ids_by_ref.get(transaction_ref)
+
+    def get_latest_order_and_amount_for_client(
+        self, client_id: Any
+    ) -> list[int | None]:
+        order_id = self._latest_order_by_client.get(client_id)
+        if order_id is None:
+            return [None, None]
+        return [order_id, self._orders[order_id - 1][2]]
+
+    def create_payment_transaction(
+        self, transaction_data: CreateTransactionDTO
+    ) -> PaymentTransactionDTO:
+        with self._lock:
+            transaction = PaymentTransactionDTO(
+                id=len(self._transactions) + 1,
+                transaction_ref=transaction_data.transaction_ref,
+                amount=transaction_data.amount,
+                client_id=transaction_data.client_id,
+                order_id=transaction_data.order_id,
+                status="pending",
+                gateway_name=transaction_data.gateway_name,
             )
+            self._transactions.append(transaction)
+            self._transaction_ids_by_ref[transaction.transaction_ref] = transaction.id
+            return transaction
+
+    def update_payment_transaction(
+        self, transaction_id: Any, update_data: UpdateTransactionDTO
+    ) -> PaymentTransactionDTO:
+        """Returns the updated transaction, or None if there is no such transaction."""
+        if not 0 < transaction_id <= len(self._transactions):
             return None
+        changes = {
+            key: value
+            for key, value in (
+                ("status", update_data.status),
+                ("gateway_ref", update_data.gateway_ref),
+                ("amount", update_data.amount),
+            )
+            if value is not None
+        }
+        with self._lock:
+            transaction = replace(self._transactions[transaction_id - 1], **changes)
+            self._transactions[transaction_id - 1] = transaction
+            return transaction
@@ -0,0 +1,392 @@
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from dataclasses import asdict, dataclass
+from typing import Callable, ContextManager, Dict, List, Optional, Tuple, TypeVar
+from django.conf import settings
+import requests
+from urllib3.exceptions import NewConnectionError
+from .metrics import BULKHEAD_REJECTIONS
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class GatewayRetryableError(Exception):
+    """
+    Raised when a gateway call was not attempted or was abandoned in a way that
+    is safe to retry, e.g. the gateway's bulkhead was full.
+    - retry_after: Suggested number of seconds to wait before retrying.
+    """
+
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class Deadline:
+    """
+    Absolute point in (monotonic) time by which a request must have finished.
+    Created once when a request enters the service and passed down to the adapters.
+    """
+
+    def __init__(self, expires_at: float):
+        self.expires_at = expires_at
+
+    @classmethod
+    def after(cls, seconds: float) -> "Deadline":
+        return cls(time.monotonic() + seconds)
+
+    def remaining(self) -> float:
+        return self.expires_at - time.monotonic()
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+
+@dataclass
+class BulkheadStatsDTO:
+    """Data Transfer Object describing the occupancy of a bulkhead.
+    - name: Name of the gateway the bulkhead protects.
+    - max_concurrent: Maximum number of calls running at once.
+    - max_queue: Maximum number of calls waiting for a slot.
+    - in_flight: Number of calls currently running.
+    - queued: Number of calls currently waiting for a slot.
+    - rejected: Total number of calls rejected since start up.
+    - avg_service_time: Moving average of call duration in seconds.
+    """
+
+    name: str
+    max_concurrent: int
+    max_queue: int
+    in_flight: int
+    queued: int
+    rejected: int
+    avg_service_time: float
+
+
+class Bulkhead:
+    """
+    Bounds the number of concurrent calls to one gateway, with a bounded wait queue.
+    A slow gateway can then only tie up max_concurrent + max_queue worker threads,
+    leaving the rest for other gateways. Callers whose deadline would expire
+    while queued are rejected straight away with a GatewayRetryableError.
+    """
+
+    # Weight of the latest call in the moving average of service time
+    SMOOTHING = 0.2
+
+    def __init__(self, name: str, max_concurrent: int, max_queue: int):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self._condition = threading.Condition()
+        self._in_flight = 0
+        self._queued = 0
+        self._rejected = 0
+        self._avg_service_time = 0.0
+
+    def _reject(self, reason: str, retry_after: float):
+        self._rejected += 1
+        BULKHEAD_REJECTIONS.inc(self.name)
+        logger.warning("Bulkhead %s rejected a call: %s", self.name, reason)
+        raise GatewayRetryableError(
+            f"{self.name} is busy: {reason}", retry_after=max(retry_after, 1.0)
+        )
+
+    def acquire(self, deadline: Optional[Deadline] = None):
+        """
+        Takes a slot, waiting in the queue if all slots are busy.
+        :raises GatewayRetryableError: If the queue is full, the deadline would
+            expire before a slot is expected to free up, or it expires while waiting.
+        """
+        with self._condition:
+            if self._in_flight < self.max_concurrent:
+                self._in_flight += 1
+                return
+
+            # Every call queued ahead of us, and we ourselves, need a slot to free up
+            estimated_wait = (
+                self._avg_service_time * (self._queued + 1) / self.max_concurrent
+            )
+            if self._queued >= self.max_queue:
+                self._reject("wait queue is full", estimated_wait)
+            if deadline is not None and deadline.remaining() <= estimated_wait:
+                self._reject("deadline would expire while queued", estimated_wait)
+
+            self._queued += 1
+            try:
+                while self._in_flight >= self.max_concurrent:
+                    timeout = deadline.remaining() if deadline is not None else None
+                    if timeout is not None and timeout <= 0:
+                        self._reject("deadline expired while queued", estimated_wait)
+                    self._condition.wait(timeout)
+                self._in_flight += 1
+            finally:
+                self._queued -= 1
+
+    def release(self, service_time: float):
+        with self._condition:
+            self._in_flight -= 1
+            self._avg_service_time += self.SMOOTHING * (
+                service_time - self._avg_service_time
+            )
+            self._condition.notify()
+
+    @contextmanager
+    def slot(self, deadline: Optional[Deadline] = None):
+        """Context manager running the enclosed gateway call inside a bulkhead slot."""
+        self.acquire(deadline)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - started)
+
+    def stats(self) -> BulkheadStatsDTO:
+        with self._condition:
+            return BulkheadStatsDTO(
+                name=self.name,
+                max_concurrent=self.max_concurrent,
+                max_queue=self.max_queue,
+                in_flight=self._in_flight,
+                queued=self._queued,
+                rejected=self._rejected,
+                avg_service_time=round(self._avg_service_time, 6),
+            )
+
+
+_bulkheads: Dict[str, Bulkhead] = {}
+_bulkheads_lock = threading.Lock()
+
+
+def get_bulkhead(gateway_name: str) -> Bulkhead:
+    """
+    Returns the process-wide bulkhead for a gateway, sized from GATEWAY_BULKHEADS.
+    Gateways without their own entry use the "default" entry.
+    """
+    bulkhead = _bulkheads.get(gateway_name)
+    if bulkhead is not None:
+        return bulkhead
+    with _bulkheads_lock:
+        if gateway_name not in _bulkheads:
+            config = settings.GATEWAY_BULKHEADS.get(
+                gateway_name, settings.GATEWAY_BULKHEADS["default"]
+            )
+            _bulkheads[gateway_name] = Bulkhead(
+                gateway_name,
+                max_concurrent=config["MAX_CONCURRENT"],
+                max_queue=config["MAX_QUEUE"],
+            )
+        return _bulkheads[gateway_name]
+
+
+def bulkhead_stats() -> List[dict]:
+    """Returns the occupancy and rejection counts of every bulkhead in this process."""
+    return [asdict(bulkhead.stats()) for bulkhead in list(_bulkheads.values())]
+
+
+T = TypeVar("T")
+
+# Gateway responses worth retrying for idempotent calls
+RETRYABLE_HTTP_STATUSES = (429, 502, 503, 504)
+
+
+class LatencyTracker:
+    """
+    Keeps the most recent call durations of a gateway and their p99.
+    The percentile is recomputed every `recompute_every` samples rather than on
+    each call so that tracking stays cheap on the request path.
+    """
+
+    def __init__(self, window: int = 500, recompute_every: int = 50):
+        self._samples = deque(maxlen=window)
+        self._recompute_every = recompute_every
+        self._since_recompute = 0
+        self._p99: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def observe(self, duration: float):
+        with self._lock:
+            self._samples.append(duration)
+            self._since_recompute += 1
+            if self._since_recompute >= self._recompute_every:
+                self._since_recompute = 0
+                ordered = sorted(self._samples)
+                self._p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+
+    def p99(self) -> Optional[float]:
+        return self._p99
+
+
+def is_connect_failure(error: Exception) -> bool:
+    """
+    True if the request never reached the gateway, so even a non-idempotent call
+    (e.g. a charge) can be retried safely.
+    """
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    if isinstance(error, requests.exceptions.ConnectionError):
+        reason = getattr(error.args[0], "reason", None) if error.args else None
+        return isinstance(reason, NewConnectionError)
+    return False
+
+
+class GatewayCallPolicy:
+    """
+    Timeout, retry and deadline budget policy for calls to one gateway.
+
+    - Every attempt gets a connect timeout and a read timeout. Once enough
+      samples have been seen the read timeout follows the gateway's observed p99
+      (times p99_multiplier, clamped to [min_read_timeout, max_read_timeout]).
+    - All attempts together must fit in the request's deadline, or in
+      deadline_budget seconds when the caller did not pass one.
+    - Only safe failures are retried, with full-jitter exponential backoff:
+      connection failures for any call, plus timeouts and 429/5xx gateway
+      responses for idempotent calls such as verifications.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        connect_timeout: float = 3.05,
+        read_timeout: float = 10.0,
+        min_read_timeout: float = 2.0,
+        max_read_timeout: float = 30.0,
+        p99_multiplier: float = 2.0,
+        deadline_budget: float = 20.0,
+        max_attempts: int = 3,
+        backoff_base: float = 0.1,
+        backoff_cap: float = 2.0,
+    ):
+        self.name = name
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.min_read_timeout = min_read_timeout
+        self.max_read_timeout = max_read_timeout
+        self.p99_multiplier = p99_multiplier
+        self.deadline_budget = deadline_budget
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.latency = LatencyTracker()
+
+    def current_read_timeout(self) -> float:
+        p99 = self.latency.p99()
+        if p99 is None:
+            return self.read_timeout
+        return min(
+            self.max_read_timeout,
+            max(self.min_read_timeout, p99 * self.p99_multiplier),
+        )
+
+    def timeouts_for(self, deadline: Deadline) -> Tuple[float, float]:
+        """
+        Connect and read timeouts of an attempt starting now, cut to what is left
+        of the deadline.
+        :raises GatewayRetryableError: If nothing is left of the deadline.
+        """
+        remaining = deadline.remaining()
+        if remaining <= 0:
+            raise GatewayRetryableError(f"Deadline budget for {self.name} exhausted")
+        return (
+            min(self.connect_timeout, remaining),
+            min(self.current_read_timeout(), remaining),
+        )
+
+    def should_retry(self, error: Exception, idempotent: bool) -> bool:
+        if is_connect_failure(error):
+            return True
+        if not idempotent:
+            return False
+        if isinstance(error, requests.exceptions.HTTPError):
+            return (
+                error.response is not None
+                and error.response.status_code in RETRYABLE_HTTP_STATUSES
+            )
+        return isinstance(
+            error, (requests.exceptions.Timeout, requests.exceptions.ConnectionError)
+        )
+
+    def backoff(self, attempt: int) -> float:
+        return random.uniform(
+            0, min(self.backoff_cap, self.backoff_base * 2 ** (attempt - 1))
+        )
+
+    def execute(
+        self,
+        send: Callable[[Tuple[float, float]], T],
+        idempotent: bool = False,
+        deadline: Optional[Deadline] = None,
+        slot: Optional[Callable[[Deadline], ContextManager]] = None,
+    ) -> T:
+        """
+        Calls send((connect_timeout, read_timeout)) under this policy.
+        :param slot: Context manager each attempt runs in, e.g. Bulkhead.slot. The
+            timeouts are computed once it is entered, so that time spent waiting
+            for it comes out of the deadline.
+        :raises GatewayRetryableError: If the deadline budget runs out before an
+            attempt, or slot rejects it.
+        :raises requests.exceptions.RequestException: The last error, once it is
+            not retryable or the attempts or budget are exhausted.
+        """
+        deadline = deadline or Deadline.after(self.deadline_budget)
+        attempt = 0
+        while True:
+            attempt += 1
+            if deadline.expired:
+                raise GatewayRetryableError(
+                    f"Deadline budget for {self.name} exhausted after {attempt - 1} attempts"
+                )
+            try:
+                with slot(deadline) if slot is not None else nullcontext():
+                    timeouts = self.timeouts_for(deadline)
+                    started = time.monotonic()
+                    result = send(timeouts)
+            except requests.exceptions.RequestException as e:
+                if isinstance(e, requests.exceptions.Timeout):
+                    self.latency.observe(time.monotonic() - started)
+                delay = self.backoff(attempt)
+                if (
+                    attempt >= self.max_attempts
+                    or not self.should_retry(e, idempotent)
+                    or delay >= deadline.remaining()
+                ):
+                    raise
+                logger.warning(
+                    "Retrying %s call in %.3fs after attempt %s failed: %s",
+                    self.name,
+                    delay,
+                    attempt,
+                    e,
+                )
+                time.sleep(delay)
+                continue
+            self.latency.observe(time.monotonic() - started)
+            return result
+
+
+_call_policies: Dict[str, GatewayCallPolicy] = {}
+_call_policies_lock = threading.Lock()
+
+
+def get_call_policy(gateway_name: str) -> GatewayCallPolicy:
+    """
+    Returns the process-wide call policy for a gateway, configured from
+    GATEWAY_CALL_POLICIES. Gateways without their own entry use the "default" entry.
+    """
+    policy = _call_policies.get(gateway_name)
+    if policy is not None:
+        return policy
+    with _call_policies_lock:
+        if gateway_name not in _call_policies:
+            config = settings.GATEWAY_CALL_POLICIES.get(
+                gateway_name, settings.GATEWAY_CALL_POLICIES["default"]
+            )
+            _call_policies[gateway_name] = GatewayCallPolicy(
+                gateway_name, **{key.lower(): value for key, value in config.items()}
+            )
+        return _call_policies[gateway_name]
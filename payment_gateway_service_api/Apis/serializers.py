@@ -93,6 +93,7 @@ class BankTransferSerializers(serializers.Serializer):
     email = serializers.EmailField()
     currency = serializers.CharField(max_length=3, default="NGN")
     is_permanent = serializers.BooleanField(default=False)
+    bank_token = serializers.CharField(max_length=100, required=False)
 
 
 class BankTransferOutputSerializers(serializers.Serializer):
@@ -1,13 +1,36 @@
 from typing import Dict, Any
 import random
-from .payments_ports_and_adapters import FlutterWaveAdapter, PayStackAdapter
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from .gateway_registry import gateway_names, get_gateway_class
+from .payments_ports_and_adapters import PaymentGatewayInterface
 from .repositories_ports_and_adapters import DjangoClientRepositoryAdapter
 from .core_logic import PaymentServiceCore, InitialPaymentRequestDTO
+from .metrics import WEBHOOK_LAG
+from .pre_checks_ports_and_adapters import get_pre_checks
+from .resilience import Deadline
+from .tracing import traced
+from .verification_cache import verification_cache
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+def get_gateway_adapter(gateway_name: str) -> PaymentGatewayInterface:
+    """
+    Returns a new adapter for a gateway of PAYMENT_GATEWAYS, or a
+    SimulatedGatewayAdapter standing in for it when GATEWAY_SIMULATOR_ENABLED
+    is set. Each adapter reads its credentials from settings when created.
+    """
+    if settings.GATEWAY_SIMULATOR_ENABLED:
+        from .simulated_gateway import SimulatedGatewayAdapter
+
+        return SimulatedGatewayAdapter(gateway_name)
+    return get_gateway_class(gateway_name)()
+
+
+@traced(name="services.initiate_payment")
 def initiate_payment(validated_data) -> Dict[str, Any]:
     """
     Initiates a payment process for a client. FOllowing SRP
@@ -15,17 +38,17 @@ def initiate_payment(validated_data) -> Dict[str, Any]:
     by interacting with the payment gateway and client repository adapters.
     """
 
-    if random.random() < 0.5:
-        payment_gateway_adapter = PayStackAdapter()
-        payment_gateway_name = "PayStack"
-    else:
-        payment_gateway_adapter = FlutterWaveAdapter()
-        payment_gateway_name = "FlutterWave"
+    # Payments are spread evenly over the gateways of PAYMENT_GATEWAYS
+    gateways = gateway_names()
+    payment_gateway_name = gateways[int(random.random() * len(gateways))]
+    payment_gateway_adapter = get_gateway_adapter(payment_gateway_name)
 
     client_repo_adapter = DjangoClientRepositoryAdapter()
 
     payment_service = PaymentServiceCore(
-        gateway_adapter=payment_gateway_adapter, client_repository=client_repo_adapter
+        gateway_adapter=payment_gateway_adapter,
+        client_repository=client_repo_adapter,
+        pre_checks=get_pre_checks(),
     )
 
     try:
@@ -34,6 +57,8 @@ def initiate_payment(validated_data) -> Dict[str, Any]:
             currency=validated_data["currency"],
             is_permanent=validated_data.get("is_permanent", False),
             payment_gateway_name=payment_gateway_name,
+            deadline=Deadline.after(settings.GATEWAY_REQUEST_DEADLINE_SECONDS),
+            bank_token=validated_data.get("bank_token"),
         )
 
         response_dto = payment_service.initiate_payment(initial_request_dto)
@@ -43,30 +68,45 @@ def initiate_payment(validated_data) -> Dict[str, Any]:
             "gateway_response": response_dto.gateway_response.raw_response,
         }
         logger.info(
-            f"Payment initiated successfully: {output_response_dict['transaction_ref']}"
+            "Payment initiated successfully: %s",
+            output_response_dict["transaction_ref"],
         )
         return output_response_dict
 
     except ValueError as e:
-        logger.error(f"Error initiating payment: {str(e)}")
+        logger.error("Error initiating payment: %s", e)
         return {"error": str(e)}
 
 
-def update_model_from_webhook(request_data):
+def record_webhook_lag(gateway_name: str, request_data) -> None:
+    """
+    Records the time between the gateway creating an event and us processing it.
+    FlutterWave and Paystack both send data.created_at; Paystack also sends paid_at.
+    """
+    data = request_data.get("data") or {}
+    event_time = data.get("paid_at") or data.get("created_at")
+    created_at = parse_datetime(event_time) if isinstance(event_time, str) else None
+    if created_at is None:
+        return
+    if timezone.is_naive(created_at):
+        created_at = timezone.make_aware(created_at, timezone.utc)
+    lag = (timezone.now() - created_at).total_seconds()
+    WEBHOOK_LAG.observe(max(lag, 0.0), gateway_name)
+
+
+@traced(name="services.update_model_from_webhook")
+def update_model_from_webhook(request_data, gateway_name):
     """
     Handles updating data using information gotten from the payment gateway webhook.
-    This function determines which payment gateway adapter to use based on the
-    presence of a transaction reference in the request data. It then uses the
-    appropriate adapter to update the payment transaction model in the database.
+    This function uses the adapter of the gateway the webhook came from, as
+    established by its route or signature, which validates the event against
+    the gateway's webhook schema. It then updates the payment transaction
+    model in the database.
     This function follows the Single Responsibility Principle (SRP) by focusing
     solely on updating the model from the webhook data, without mixing in other
     responsibilities such as initiating payments or handling business logic.
     """
-    transaction_ref = request_data.get("data", {}).get("tx_ref", "")
-    if transaction_ref:
-        payment_gateway_adapter = FlutterWaveAdapter()
-    else:
-        payment_gateway_adapter = PayStackAdapter()
+    payment_gateway_adapter = get_gateway_adapter(gateway_name)
     client_repo_adapter = DjangoClientRepositoryAdapter()
 
     payment_service = PaymentServiceCore(
@@ -79,18 +119,23 @@ def update_model_from_webhook(request_data):
             request_data
         )
         if payment_transaction_dto:
+            record_webhook_lag(payment_gateway_adapter.gateway_name, request_data)
+            # The webhook may have settled a payment whose pending verification is cached
+            verification_cache.invalidate(
+                payment_gateway_adapter.gateway_name,
+                payment_transaction_dto.transaction_ref,
+            )
             logger.info(
-                f"Successfully updated model from webhook for transaction: {transaction_ref}"
+                "Successfully updated model from webhook for transaction: %s",
+                payment_transaction_dto.transaction_ref,
             )
             response = {"message": "Successfully updated model", "status": "Success"}
         else:
-            logger.warning(
-                f"Transaction model not found for transaction reference: {transaction_ref}"
-            )
+            logger.warning("Transaction model not found for %s webhook", gateway_name)
             response = {"message": "Transaction model not found", "status": "Failed"}
 
         return response
 
     except ValueError as e:
-        logger.error(f"Error updating model from webhook: {str(e)}")
+        logger.error("Error updating model from webhook: %s", e)
         raise ValueError(str(e)) from e
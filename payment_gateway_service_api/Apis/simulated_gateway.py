@@ -0,0 +1,312 @@
+import math
+import random
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional
+from django.conf import settings
+import requests
+from .flutterwave_adapter import FlutterWaveAdapter
+from .payments_ports_and_adapters import (
+    GatewayProcessPaymentResponseDTO,
+    GatewayVerificationDTO,
+    GatewayWebhookEventDTO,
+    PaymentDetails,
+    PaymentGatewayInterface,
+)
+from .paystack_adapter import PayStackAdapter
+from . import json_codec, webhook_signatures
+from .tracing import traced
+from .transport import gateway_call, get_http_session
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Adapters whose webhook and verification formats the simulator reproduces
+SIMULATED_FORMATS = {"PayStack": PayStackAdapter, "FlutterWave": FlutterWaveAdapter}
+
+
+class LatencyDistribution:
+    """
+    Programmable latency, in milliseconds. Supported distributions:
+    - constant: {"MS": 100}
+    - uniform: {"MIN_MS": 50, "MAX_MS": 150}
+    - normal: {"MEAN_MS": 100, "STDDEV_MS": 20}
+    - lognormal: {"MEDIAN_MS": 100, "SIGMA": 0.5}, long tailed like real gateways
+    - exponential: {"MEAN_MS": 100}
+    """
+
+    def __init__(self, distribution: str = "constant", **params):
+        self.distribution = distribution
+        self.params = params
+        if distribution not in (
+            "constant",
+            "uniform",
+            "normal",
+            "lognormal",
+            "exponential",
+        ):
+            raise ValueError(f"Unknown latency distribution {distribution}")
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "LatencyDistribution":
+        params = {key.lower(): value for key, value in config.items()}
+        return cls(params.pop("distribution", "constant"), **params)
+
+    def sample_ms(self, rng: random.Random) -> float:
+        p = self.params
+        if self.distribution == "constant":
+            value = p.get("ms", 0.0)
+        elif self.distribution == "uniform":
+            value = rng.uniform(p["min_ms"], p["max_ms"])
+        elif self.distribution == "normal":
+            value = rng.gauss(p["mean_ms"], p["stddev_ms"])
+        elif self.distribution == "lognormal":
+            value = rng.lognormvariate(math.log(p["median_ms"]), p["sigma"])
+        else:
+            value = rng.expovariate(1.0 / p["mean_ms"])
+        return max(value, 0.0)
+
+
+@dataclass
+class GatewaySimulationProfile:
+    """Behaviour of one simulated gateway.
+    - latency: Distribution of call latency.
+    - timeout_rate: Fraction of calls that hang until the caller's read timeout.
+    - error_rate: Fraction of calls answered with HTTP 503.
+    - decline_rate: Fraction of payments the gateway declines straight away.
+    - failed_payment_rate: Fraction of accepted payments that later fail.
+    - webhook_delay_seconds: Delay before the final webhook is emitted;
+      None disables webhook emission.
+    - seed: Seed of the profile's random generator, for reproducible runs.
+    """
+
+    latency: LatencyDistribution = field(default_factory=LatencyDistribution)
+    timeout_rate: float = 0.0
+    error_rate: float = 0.0
+    decline_rate: float = 0.0
+    failed_payment_rate: float = 0.0
+    webhook_delay_seconds: Optional[float] = 1.0
+    seed: Optional[int] = None
+
+    # Number of payment outcomes remembered for verification
+    MAX_OUTCOMES = 100000
+
+    def __post_init__(self):
+        self._rng = random.Random(self.seed)
+        self._lock = threading.Lock()
+        self._outcomes = OrderedDict()
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "GatewaySimulationProfile":
+        params = {key.lower(): value for key, value in config.items()}
+        params["latency"] = LatencyDistribution.from_config(params.get("latency", {}))
+        return cls(**params)
+
+    def draw(self) -> Dict[str, Any]:
+        """Draws the latency and fate of one call in a single locked step."""
+        with self._lock:
+            return {
+                "latency": self.latency.sample_ms(self._rng) / 1000,
+                "timeout": self._rng.random() < self.timeout_rate,
+                "error": self._rng.random() < self.error_rate,
+                "declined": self._rng.random() < self.decline_rate,
+                "failed": self._rng.random() < self.failed_payment_rate,
+            }
+
+    def record_outcome(self, transaction_ref: str, status: str):
+        with self._lock:
+            self._outcomes[transaction_ref] = status
+            if len(self._outcomes) > self.MAX_OUTCOMES:
+                self._outcomes.popitem(last=False)
+
+    def outcome(self, transaction_ref: str) -> str:
+        """Final status of a simulated payment, "pending" if unknown."""
+        with self._lock:
+            return self._outcomes.get(transaction_ref, "pending")
+
+
+_profiles: Dict[str, GatewaySimulationProfile] = {}
+_profiles_lock = threading.Lock()
+
+
+def get_simulation_profile(gateway_name: str) -> GatewaySimulationProfile:
+    """
+    Returns the process-wide simulation profile of a gateway, configured from
+    GATEWAY_SIMULATOR_PROFILES. Gateways without their own entry use "default".
+    """
+    profile = _profiles.get(gateway_name)
+    if profile is not None:
+        return profile
+    with _profiles_lock:
+        if gateway_name not in _profiles:
+            config = settings.GATEWAY_SIMULATOR_PROFILES.get(
+                gateway_name, settings.GATEWAY_SIMULATOR_PROFILES["default"]
+            )
+            _profiles[gateway_name] = GatewaySimulationProfile.from_config(config)
+        return _profiles[gateway_name]
+
+
+def post_webhook(payload: Dict[str, Any], gateway_name: str):
+    """
+    Delivers a simulated webhook to this service's webhook endpoint, signed the
+    way the simulated gateway signs it.
+    """
+    body = json_codec.dumps(payload)
+    try:
+        headers = webhook_signatures.signature_headers(gateway_name, body)
+        get_http_session().post(
+            settings.GATEWAY_SIMULATOR_WEBHOOK_URL,
+            data=body,
+            headers={"Content-Type": "application/json", **headers},
+            timeout=10,
+        ).raise_for_status()
+    except (ValueError, requests.exceptions.RequestException) as e:
+        logger.warning("Simulated webhook delivery failed: %s", e)
+
+
+class SimulatedGatewayAdapter(PaymentGatewayInterface):
+    """
+    Implements the PaymentGatewayInterface without any network access.
+
+    Calls take a latency drawn from the gateway's simulation profile and may
+    time out, fail or be declined at the profile's rates. They go through the
+    same bulkhead, timeout and retry policy as real gateway calls. Accepted
+    payments get a webhook, in the format of the simulated gateway, after
+    webhook_delay_seconds.
+    """
+
+    def __init__(
+        self,
+        gateway_name: str,
+        profile: Optional[GatewaySimulationProfile] = None,
+        webhook_sender: Optional[Callable[[Dict[str, Any], str], None]] = None,
+    ):
+        if gateway_name not in SIMULATED_FORMATS:
+            raise ValueError(f"Cannot simulate unknown gateway {gateway_name}")
+        self.gateway_name = gateway_name
+        self.profile = profile or get_simulation_profile(gateway_name)
+        self.webhook_sender = webhook_sender or post_webhook
+        self._format = SIMULATED_FORMATS[gateway_name]()
+
+    def _call(self, deadline, idempotent: bool, respond: Callable[[dict], Any]):
+        def send(timeout):
+            fate = self.profile.draw()
+            read_timeout = timeout[1]
+            if fate["timeout"] or fate["latency"] > read_timeout:
+                time.sleep(read_timeout)
+                raise requests.exceptions.ReadTimeout(
+                    f"Simulated {self.gateway_name} read timeout"
+                )
+            time.sleep(fate["latency"])
+            if fate["error"]:
+                response = requests.Response()
+                response.status_code = 503
+                raise requests.exceptions.HTTPError(
+                    f"Simulated {self.gateway_name} 503", response=response
+                )
+            return respond(fate)
+
+        return gateway_call(
+            self.gateway_name,
+            send,
+            idempotent=idempotent,
+            deadline=deadline,
+            simulated=True,
+        )
+
+    @traced
+    def process_payment(
+        self, payment_details: PaymentDetails
+    ) -> GatewayProcessPaymentResponseDTO:
+        """
+        Simulates a charge, and schedules the final webhook if it is accepted.
+        :param payment_details: PaymentDetails object containing all necessary information for the payment.
+        :return: GatewayProcessPaymentResponseDTO like the simulated gateway's adapter.
+        """
+
+        def respond(fate):
+            gateway_ref = f"SIM-{uuid.uuid4().hex[:12]}"
+            if fate["declined"]:
+                return GatewayProcessPaymentResponseDTO(
+                    success=False,
+                    gateway_ref=None,
+                    raw_response={"status": "error", "message": "Declined"},
+                )
+            final_status = "failed" if fate["failed"] else "success"
+            self.profile.record_outcome(payment_details.tx_ref, final_status)
+            if self.profile.webhook_delay_seconds is not None:
+                self._schedule_webhook(payment_details, gateway_ref, final_status)
+            return GatewayProcessPaymentResponseDTO(
+                success=True,
+                gateway_ref=gateway_ref,
+                raw_response={"status": "success", "simulated": True},
+            )
+
+        return self._call(payment_details.deadline, idempotent=False, respond=respond)
+
+    def _webhook_payload(self, tx_ref, gateway_ref, amount, final_status) -> dict:
+        if self.gateway_name == "FlutterWave":
+            return {
+                "event": "charge.completed",
+                "data": {
+                    "tx_ref": tx_ref,
+                    "flw_ref": gateway_ref,
+                    "status": "successful" if final_status == "success" else "failed",
+                    "amount": amount,
+                },
+            }
+        return {
+            "event": "charge.success",
+            "data": {
+                "reference": tx_ref,
+                "status": final_status,
+                "amount": int(round(amount * 100)),
+                "customer": {"customer_code": gateway_ref},
+            },
+        }
+
+    def _schedule_webhook(self, payment_details, gateway_ref, final_status):
+        payload = self._webhook_payload(
+            payment_details.tx_ref, gateway_ref, payment_details.amount, final_status
+        )
+        timer = threading.Timer(
+            self.profile.webhook_delay_seconds,
+            self.webhook_sender,
+            args=(payload, self.gateway_name),
+        )
+        timer.daemon = True
+        timer.start()
+
+    @traced
+    def handle_webhook(self, request_data) -> GatewayWebhookEventDTO:
+        """Parses a simulated webhook like the simulated gateway's adapter."""
+        return self._format.handle_webhook(request_data)
+
+    @traced
+    def verify_payment(self, transaction_ref: str) -> dict:
+        """
+        Simulates a verification call, reporting the payment's final outcome.
+        :return: A response shaped like the simulated gateway's verification API.
+        """
+
+        def respond(fate):
+            status = self.profile.outcome(transaction_ref)
+            if self.gateway_name == "FlutterWave":
+                return {
+                    "status": "success",
+                    "data": [{"tx_ref": transaction_ref, "status": status}],
+                }
+            return {
+                "status": True,
+                "data": {"reference": transaction_ref, "status": status},
+            }
+
+        return self._call(None, idempotent=True, respond=respond)
+
+    def parse_verification(
+        self, transaction_ref: str, raw_verification: Dict[str, Any]
+    ) -> GatewayVerificationDTO:
+        return self._format.parse_verification(transaction_ref, raw_verification)
@@ -0,0 +1,167 @@
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List, Optional, Set
+
+
+class _SlidingWindow(ABC):
+    """
+    Per-key state over the last `window_seconds`, split into `slots` buckets:
+    what was added stops counting between window_seconds * (1 - 1 / slots) and
+    window_seconds later. Times are Unix timestamps, so that the state can be
+    saved and restored by another process. Not thread-safe: callers hold their
+    own lock.
+    """
+
+    def __init__(self, window_seconds: float, slots: int = 60):
+        self.window_seconds = float(window_seconds)
+        self.slots = slots
+        self.slot_seconds = self.window_seconds / slots
+        self._dirty: Set[str] = set()
+
+    def _slot(self, now: float) -> int:
+        return int(now // self.slot_seconds)
+
+    def _expires_at(self, slot: int) -> float:
+        return (slot + self.slots) * self.slot_seconds
+
+    @abstractmethod
+    def keys(self) -> List[str]:
+        pass
+
+    @abstractmethod
+    def purge(self, now: float):
+        """Drops the keys with nothing left in the window."""
+        pass
+
+    def pop_dirty(self) -> Set[str]:
+        """Keys changed since the last call."""
+        dirty, self._dirty = self._dirty, set()
+        return dirty
+
+    def mark_dirty(self, keys: Iterable[str]):
+        self._dirty.update(keys)
+
+
+class SlidingWindowCounter(_SlidingWindow):
+    """Per-key sums of the values added over the window."""
+
+    def __init__(self, window_seconds: float, slots: int = 60):
+        super().__init__(window_seconds, slots)
+        # Oldest bucket first, as [slot, sum of the values added in it]
+        self._buckets: Dict[str, Deque[List]] = {}
+        self._totals: Dict[str, float] = {}
+
+    def _live(self, key: str, slot: int) -> Optional[Deque[List]]:
+        buckets = self._buckets.get(key)
+        if buckets is None:
+            return None
+        first_live = slot - self.slots + 1
+        while buckets and buckets[0][0] < first_live:
+            self._totals[key] -= buckets.popleft()[1]
+        if not buckets:
+            del self._buckets[key], self._totals[key]
+            return None
+        return buckets
+
+    def total(self, key: str, now: float) -> float:
+        return self._totals[key] if self._live(key, self._slot(now)) else 0.0
+
+    def add(self, key: str, value: float, now: float):
+        slot = self._slot(now)
+        buckets = self._live(key, slot)
+        if buckets is None:
+            buckets = self._buckets[key] = deque()
+            self._totals[key] = 0.0
+        if buckets and buckets[-1][0] == slot:
+            buckets[-1][1] += value
+        else:
+            buckets.append([slot, value])
+        self._totals[key] += value
+        self._dirty.add(key)
+
+    def retry_after(self, key: str, excess: float, now: float) -> float:
+        """Seconds until at least `excess` will have left the window of `key`."""
+        left = 0.0
+        for slot, value in self._live(key, self._slot(now)) or ():
+            left += value
+            if left >= excess:
+                return max(self._expires_at(slot) - now, 0.0)
+        return self.window_seconds
+
+    def keys(self) -> List[str]:
+        return list(self._buckets)
+
+    def purge(self, now: float):
+        slot = self._slot(now)
+        for key in self.keys():
+            self._live(key, slot)
+
+    def state(self, key: str) -> List[List]:
+        return [list(bucket) for bucket in self._buckets.get(key, ())]
+
+    def expires_at(self, key: str) -> float:
+        """When everything currently counted for `key` will have left the window."""
+        return self._expires_at(self._buckets[key][-1][0])
+
+    def load(self, key: str, state: List[List]):
+        self._buckets[key] = deque([slot, value] for slot, value in sorted(state))
+        self._totals[key] = sum(value for _, value in state)
+
+
+class DistinctWindowCounter(_SlidingWindow):
+    """Per-key numbers of distinct members added over the window."""
+
+    def __init__(self, window_seconds: float, slots: int = 60):
+        super().__init__(window_seconds, slots)
+        # Slot each member was last added in
+        self._members: Dict[str, Dict[str, int]] = {}
+
+    def _live(self, key: str, slot: int) -> Optional[Dict[str, int]]:
+        members = self._members.get(key)
+        if members is None:
+            return None
+        first_live = slot - self.slots + 1
+        for member in [m for m, last in members.items() if last < first_live]:
+            del members[member]
+        if not members:
+            del self._members[key]
+            return None
+        return members
+
+    def count(self, key: str, now: float) -> int:
+        return len(self._live(key, self._slot(now)) or ())
+
+    def contains(self, key: str, member: str, now: float) -> bool:
+        return member in (self._live(key, self._slot(now)) or ())
+
+    def add(self, key: str, member: str, now: float):
+        slot = self._slot(now)
+        members = self._live(key, slot)
+        if members is None:
+            members = self._members[key] = {}
+        members[member] = slot
+        self._dirty.add(key)
+
+    def retry_after(self, key: str, now: float) -> float:
+        """Seconds until the member of `key` seen the longest ago leaves the window."""
+        members = self._live(key, self._slot(now))
+        if not members:
+            return 0.0
+        return max(self._expires_at(min(members.values())) - now, 0.0)
+
+    def keys(self) -> List[str]:
+        return list(self._members)
+
+    def purge(self, now: float):
+        slot = self._slot(now)
+        for key in self.keys():
+            self._live(key, slot)
+
+    def state(self, key: str) -> List[List[Any]]:
+        return [[slot, member] for member, slot in self._members.get(key, {}).items()]
+
+    def expires_at(self, key: str) -> float:
+        return self._expires_at(max(self._members[key].values()))
+
+    def load(self, key: str, state: List[List[Any]]):
+        self._members[key] = {member: slot for slot, member in state}
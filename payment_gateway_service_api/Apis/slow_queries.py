@@ -0,0 +1,164 @@
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter, deque
+from dataclasses import asdict, dataclass
+from typing import List, Optional
+from django.conf import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+_STRING_LITERAL_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST_RE = re.compile(r"\((?:\s*(?:%s|\?)\s*,)+\s*(?:%s|\?)\s*\)")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def fingerprint(sql: str) -> str:
+    """
+    Normalizes SQL so that queries differing only in their values group together:
+    literals become ?, IN lists collapse to (...), and whitespace is collapsed.
+    """
+    sql = _STRING_LITERAL_RE.sub("?", sql)
+    sql = _NUMBER_RE.sub("?", sql)
+    sql = sql.replace("%s", "?")
+    sql = _PLACEHOLDER_LIST_RE.sub("(...)", sql)
+    return _WHITESPACE_RE.sub(" ", sql).strip()
+
+
+def call_site() -> str:
+    """
+    Returns the innermost frame of project code on the current stack, e.g.
+    "Apis/repositories_ports_and_adapters.py:171 in get_client_by_email",
+    skipping Django, third party packages and this module.
+    """
+    base_dir = str(settings.BASE_DIR) + os.sep
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if (
+            filename.startswith(base_dir)
+            and filename != __file__
+            and "site-packages" not in filename
+        ):
+            relative = filename[len(base_dir) :]
+            return f"{relative}:{frame.f_lineno} in {frame.f_code.co_name}"
+        frame = frame.f_back
+    return "unknown"
+
+
+@dataclass
+class SlowQueryDTO:
+    """Data Transfer Object for one query that exceeded the slow query threshold.
+    - fingerprint: Normalized SQL, see fingerprint().
+    - sql: The SQL as sent, with placeholders.
+    - duration_ms: Execution time in milliseconds.
+    - call_site: The project code that issued the query.
+    - alias: Database alias.
+    - recorded_at: Epoch seconds when the query finished.
+    """
+
+    fingerprint: str
+    sql: str
+    duration_ms: float
+    call_site: str
+    alias: str
+    recorded_at: float
+
+
+class SlowQueryLog:
+    """
+    Bounded ring buffer of the most recent slow queries of this process.
+    Only queries at or over the threshold pay for the fingerprint and stack walk.
+    """
+
+    def __init__(self, threshold_ms: Optional[float], max_entries: int):
+        self.threshold_ms = threshold_ms
+        self._entries = deque(maxlen=max_entries)
+        self._lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        """Database execute wrapper, installed on every connection."""
+        if self.threshold_ms is None:
+            return execute(sql, params, many, context)
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration_ms = (time.perf_counter() - started) * 1000
+            if duration_ms >= self.threshold_ms:
+                self.record(sql, duration_ms, context["connection"].alias)
+
+    def record(self, sql: str, duration_ms: float, alias: str):
+        entry = SlowQueryDTO(
+            fingerprint=fingerprint(sql),
+            sql=sql,
+            duration_ms=round(duration_ms, 3),
+            call_site=call_site(),
+            alias=alias,
+            recorded_at=time.time(),
+        )
+        logger.warning(
+            "Slow query (%sms) at %s: %s",
+            entry.duration_ms,
+            entry.call_site,
+            entry.fingerprint,
+        )
+        with self._lock:
+            self._entries.append(entry)
+
+    def entries(self) -> List[SlowQueryDTO]:
+        with self._lock:
+            return list(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def aggregate(self) -> List[dict]:
+        """
+        Groups the buffered queries by fingerprint, slowest total time first,
+        with their count, total, mean and max duration and their call sites.
+        """
+        groups = {}
+        for entry in self.entries():
+            group = groups.setdefault(
+                entry.fingerprint,
+                {
+                    "fingerprint": entry.fingerprint,
+                    "count": 0,
+                    "total_ms": 0.0,
+                    "max_ms": 0.0,
+                    "call_sites": Counter(),
+                    "last_sql": entry.sql,
+                },
+            )
+            group["count"] += 1
+            group["total_ms"] += entry.duration_ms
+            group["max_ms"] = max(group["max_ms"], entry.duration_ms)
+            group["call_sites"][entry.call_site] += 1
+            group["last_sql"] = entry.sql
+        results = []
+        for group in groups.values():
+            group["total_ms"] = round(group["total_ms"], 3)
+            group["mean_ms"] = round(group["total_ms"] / group["count"], 3)
+            group["call_sites"] = dict(group["call_sites"].most_common())
+            results.append(group)
+        return sorted(results, key=lambda group: group["total_ms"], reverse=True)
+
+    def recent(self, limit: int) -> List[dict]:
+        return [asdict(entry) for entry in self.entries()[-limit:]]
+
+
+slow_query_log = SlowQueryLog(
+    settings.SLOW_QUERY_THRESHOLD_MS, settings.SLOW_QUERY_LOG_SIZE
+)
+
+
+def install_slow_query_log(sender, connection, **kwargs):
+    """connection_created receiver adding the slow query log to new connections."""
+    if slow_query_log not in connection.execute_wrappers:
+        connection.execute_wrappers.append(slow_query_log)
@@ -0,0 +1,192 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+from django.conf import settings
+from . import metrics, tracing
+
+LOG_RECORDS_DROPPED = metrics.Counter(
+    "log_records_dropped_total",
+    "Log records dropped because the logging queue was full.",
+)
+
+# LogRecord attributes that are not structured fields passed through `extra`
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+_REDACTED = "[REDACTED]"
+_exception_formatter = logging.Formatter()
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats records as one JSON object per line: timestamp, level, logger,
+    message, the trace id of sampled requests, fields passed with `extra` and
+    the formatted exception if any.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "timestamp": datetime.fromtimestamp(
+                record.created, timezone.utc
+            ).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class TraceContextFilter(logging.Filter):
+    """Adds the trace id of the current request while still on its thread."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        trace_id = tracing.current_trace_id()
+        if trace_id is not None:
+            record.trace_id = trace_id
+        return True
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that only interpolates the message on the calling thread.
+    JSON encoding and I/O happen on the QueueListener thread. The queue is an
+    unbounded SimpleQueue, which takes no lock in Python, capped at max_size:
+    records beyond it are dropped, and counted, rather than blocking.
+    """
+
+    def __init__(self, max_size: int = 10000):
+        super().__init__(queue.SimpleQueue())
+        self.max_size = max_size
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Arguments may be mutated once the call returns, and exceptions hold
+        # frames, so both are rendered before the record changes thread. The
+        # copy leaves the record seen by other handlers untouched.
+        prepared = logging.LogRecord.__new__(logging.LogRecord)
+        prepared.__dict__.update(record.__dict__)
+        prepared.msg = prepared.getMessage()
+        prepared.args = None
+        if prepared.exc_info:
+            prepared.exc_text = _exception_formatter.formatException(prepared.exc_info)
+            prepared.exc_info = None
+        return prepared
+
+    def enqueue(self, record: logging.LogRecord):
+        if self.queue.qsize() >= self.max_size:
+            LOG_RECORDS_DROPPED.inc()
+            return
+        self.queue.put_nowait(record)
+
+
+def queue_handler(stream=None, queue_size: int = 10000, output_format: str = "json"):
+    """
+    Factory for LOGGING: a NonBlockingQueueHandler whose QueueListener writes to
+    `stream` (stderr by default) from a background thread. The listener is
+    stopped, flushing the queue, at interpreter exit.
+    """
+    output = logging.StreamHandler(stream or sys.stderr)
+    if output_format == "json":
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(
+            logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+        )
+    handler = NonBlockingQueueHandler(queue_size)
+    handler.addFilter(TraceContextFilter())
+    listener = logging.handlers.QueueListener(
+        handler.queue, output, respect_handler_level=True
+    )
+    listener.start()
+    atexit.register(stop_listener, listener)
+    handler.listener = listener
+    return handler
+
+
+def stop_listener(listener: logging.handlers.QueueListener):
+    """Writes the queued records and stops the listener, if still running."""
+    if listener._thread is not None:
+        listener.stop()
+
+
+def redact(value: Any, max_string_length: int, depth: int = 0) -> Any:
+    """
+    Copy of a payload with the values of sensitive keys (LOG_REDACTED_KEYS)
+    replaced, long strings cut and deep nesting elided.
+    """
+    if depth > 6:
+        return "..."
+    if isinstance(value, dict):
+        redacted_keys = settings.LOG_REDACTED_KEYS
+        return {
+            key: (
+                _REDACTED
+                if str(key).lower() in redacted_keys
+                else redact(item, max_string_length, depth + 1)
+            )
+            for key, item in value.items()
+        }
+    if isinstance(value, (list, tuple)):
+        return [redact(item, max_string_length, depth + 1) for item in value]
+    if isinstance(value, str) and len(value) > max_string_length:
+        return f"{value[:max_string_length]}...(+{len(value) - max_string_length})"
+    return value
+
+
+class LoggedPayload:
+    """
+    Wraps a payload passed as a logging argument. It is only redacted,
+    serialized and truncated to LOG_PAYLOAD_MAX_CHARS if the record is emitted.
+    """
+
+    __slots__ = ("payload",)
+
+    def __init__(self, payload: Any):
+        self.payload = payload
+
+    def __str__(self) -> str:
+        max_chars = settings.LOG_PAYLOAD_MAX_CHARS
+        text = json.dumps(
+            redact(self.payload, max_chars), default=str, separators=(",", ":")
+        )
+        if len(text) > max_chars:
+            text = f"{text[:max_chars]}...(+{len(text) - max_chars} chars)"
+        return text
+
+
+def payload_sampled(route: str) -> bool:
+    """
+    Whether a verbose payload log of `route` should be written, drawn at the
+    route's rate in LOG_PAYLOAD_SAMPLE_RATES ("default" for unlisted routes).
+    """
+    rates: Dict[str, float] = settings.LOG_PAYLOAD_SAMPLE_RATES
+    rate = rates.get(route, rates.get("default", 0.0))
+    return rate >= 1 or (rate > 0 and random.random() < rate)
+
+
+def log_payload(
+    logger: logging.Logger,
+    route: str,
+    msg: str,
+    payload: Any,
+    level: int = logging.INFO,
+    extra: Optional[Dict[str, Any]] = None,
+):
+    """
+    Logs `msg % payload` for a sampled fraction of the calls of `route`, with
+    the payload redacted and truncated.
+    """
+    if logger.isEnabledFor(level) and payload_sampled(route):
+        logger.log(
+            level, msg, LoggedPayload(payload), extra={"route": route, **(extra or {})}
+        )
@@ -0,0 +1,206 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Dict, List, Optional, Tuple
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+from Orders.models import PaymentTransaction
+from .payments_ports_and_adapters import (
+    GatewayVerificationDTO,
+    PaymentGatewayInterface,
+)
+from .rate_limiting import TokenBucket
+import logging
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = ("success", "failed")
+
+# (id, transaction_ref, gateway_name)
+ClaimedTransaction = Tuple[int, str, str]
+
+
+@dataclass
+class SweepResultDTO:
+    """Data Transfer Object summarising one sweep over stale pending transactions.
+    - claimed: Number of pending transactions claimed by this worker.
+    - verified: Number of transactions the gateway returned a verification for.
+    - updated: Number of transactions moved to a terminal status.
+    - errors: Number of verifications that failed or could not be attempted.
+    """
+
+    claimed: int = 0
+    verified: int = 0
+    updated: int = 0
+    errors: int = 0
+
+
+class PendingTransactionSweeper:
+    """
+    Verifies transactions that have been pending for too long, e.g. because a
+    webhook was lost.
+
+    Each sweep claims a batch of stale pending rows with
+    select_for_update(skip_locked=True) and stamps them with last_verified_at,
+    so several sweepers can run at once without verifying the same rows.
+    Verifications run outside the claiming transaction on a bounded thread pool,
+    throttled per gateway, and terminal results are written back in bulk.
+    """
+
+    def __init__(
+        self,
+        gateway_adapters: Dict[str, PaymentGatewayInterface],
+        batch_size: int = 100,
+        stale_after: timedelta = timedelta(minutes=15),
+        reverify_after: timedelta = timedelta(minutes=10),
+        max_workers: int = 8,
+        rate_limits: Optional[Dict[str, float]] = None,
+    ):
+        self.gateway_adapters = gateway_adapters
+        self.batch_size = batch_size
+        self.stale_after = stale_after
+        self.reverify_after = reverify_after
+        self.rate_limiters = {
+            gateway_name: TokenBucket(rate)
+            for gateway_name, rate in (rate_limits or {}).items()
+        }
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="pending-sweeper"
+        )
+
+    @classmethod
+    def from_settings(cls, gateway_adapters: Dict[str, PaymentGatewayInterface]):
+        """Builds a sweeper configured from the SWEEPER_* settings."""
+        return cls(
+            gateway_adapters=gateway_adapters,
+            batch_size=settings.SWEEPER_BATCH_SIZE,
+            stale_after=timedelta(seconds=settings.SWEEPER_STALE_AFTER_SECONDS),
+            reverify_after=timedelta(seconds=settings.SWEEPER_REVERIFY_AFTER_SECONDS),
+            max_workers=settings.SWEEPER_MAX_WORKERS,
+            rate_limits=settings.SWEEPER_GATEWAY_RATE_LIMITS,
+        )
+
+    def claim_batch(self) -> List[ClaimedTransaction]:
+        """
+        Claims up to batch_size stale pending transactions for this worker.
+        Rows locked by other workers are skipped, and claimed rows are stamped
+        with last_verified_at so they are not claimed again until reverify_after.
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            claimed = list(
+                PaymentTransaction.objects.select_for_update(skip_locked=True)
+                .filter(status="pending", created_at__lt=now - self.stale_after)
+                .filter(
+                    Q(last_verified_at__isnull=True)
+                    | Q(last_verified_at__lt=now - self.reverify_after)
+                )
+                .order_by("created_at")
+                .values_list("pk", "transaction_ref", "gateway_name")[: self.batch_size]
+            )
+            if claimed:
+                PaymentTransaction.objects.filter(
+                    pk__in=[pk for pk, _, _ in claimed]
+                ).update(last_verified_at=now)
+        return claimed
+
+    def verify(self, claimed: ClaimedTransaction) -> Optional[GatewayVerificationDTO]:
+        """
+        Verifies a single claimed transaction against its gateway.
+        Blocks on the gateway's rate limiter first. Returns None when the gateway
+        is unknown or does not return a verification.
+        """
+        _, transaction_ref, gateway_name = claimed
+        adapter = self.gateway_adapters.get(gateway_name)
+        if adapter is None:
+            logger.warning(
+                "No adapter for gateway %s, skipping %s", gateway_name, transaction_ref
+            )
+            return None
+
+        rate_limiter = self.rate_limiters.get(gateway_name)
+        if rate_limiter is not None:
+            rate_limiter.acquire()
+
+        raw_verification = adapter.verify_payment(transaction_ref)
+        if not raw_verification:
+            return None
+        return adapter.parse_verification(transaction_ref, raw_verification)
+
+    def sweep_once(self) -> SweepResultDTO:
+        """
+        Claims one batch, verifies it concurrently and writes terminal statuses back.
+        """
+        result = SweepResultDTO()
+        claimed = self.claim_batch()
+        result.claimed = len(claimed)
+        if not claimed:
+            return result
+
+        futures = [(row, self.executor.submit(self.verify, row)) for row in claimed]
+        verified_pks = {status: [] for status in TERMINAL_STATUSES}
+        for (pk, transaction_ref, _), future in futures:
+            try:
+                verification = future.result()
+            except Exception as e:
+                result.errors += 1
+                logger.error("Error verifying transaction %s: %s", transaction_ref, e)
+                continue
+            if verification is None:
+                result.errors += 1
+                continue
+            result.verified += 1
+            if verification.status in verified_pks:
+                verified_pks[verification.status].append(pk)
+
+        # One UPDATE per terminal status. The status="pending" guard keeps a
+        # webhook that landed while we were verifying from being overwritten.
+        now = timezone.now()
+        for new_status, pks in verified_pks.items():
+            if pks:
+                result.updated += PaymentTransaction.objects.filter(
+                    pk__in=pks, status="pending"
+                ).update(status=new_status, updated_at=now)
+        logger.info(
+            "Sweep finished: claimed=%s, verified=%s, updated=%s, errors=%s",
+            result.claimed,
+            result.verified,
+            result.updated,
+            result.errors,
+        )
+        return result
+
+    def run(
+        self,
+        interval: float,
+        stop_event: Optional[threading.Event] = None,
+        max_backoff: float = 600.0,
+    ):
+        """
+        Sweeps until stop_event is set. Full batches are followed immediately by
+        another sweep; otherwise the sweeper sleeps for `interval` seconds.
+        A failed sweep, e.g. on a dropped database connection, is logged and
+        retried after a delay doubling from `interval` up to `max_backoff`.
+        """
+        stop_event = stop_event or threading.Event()
+        failures = 0
+        while not stop_event.is_set():
+            # Replaces connections the database dropped or that outlived CONN_MAX_AGE
+            close_old_connections()
+            try:
+                result = self.sweep_once()
+            except Exception:
+                failures += 1
+                delay = min(interval * 2 ** (failures - 1), max_backoff)
+                logger.exception("Sweep failed, retrying in %.1f seconds", delay)
+                stop_event.wait(delay)
+                continue
+            failures = 0
+            if result.claimed < self.batch_size:
+                stop_event.wait(interval)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
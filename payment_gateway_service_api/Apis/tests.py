@@ -2,33 +2,122 @@
 Tests
 """
 
+import contextlib
+import io
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import tracemalloc
 import uuid
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
 from unittest.mock import Mock, patch
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError
+from django.test import TestCase, override_settings
 from django.urls import reverse
+from django.utils import timezone
+from rest_framework.exceptions import ParseError
 from rest_framework.test import APITestCase
 from rest_framework import status
+from benchmarks.stub_gateways import StubGatewayServer
 from clients.utils import Address
-from Orders.models import Orders
+from Orders.models import OrderItem, Orders, PaymentTransaction
+from Products.models import Products
 from .repositories_ports_and_adapters import (
     ClientRepositoryInterface,
     ClientDTO,
+    CreateTransactionDTO,
+    DjangoClientRepositoryAdapter,
+    InMemoryClientRepositoryAdapter,
     PaymentTransactionDTO,
+    UpdateTransactionDTO,
 )
 from .core_logic import (
     PaymentServiceCore,
     InitialPaymentRequestDTO,
     InitiatedPaymentResponseDTO,
 )
+from .flutterwave_adapter import FlutterWaveAdapter
+from .gateway_registry import gateway_names
 from .payments_ports_and_adapters import (
+    PaymentDetails,
     PaymentGatewayInterface,
     GatewayProcessPaymentResponseDTO,
+    GatewayVerificationDTO,
+    GatewayWebhookEventDTO,
 )
+from .paystack_adapter import PayStackAdapter
+from .authentication import verified_keys
+from .models import SCOPE_PAYMENTS_CREATE, MerchantAPIKey, VelocityWindow
+from .pre_checks_ports_and_adapters import (
+    PaymentAttemptDTO,
+    PaymentRejectedError,
+    VelocityPreCheckAdapter,
+    get_pre_checks,
+    reset_pre_checks,
+)
+from .query_budget import QueryBudgetExceeded, query_budget
+from .rate_limiting import SharedTokenBuckets
+from .reconciliation import ReconciliationSummaryDTO, reconcile_settlement_file
+from . import (
+    json_codec,
+    memory_diagnostics,
+    metrics,
+    openapi_schema,
+    profiling,
+    services,
+    structured_logging,
+    tracing,
+    webhook_signatures,
+)
+from .resilience import (
+    Bulkhead,
+    Deadline,
+    GatewayCallPolicy,
+    GatewayRetryableError,
+)
+from .simulated_gateway import (
+    GatewaySimulationProfile,
+    LatencyDistribution,
+    SimulatedGatewayAdapter,
+)
+from .slow_queries import fingerprint, slow_query_log
+from .sweeper import PendingTransactionSweeper, SweepResultDTO
+from .verification_cache import VerificationCache
 
 
 ClientModel = get_user_model()
 
+# Webhooks are only processed with a valid gateway signature
+WEBHOOK_SECRET_HASH = "test-secret-hash"
+SIGNED_WEBHOOK_HEADERS = {"verif-hash": WEBHOOK_SECRET_HASH}
+
+# Settings for the whole run, whatever the environment sets: no velocity
+# persister thread writing to the test database in the background, and rate
+# limit buckets shared with no other test run or development server
+TEST_RATE_LIMIT_DIR = tempfile.TemporaryDirectory(prefix="payment-gateway-tests-")
+TEST_SETTINGS = override_settings(
+    VELOCITY_PERSIST_INTERVAL_SECONDS=0,
+    RATE_LIMIT_SHARED_MEMORY_PATH=f"{TEST_RATE_LIMIT_DIR.name}/rate-limits",
+)
+
+
+def setUpModule():
+    TEST_SETTINGS.enable()
+
+
+def tearDownModule():
+    TEST_SETTINGS.disable()
+    TEST_RATE_LIMIT_DIR.cleanup()
+
 
 class PaymentServiceCoreTests(TestCase):
     """
@@ -135,6 +224,7 @@ class PaymentServiceCoreTests(TestCase):
         )
 
 
+@override_settings(FLUTTERWAVE_SECRET_HASH=WEBHOOK_SECRET_HASH)
 class PaymentAPITests(APITestCase):
     """
     TEST THE API ENDPOINTS (INTEGRATION TESTS)
@@ -161,9 +251,17 @@ class PaymentAPITests(APITestCase):
         self.initiate_payment_url = reverse("create-payment")
         self.webhook_url = reverse("webhook")
 
-        self.client.force_authenticate(user=self.user)
+        self.api_key, _ = MerchantAPIKey.issue(
+            self.user, "tests", [SCOPE_PAYMENTS_CREATE]
+        )
+        self.client.force_authenticate(user=self.user, token=self.api_key)
+        # Velocity counters are restored from the database when the pre-checks
+        # are created, once per process: outside of the query budgets
+        reset_pre_checks()
+        get_pre_checks()
 
     @patch("Apis.views.initiate_payment")
+    @query_budget(0, max_seconds=1.0)
     def test_initiate_payment_api_success(self, mock_initiate_payment):
         """
         Test the POST /api/payments/v1/createpayment/ endpoint for a successful scenario.
@@ -193,6 +291,7 @@ class PaymentAPITests(APITestCase):
         )
 
     @patch("Apis.views.initiate_payment")
+    @query_budget(0, max_seconds=1.0)
     def test_initiate_payment_api_client_not_found(self, mock_initiate_payment):
         """
         Test the createpayment endpoint when the service layer raises a ValueError.
@@ -213,6 +312,7 @@ class PaymentAPITests(APITestCase):
         self.assertEqual(response.data["error"], "Client not found in service layer")
 
     @patch("Apis.views.update_model_from_webhook")
+    @query_budget(0, max_seconds=1.0)
     def test_webhook_handler_api_success(self, mock_update_model):
         """
         Test the POST /api/payments/v1/webhook/ endpoint.
@@ -228,10 +328,1697 @@ class PaymentAPITests(APITestCase):
             "data": {"id": 12345, "tx_ref": "some-tx-ref", "status": "successful"},
         }
 
-        response = self.client.post(self.webhook_url, webhook_payload, format="json")
+        response = self.client.post(
+            self.webhook_url,
+            webhook_payload,
+            format="json",
+            headers=SIGNED_WEBHOOK_HEADERS,
+        )
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data["status"], "Success")
 
         # Verify our mocked service function was called with the payload
-        mock_update_model.assert_called_once_with(webhook_payload)
+        mock_update_model.assert_called_once_with(webhook_payload, "FlutterWave")
+
+    @query_budget(5, max_seconds=2.0)
+    @patch.object(PayStackAdapter, "process_payment")
+    @patch("Apis.services.random.random", return_value=0.1)
+    def test_initiate_payment_query_budget(self, mock_random, mock_process_payment):
+        """
+        Run the createpayment endpoint through the real service and repository.
+        """
+        mock_process_payment.return_value = GatewayProcessPaymentResponseDTO(
+            success=True, gateway_ref="gw_ref_123", raw_response={"status": True}
+        )
+
+        response = self.client.post(
+            self.initiate_payment_url,
+            {"email": "api_user@example.com", "currency": "NGN"},
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_webhook_query_budget(self):
+        """
+        Run the webhook endpoint through the real service and repository.
+        """
+        transaction = PaymentTransaction.objects.create(
+            client=self.user,
+            order=self.order,
+            amount=1500,
+            transaction_ref=str(uuid.uuid4()),
+            gateway_name="FlutterWave",
+        )
+        webhook_payload = {
+            "event": "charge.completed",
+            "data": {
+                "tx_ref": transaction.transaction_ref,
+                "flw_ref": "FLW-123",
+                "status": "successful",
+                "amount": 1500,
+            },
+        }
+
+        with query_budget(3, max_seconds=2.0):
+            response = self.client.post(
+                self.webhook_url,
+                webhook_payload,
+                format="json",
+                headers=SIGNED_WEBHOOK_HEADERS,
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class RepositoryQueryBudgetTests(TestCase):
+    """
+    Query budgets for each ClientRepositoryInterface method of the Django adapter.
+    """
+
+    def setUp(self):
+        self.repository = DjangoClientRepositoryAdapter()
+        self.address = Address.objects.create(city="Test City", country="TC")
+        self.user = ClientModel.objects.create_user(
+            email="budget@example.com",
+            password="password123",
+            house_address=self.address,
+        )
+        self.order = Orders.objects.create(
+            client=self.user,
+            total_amount=1500.00,
+            shipping_address=self.address,
+            billing_address=self.address,
+        )
+        self.transaction = PaymentTransaction.objects.create(
+            client=self.user,
+            order=self.order,
+            amount=1500,
+            transaction_ref=str(uuid.uuid4()),
+            gateway_name="PayStack",
+        )
+
+    @query_budget(1)
+    def test_get_client_by_email(self):
+        self.assertIsNotNone(self.repository.get_client_by_email(self.user.email))
+
+    @query_budget(1)
+    def test_get_transaction_by_id(self):
+        self.assertEqual(
+            self.repository.get_transaction_by_id(self.transaction.transaction_ref),
+            self.transaction.pk,
+        )
+
+    @query_budget(1)
+    def test_get_latest_order_and_amount_for_client(self):
+        self.assertEqual(
+            self.repository.get_latest_order_and_amount_for_client(self.user.pk),
+            [self.order.pk, 1500.0],
+        )
+
+    @query_budget(1)
+    def test_create_payment_transaction(self):
+        self.repository.create_payment_transaction(
+            CreateTransactionDTO(
+                client_id=self.user.pk,
+                order_id=self.order.pk,
+                amount=1500,
+                transaction_ref=str(uuid.uuid4()),
+                gateway_name="PayStack",
+            )
+        )
+
+    @query_budget(2)
+    def test_update_payment_transaction(self):
+        self.repository.update_payment_transaction(
+            self.transaction.pk,
+            UpdateTransactionDTO(id=self.transaction.pk, status="success"),
+        )
+
+    def test_budget_failure_lists_offending_sql(self):
+        with self.assertRaises(QueryBudgetExceeded) as context:
+            with query_budget(1):
+                list(Orders.objects.all())
+                list(PaymentTransaction.objects.all())
+
+        message = str(context.exception)
+        self.assertIn("2 queries (budget 1)", message)
+        self.assertIn('FROM "Orders_paymenttransaction"', message)
+
+
+class SettlementReconciliationTests(TestCase):
+    """
+    Test the streaming merge-join used to reconcile gateway settlement files.
+    """
+
+    def setUp(self):
+        self.address = Address.objects.create(city="Test City", country="TC")
+        self.user = ClientModel.objects.create_user(
+            email="recon_user@example.com",
+            password="password123",
+            first_name="Recon",
+            last_name="User",
+            house_address=self.address,
+        )
+        self.order = Orders.objects.create(
+            client=self.user,
+            total_amount=1500.00,
+            shipping_address=self.address,
+            billing_address=self.address,
+        )
+        for ref, amount, tx_status in [
+            ("ref-a", "100.00", "success"),
+            ("ref-b", "200.00", "pending"),
+            ("ref-c", "300.00", "success"),
+            ("ref-d", "400.00", "failed"),
+        ]:
+            PaymentTransaction.objects.create(
+                client=self.user,
+                order=self.order,
+                amount=amount,
+                status=tx_status,
+                transaction_ref=ref,
+                gateway_name="FlutterWave",
+            )
+
+    def test_merge_join_reports_every_mismatch_kind(self):
+        settlement_file = io.StringIO(
+            "reference,amount,status\n"
+            "ref-a,100.00,successful\n"
+            "ref-b,250.00,successful\n"
+            "ref-b,250.00,successful\n"
+            "ref-c,300.00,successful\n"
+            "ref-e,500.00,successful\n"
+        )
+        summary = ReconciliationSummaryDTO()
+        mismatches = list(reconcile_settlement_file(settlement_file, summary=summary))
+
+        kinds = [(mismatch.kind, mismatch.reference) for mismatch in mismatches]
+        self.assertEqual(
+            kinds,
+            [
+                ("amount_mismatch", "ref-b"),
+                ("status_mismatch", "ref-b"),
+                ("duplicate_in_settlement", "ref-b"),
+                ("missing_in_settlement", "ref-d"),
+                ("missing_in_database", "ref-e"),
+            ],
+        )
+        self.assertEqual(summary.matched, 2)
+        self.assertEqual(summary.database_rows, 4)
+
+    def test_unsorted_settlement_file_is_rejected(self):
+        settlement_file = io.StringIO(
+            '{"reference": "ref-c", "amount": 30000, "status": "success"}\n'
+            '{"reference": "ref-a", "amount": 10000, "status": "success"}\n'
+        )
+        with self.assertRaises(ValueError) as context:
+            list(
+                reconcile_settlement_file(
+                    settlement_file, file_format="jsonl", amount_scale=Decimal(100)
+                )
+            )
+        self.assertIn("not sorted", str(context.exception))
+
+    def test_invalid_settlement_lines_are_rejected(self):
+        for line, message in (
+            ('{"reference": null, "amount": 100, "status": "success"}', "line 2"),
+            ('["ref-a", 100, "success"]', "Expected a JSON object on line 2"),
+        ):
+            settlement_file = io.StringIO(
+                '{"reference": "ref-a", "amount": 100, "status": "success"}\n'
+                f"{line}\n"
+            )
+            with self.subTest(line=line), self.assertRaisesMessage(ValueError, message):
+                list(reconcile_settlement_file(settlement_file, file_format="jsonl"))
+
+    def test_command_reports_bad_arguments(self):
+        with self.assertRaisesMessage(CommandError, "Could not open settlement file"):
+            call_command("reconcile_settlements", "/nonexistent/settlement.csv")
+        with self.assertRaisesMessage(CommandError, "Invalid amount scale"):
+            call_command("reconcile_settlements", "-", amount_scale="kobo")
+
+
+class PendingTransactionSweeperTests(TestCase):
+    """
+    Test that the sweeper claims stale pending transactions and writes verified statuses back.
+    """
+
+    def setUp(self):
+        self.address = Address.objects.create(city="Test City", country="TC")
+        self.user = ClientModel.objects.create_user(
+            email="sweeper_user@example.com",
+            password="password123",
+            first_name="Sweeper",
+            last_name="User",
+            house_address=self.address,
+        )
+        self.order = Orders.objects.create(
+            client=self.user,
+            total_amount=1500.00,
+            shipping_address=self.address,
+            billing_address=self.address,
+        )
+        for ref in ["stale-success", "stale-failed", "stale-pending", "fresh"]:
+            PaymentTransaction.objects.create(
+                client=self.user,
+                order=self.order,
+                amount="1500.00",
+                transaction_ref=ref,
+                gateway_name="FlutterWave",
+            )
+        PaymentTransaction.objects.exclude(transaction_ref="fresh").update(
+            created_at=timezone.now() - timedelta(hours=1)
+        )
+
+        statuses = {
+            "stale-success": "success",
+            "stale-failed": "failed",
+            "stale-pending": "pending",
+        }
+        self.mock_gateway_adapter = Mock(spec=PaymentGatewayInterface)
+        self.mock_gateway_adapter.verify_payment.side_effect = lambda ref: {"ref": ref}
+        self.mock_gateway_adapter.parse_verification.side_effect = (
+            lambda ref, raw: GatewayVerificationDTO(
+                internal_transaction_ref=ref, status=statuses[ref]
+            )
+        )
+        self.sweeper = PendingTransactionSweeper(
+            gateway_adapters={"FlutterWave": self.mock_gateway_adapter},
+            stale_after=timedelta(minutes=15),
+            max_workers=2,
+        )
+
+    def tearDown(self):
+        self.sweeper.shutdown()
+
+    def test_sweep_updates_terminal_statuses(self):
+        result = self.sweeper.sweep_once()
+
+        self.assertEqual(result.claimed, 3)
+        self.assertEqual(result.verified, 3)
+        self.assertEqual(result.updated, 2)
+        statuses = dict(
+            PaymentTransaction.objects.values_list("transaction_ref", "status")
+        )
+        self.assertEqual(
+            statuses,
+            {
+                "stale-success": "success",
+                "stale-failed": "failed",
+                "stale-pending": "pending",
+                "fresh": "pending",
+            },
+        )
+
+    def test_claimed_transactions_are_not_claimed_again(self):
+        self.assertEqual(len(self.sweeper.claim_batch()), 3)
+        self.assertEqual(self.sweeper.claim_batch(), [])
+
+    @patch("Apis.sweeper.close_old_connections")
+    def test_failed_sweeps_are_retried_with_backoff(self, mock_close_old_connections):
+        stop_event = threading.Event()
+        failure = DatabaseError("connection dropped")
+        results = [failure, failure, failure, SweepResultDTO()]
+
+        def sweep_once():
+            result = results.pop(0)
+            if isinstance(result, Exception):
+                raise result
+            stop_event.set()
+            return result
+
+        with patch.object(self.sweeper, "sweep_once", side_effect=sweep_once):
+            with patch.object(stop_event, "wait") as wait:
+                with self.assertLogs("Apis.sweeper", level="ERROR"):
+                    self.sweeper.run(30, stop_event=stop_event, max_backoff=45)
+
+        self.assertEqual(mock_close_old_connections.call_count, 4)
+        self.assertEqual([args[0] for args, _ in wait.call_args_list], [30, 45, 45, 30])
+
+
+class VerificationCacheTests(TestCase):
+    """
+    Test that gateway verifications are cached with status dependent TTLs.
+    """
+
+    def setUp(self):
+        self.verification_cache = VerificationCache(terminal_ttl=3600, pending_ttl=5)
+        self.fetch = Mock(return_value={"data": {"status": "successful"}})
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_repeated_verifications_hit_the_gateway_once(self):
+        for _ in range(3):
+            raw = self.verification_cache.get_or_fetch(
+                "FlutterWave", "tx-1", self.fetch, lambda ref, raw: "success"
+            )
+        self.assertEqual(raw, {"data": {"status": "successful"}})
+        self.fetch.assert_called_once_with("tx-1")
+
+    @patch("Apis.verification_cache.caches")
+    def test_pending_results_use_short_ttl(self, mock_caches):
+        mock_caches.__getitem__.return_value.get.return_value = None
+        self.verification_cache.get_or_fetch(
+            "PayStack", "tx-2", self.fetch, lambda ref, raw: "pending"
+        )
+        mock_caches.__getitem__.return_value.set.assert_called_once_with(
+            "payment-verification:PayStack:tx-2", self.fetch.return_value, 5
+        )
+
+    def test_slow_verification_only_holds_up_its_own_reference(self):
+        fetching, release = threading.Event(), threading.Event()
+
+        def verify(ref):
+            fetching.set()
+            release.wait(5)
+            return {"data": {"status": "successful"}}
+
+        slow_fetch = Mock(side_effect=verify)
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            slow = [
+                executor.submit(
+                    self.verification_cache.get_or_fetch,
+                    "FlutterWave",
+                    "tx-slow",
+                    slow_fetch,
+                    lambda ref, raw: "success",
+                )
+                for _ in range(2)
+            ]
+            self.assertTrue(fetching.wait(5))
+            other = executor.submit(
+                self.verification_cache.get_or_fetch,
+                "PayStack",
+                "tx-other",
+                self.fetch,
+                lambda ref, raw: "success",
+            )
+            self.assertEqual(other.result(timeout=5), self.fetch.return_value)
+            self.assertFalse(any(future.done() for future in slow))
+            release.set()
+            results = [future.result(timeout=5) for future in slow]
+
+        self.assertEqual(results, [{"data": {"status": "successful"}}] * 2)
+        slow_fetch.assert_called_once_with("tx-slow")
+
+
+class BulkheadTests(TestCase):
+    """
+    Test that gateway bulkheads bound concurrency and reject calls that cannot be served in time.
+    """
+
+    def setUp(self):
+        self.bulkhead = Bulkhead("TestGateway", max_concurrent=1, max_queue=1)
+
+    def test_rejects_when_wait_queue_is_full(self):
+        self.bulkhead.acquire()
+        waiter = threading.Thread(target=self.bulkhead.acquire)
+        waiter.start()
+        while self.bulkhead.stats().queued == 0:
+            time.sleep(0.001)
+
+        with self.assertRaises(GatewayRetryableError):
+            self.bulkhead.acquire()
+
+        self.bulkhead.release(0.01)
+        waiter.join()
+        stats = self.bulkhead.stats()
+        self.assertEqual((stats.in_flight, stats.queued, stats.rejected), (1, 0, 1))
+
+    def test_rejects_immediately_when_deadline_would_expire_in_queue(self):
+        self.bulkhead.acquire()
+        self.bulkhead.release(2.0)
+        self.bulkhead.acquire()
+
+        started = time.monotonic()
+        with self.assertRaises(GatewayRetryableError) as context:
+            self.bulkhead.acquire(Deadline.after(0.1))
+        self.assertLess(time.monotonic() - started, 0.05)
+        self.assertIn("deadline", str(context.exception))
+
+    @patch("Apis.services.random.random", return_value=0.1)
+    def test_rejected_payment_leaves_no_pending_transaction(self, mock_random):
+        address = Address.objects.create(city="Test City", country="TC")
+        user = ClientModel.objects.create_user(
+            email="busy@example.com", password="password123", house_address=address
+        )
+        Orders.objects.create(
+            client=user,
+            total_amount=1500.00,
+            shipping_address=address,
+            billing_address=address,
+        )
+        full = Bulkhead("PayStack", max_concurrent=1, max_queue=0)
+        full.acquire()
+
+        with patch("Apis.transport.get_bulkhead", return_value=full), patch(
+            "Apis.transport.get_http_session"
+        ) as mock_session:
+            with self.assertRaises(GatewayRetryableError):
+                services.initiate_payment({"email": user.email, "currency": "NGN"})
+
+        mock_session.assert_not_called()
+        transaction = PaymentTransaction.objects.get(client=user)
+        self.assertEqual(transaction.status, "failed")
+        self.assertFalse(
+            PaymentTransaction.objects.filter(client=user, status="pending").exists()
+        )
+
+    @patch("Apis.views.initiate_payment")
+    def test_initiate_payment_returns_503_when_gateway_is_busy(
+        self, mock_initiate_payment
+    ):
+        mock_initiate_payment.side_effect = GatewayRetryableError(
+            "FlutterWave is busy", retry_after=2.5
+        )
+        merchant = ClientModel.objects.create_user(
+            email="api_user@example.com",
+            password="password123",
+            house_address=Address.objects.create(city="Test City", country="TC"),
+        )
+        _, raw_key = MerchantAPIKey.issue(merchant, "tests", [SCOPE_PAYMENTS_CREATE])
+        response = self.client.post(
+            reverse("create-payment"),
+            {"email": "api_user@example.com"},
+            content_type="application/json",
+            HTTP_AUTHORIZATION=f"Api-Key {raw_key}",
+        )
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response["Retry-After"], "3")
+
+
+class GatewayCallPolicyTests(TestCase):
+    """
+    Test which gateway call failures are retried and how timeouts adapt.
+    """
+
+    def setUp(self):
+        self.policy = GatewayCallPolicy(
+            "TestGateway", read_timeout=10.0, backoff_base=0.001, backoff_cap=0.001
+        )
+
+    def test_connect_failures_are_retried_for_charges(self):
+        send = Mock(
+            side_effect=[requests.exceptions.ConnectTimeout("connect timeout"), "ok"]
+        )
+        self.assertEqual(self.policy.execute(send, idempotent=False), "ok")
+        self.assertEqual(send.call_count, 2)
+
+    def test_read_timeouts_are_only_retried_for_idempotent_calls(self):
+        send = Mock(side_effect=requests.exceptions.ReadTimeout("read timeout"))
+        with self.assertRaises(requests.exceptions.ReadTimeout):
+            self.policy.execute(send, idempotent=False)
+        self.assertEqual(send.call_count, 1)
+
+        send.reset_mock()
+        with self.assertRaises(requests.exceptions.ReadTimeout):
+            self.policy.execute(send, idempotent=True)
+        self.assertEqual(send.call_count, self.policy.max_attempts)
+
+    def test_timeouts_follow_observed_p99_within_deadline(self):
+        for _ in range(100):
+            self.policy.latency.observe(1.5)
+        connect_timeout, read_timeout = self.policy.timeouts_for(Deadline.after(60))
+        self.assertEqual((connect_timeout, read_timeout), (3.05, 3.0))
+
+        _, read_timeout = self.policy.timeouts_for(Deadline.after(1))
+        self.assertLessEqual(read_timeout, 1)
+
+    def test_time_queued_for_a_slot_comes_out_of_the_timeouts(self):
+        bulkhead = Bulkhead("TestGateway", max_concurrent=1, max_queue=1)
+        bulkhead.acquire()
+        threading.Timer(0.1, bulkhead.release, args=(0.0,)).start()
+        send = Mock(return_value="ok")
+
+        result = self.policy.execute(
+            send, deadline=Deadline.after(0.3), slot=bulkhead.slot
+        )
+
+        self.assertEqual(result, "ok")
+        connect_timeout, read_timeout = send.call_args[0][0]
+        self.assertLessEqual(max(connect_timeout, read_timeout), 0.2)
+
+    def test_deadline_spent_queued_fails_before_the_call(self):
+        def slow_slot(deadline):
+            time.sleep(0.06)
+            return contextlib.nullcontext()
+
+        send = Mock(return_value="ok")
+
+        with self.assertRaisesMessage(GatewayRetryableError, "exhausted"):
+            self.policy.execute(send, deadline=Deadline.after(0.05), slot=slow_slot)
+        send.assert_not_called()
+
+
+@override_settings(FLUTTERWAVE_SECRET_HASH=WEBHOOK_SECRET_HASH)
+class MetricsTests(TestCase):
+    """
+    Test the in-process histograms, multiprocess merging and the /metrics endpoint.
+    """
+
+    def test_merged_histograms_render_cumulative_buckets(self):
+        # One registry per simulated worker process
+        registries = [metrics.MetricsRegistry(), metrics.MetricsRegistry()]
+        first, second = [
+            metrics.Histogram(
+                "test_latency", "Test.", ("view",), buckets=(0.1, 1.0), registry=r
+            )
+            for r in registries
+        ]
+        first.observe(0.05, "a")
+        second.observe(0.5, "a")
+        second.observe(5, "a")
+
+        text = metrics.render_text(
+            metrics.merge_snapshots([r.snapshot() for r in registries])
+        )
+        self.assertIn('test_latency_bucket{view="a",le="0.1"} 1', text)
+        self.assertIn('test_latency_bucket{view="a",le="1.0"} 2', text)
+        self.assertIn('test_latency_bucket{view="a",le="+Inf"} 3', text)
+        self.assertIn('test_latency_count{view="a"} 3', text)
+
+    def test_exited_workers_are_folded_into_the_aggregate(self):
+        workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(workdir.cleanup)
+        # A worker that exited, and one started later with the same pid
+        exited = metrics.MultiProcessWriter(workdir.name, interval=3600)
+        exited.ensure_started()
+        exited.flush()
+        exited_path = exited.path
+        exited._pid = None
+        worker = metrics.MultiProcessWriter(workdir.name, interval=3600)
+        worker.ensure_started()
+        metrics.WEBHOOKS_REJECTED.inc()
+        totals = worker.collect()
+
+        self.assertNotEqual(worker.path, exited_path)
+        self.assertTrue(os.path.exists(exited_path))
+        worker.stop()
+        self.assertEqual(
+            sorted(os.listdir(workdir.name)),
+            ["metrics-aggregate.json", "metrics-aggregate.lock"],
+        )
+        self.assertEqual(worker.collect(), totals)
+
+    @patch("Apis.views.update_model_from_webhook")
+    def test_requests_are_recorded_per_view(self, mock_update_model):
+        mock_update_model.return_value = {"status": "Success"}
+        self.client.post(
+            reverse("webhook"),
+            {},
+            content_type="application/json",
+            headers=SIGNED_WEBHOOK_HEADERS,
+        )
+
+        response = self.client.get(reverse("metrics"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn(
+            'http_request_duration_seconds_count{view="webhook",method="POST",status="200"}',
+            response.content.decode(),
+        )
+
+
+@override_settings(FLUTTERWAVE_SECRET_HASH=WEBHOOK_SECRET_HASH)
+class TracingTests(TestCase):
+    """
+    Test that spans carry the request's trace id and nest across layers.
+    """
+
+    def setUp(self):
+        self.collector = tracing.InMemoryCollector()
+        tracing.configure(1.0, self.collector)
+        self.addCleanup(tracing.configure, 0.0, None)
+
+    @patch("Apis.views.update_model_from_webhook")
+    def test_request_span_uses_incoming_traceparent(self, mock_update_model):
+        mock_update_model.return_value = {"status": "Success"}
+        trace_id = "4bf92f3577b34da6a3ce929d0e0e4736"
+
+        response = self.client.post(
+            reverse("webhook"),
+            {},
+            content_type="application/json",
+            headers={
+                "traceparent": f"00-{trace_id}-00f067aa0ba902b7-01",
+                **SIGNED_WEBHOOK_HEADERS,
+            },
+        )
+
+        self.assertEqual(response["X-Trace-Id"], trace_id)
+        spans = self.collector.trace(trace_id)
+        self.assertEqual([span.name for span in spans], ["POST /api/v1/webhook/"])
+        self.assertEqual(spans[0].attributes["status"], 200)
+
+    def test_core_and_adapter_spans_are_nested(self):
+        gateway_adapter = Mock(spec=PaymentGatewayInterface)
+        client_repository = Mock(spec=ClientRepositoryInterface)
+
+        def traced_lookup(email):
+            with tracing.span("repository.get_client_by_email"):
+                return None
+
+        client_repository.get_client_by_email.side_effect = traced_lookup
+        service = PaymentServiceCore(gateway_adapter, client_repository)
+
+        trace_id, sampled, token = tracing.start_trace()
+        try:
+            with self.assertRaises(ValueError):
+                service.initiate_payment(
+                    InitialPaymentRequestDTO(
+                        client_email="missing@example.com",
+                        currency="NGN",
+                        payment_gateway_name="MockGateway",
+                    )
+                )
+        finally:
+            tracing.end_trace(token)
+
+        self.assertTrue(sampled)
+        lookup, core = self.collector.trace(trace_id)
+        self.assertEqual(core.name, "PaymentServiceCore.initiate_payment")
+        self.assertEqual(core.error, "ValueError")
+        self.assertEqual(lookup.parent_id, core.span_id)
+
+    def test_unsampled_requests_record_no_spans(self):
+        tracing.configure(0.0, self.collector)
+
+        response = self.client.get(reverse("metrics"), headers={"X-Request-ID": "abc"})
+
+        self.assertEqual(response["X-Trace-Id"], "abc")
+        self.assertIs(tracing.span("anything"), tracing.NOOP_SPAN)
+        self.assertEqual(len(self.collector.spans), 0)
+
+
+@override_settings(FLUTTERWAVE_SECRET_HASH=WEBHOOK_SECRET_HASH)
+class ProfilingTests(TestCase):
+    """
+    Test on-demand request profiling and the profile store.
+    """
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.store = profiling.ProfileStore(directory.name, max_profiles=2)
+        settings_override = override_settings(PROFILING_DIR=directory.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    @patch("Apis.views.update_model_from_webhook")
+    def test_signed_header_profiles_request_with_sql(self, mock_update_model):
+        def count_clients(request_data, gateway_name):
+            ClientModel.objects.count()
+            return {"status": "Success"}
+
+        mock_update_model.side_effect = count_clients
+
+        response = self.client.post(
+            reverse("webhook"),
+            {},
+            content_type="application/json",
+            headers={
+                "X-Profile": profiling.issue_token(),
+                **SIGNED_WEBHOOK_HEADERS,
+            },
+        )
+
+        profile = self.store.load(response["X-Profile-Id"])
+        self.assertEqual(profile["path"], "/api/v1/webhook/")
+        self.assertEqual(profile["sql_count"], 1)
+        self.assertIn("COUNT", profile["sql"][0]["sql"])
+        self.assertTrue(profile["frames"])
+
+    @patch("Apis.views.update_model_from_webhook")
+    def test_invalid_token_is_not_profiled(self, mock_update_model):
+        mock_update_model.return_value = {"status": "Success"}
+
+        response = self.client.post(
+            reverse("webhook"),
+            {},
+            content_type="application/json",
+            headers={
+                "X-Profile": "cprofile:forged:signature",
+                **SIGNED_WEBHOOK_HEADERS,
+            },
+        )
+
+        self.assertNotIn("X-Profile-Id", response)
+        self.assertEqual(self.store.list(), [])
+
+    def test_store_rotates_and_command_diffs_profiles(self):
+        def profile(function_time):
+            return {
+                "method": "GET",
+                "path": "/",
+                "status": 200,
+                "mode": "cprofile",
+                "duration": function_time,
+                "sql_count": 0,
+                "sql": [],
+                "frames": [
+                    {
+                        "function": "views.py:1(handler)",
+                        "calls": 1,
+                        "self": function_time,
+                        "cumulative": function_time,
+                    }
+                ],
+            }
+
+        ids = [self.store.save(profile(t)) for t in (0.1, 0.2, 0.5)]
+
+        self.assertEqual([p["id"] for p in self.store.list()], ids[:0:-1])
+        out = io.StringIO()
+        call_command("inspect_profiles", "diff", ids[1], ids[2], stdout=out)
+        self.assertIn("+0.300000  views.py:1(handler)", out.getvalue())
+
+
+class SlowQueryLogTests(APITestCase):
+    """
+    Test slow query capture, call-site attribution and the admin endpoint.
+    """
+
+    def setUp(self):
+        threshold_ms = slow_query_log.threshold_ms
+        self.addCleanup(setattr, slow_query_log, "threshold_ms", threshold_ms)
+        self.addCleanup(slow_query_log.clear)
+        slow_query_log.clear()
+
+    def test_fingerprint_normalizes_values(self):
+        self.assertEqual(
+            fingerprint(
+                "SELECT * FROM t WHERE id IN (%s, %s,%s) AND name = 'x'  LIMIT 21"
+            ),
+            "SELECT * FROM t WHERE id IN (...) AND name = ? LIMIT ?",
+        )
+
+    def test_queries_are_grouped_with_their_call_site(self):
+        admin = ClientModel.objects.create_superuser(
+            email="admin@example.com",
+            password="password123",
+            house_address=Address.objects.create(city="Test City", country="TC"),
+        )
+        slow_query_log.threshold_ms = 0
+        repository = DjangoClientRepositoryAdapter()
+        repository.get_client_by_email("first@example.com")
+        repository.get_client_by_email("second@example.com")
+        slow_query_log.threshold_ms = None
+
+        self.client.force_authenticate(user=admin)
+        response = self.client.get(reverse("ops-slow-queries"))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        (group,) = [
+            group
+            for group in response.data["fingerprints"]
+            if "clients_client" in group["fingerprint"]
+        ]
+        self.assertEqual(group["count"], 2)
+        (site,) = group["call_sites"]
+        self.assertTrue(site.startswith("Apis/repositories_ports_and_adapters.py:"))
+        self.assertTrue(site.endswith("in get_client_by_email"))
+
+    def test_endpoint_requires_admin(self):
+        response = self.client.get(reverse("ops-slow-queries"))
+        self.assertIn(
+            response.status_code,
+            (status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN),
+        )
+
+
+class MemoryDiagnosticsTests(APITestCase):
+    """
+    Test the memory diagnostics endpoint used by the soak test.
+    """
+
+    def test_reports_allocation_growth_since_baseline(self):
+        admin = ClientModel.objects.create_superuser(
+            email="admin@example.com",
+            password="password123",
+            house_address=Address.objects.create(city="Test City", country="TC"),
+        )
+        self.client.force_authenticate(user=admin)
+        if not tracemalloc.is_tracing():
+            self.addCleanup(tracemalloc.stop)
+        self.addCleanup(setattr, memory_diagnostics, "_baseline", None)
+        memory_diagnostics.start(frames=1)
+
+        retained = [bytearray(1024) for _ in range(2000)]
+        response = self.client.get(reverse("ops-memory"), {"limit": 5})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data["tracemalloc"])
+        self.assertGreaterEqual(response.data["db_connections"], 1)
+        top_site = response.data["top_allocations"][0]
+        self.assertIn("Apis/tests.py", top_site["traceback"][0])
+        self.assertGreaterEqual(top_site["size_diff_bytes"], len(retained) * 1024)
+
+
+class StructuredLoggingTests(TestCase):
+    """
+    Test the JSON queue logging pipeline and payload sampling.
+    """
+
+    @override_settings(
+        LOG_PAYLOAD_SAMPLE_RATES={"default": 0.0, "webhook": 1.0},
+        LOG_PAYLOAD_MAX_CHARS=60,
+    )
+    def test_payloads_are_sampled_per_route_redacted_and_truncated(self):
+        logger = logging.getLogger("Apis.tests.payloads")
+        payload = {"data": {"email": "client@example.com", "reference": "r" * 100}}
+
+        with self.assertNoLogs(logger):
+            structured_logging.log_payload(logger, "create-payment", "%s", payload)
+        with self.assertLogs(logger) as logs:
+            structured_logging.log_payload(logger, "webhook", "%s", payload)
+
+        message = logs.records[0].getMessage()
+        self.assertIn('"email":"[REDACTED]"', message)
+        self.assertNotIn("client@example.com", message)
+        self.assertTrue(message.endswith(" chars)"))
+        self.assertEqual(logs.records[0].route, "webhook")
+
+    def test_queue_handler_writes_json_lines(self):
+        stream = io.StringIO()
+        handler = structured_logging.queue_handler(stream)
+        logger = logging.getLogger("Apis.tests.queue")
+        logger.addHandler(handler)
+        self.addCleanup(logger.removeHandler, handler)
+
+        logger.warning("Charge %s declined", "ref-1", extra={"gateway": "PayStack"})
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            logger.exception("Webhook failed")
+        structured_logging.stop_listener(handler.listener)
+
+        first, second = [json.loads(line) for line in stream.getvalue().splitlines()]
+        self.assertEqual(first["message"], "Charge ref-1 declined")
+        self.assertEqual(first["level"], "WARNING")
+        self.assertEqual(first["gateway"], "PayStack")
+        self.assertIn("ValueError: boom", second["exception"])
+
+
+class JsonCodecTests(TestCase):
+    """
+    Test the JSON parser, renderer and gateway response decoding.
+    """
+
+    def test_renderer_and_parser_round_trip(self):
+        data = {
+            "amount": Decimal("1500.50"),
+            "created_at": timezone.now(),
+            "transaction_ref": uuid.uuid4(),
+            "name": "Adaeze Ọkafor",
+        }
+        rendered = json_codec.FastJSONRenderer().render(data)
+
+        parsed = json_codec.FastJSONParser().parse(io.BytesIO(rendered))
+
+        self.assertEqual(parsed["amount"], 1500.5)
+        self.assertEqual(parsed["transaction_ref"], str(data["transaction_ref"]))
+        self.assertEqual(parsed["name"], "Adaeze Ọkafor")
+        with self.assertRaises(ParseError):
+            json_codec.FastJSONParser().parse(io.BytesIO(b"{not json"))
+
+    def test_adapter_decodes_gateway_response(self):
+        response = requests.Response()
+        response.status_code = 200
+        response._content = (
+            b'{"status": true, "message": "Charge attempted",'
+            b' "data": {"reference": "ref-1", "status": "pending"}}'
+        )
+        details = PaymentDetails(
+            amount=1500.0,
+            client_email="test@example.com",
+            client_name="Test User",
+            currency="NGN",
+            tx_ref="ref-1",
+        )
+        with patch("Apis.paystack_adapter.gateway_request", return_value=response):
+            result = PayStackAdapter().process_payment(details)
+
+        self.assertTrue(result.success)
+        self.assertEqual(result.gateway_ref, "ref-1")
+        response._content = b"<html>Bad gateway</html>"
+        with self.assertRaises(requests.exceptions.JSONDecodeError):
+            json_codec.response_json(response)
+
+
+class CachedSchemaTests(APITestCase):
+    """
+    Test the precomputed OpenAPI schema served from memory.
+    """
+
+    def setUp(self):
+        schema_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(schema_dir.cleanup)
+        settings_override = override_settings(
+            OPENAPI_SCHEMA_DIR=schema_dir.name, CODE_VERSION="test"
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        openapi_schema.clear_cache()
+        self.addCleanup(openapi_schema.clear_cache)
+
+    def test_schema_is_generated_once_and_revalidated_with_etag(self):
+        with patch(
+            "Apis.openapi_schema.generate_schema",
+            wraps=openapi_schema.generate_schema,
+        ) as generate:
+            response = self.client.get(
+                reverse("schema"), HTTP_ACCEPT="application/json"
+            )
+            again = self.client.get(
+                reverse("schema"),
+                HTTP_ACCEPT="application/json",
+                HTTP_IF_NONE_MATCH=response["ETag"],
+            )
+
+        self.assertEqual(generate.call_count, 1)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "application/json")
+        schema = json.loads(response.content)
+        self.assertEqual(
+            schema["paths"]["/api/v1/createpayment/"]["post"]["security"],
+            [{"MerchantAPIKey": []}],
+        )
+        self.assertEqual(
+            schema["components"]["securitySchemes"]["MerchantAPIKey"]["name"],
+            "Authorization",
+        )
+        self.assertIn("max-age", response["Cache-Control"])
+        self.assertEqual(again.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(again["ETag"], response["ETag"])
+        self.assertTrue(
+            openapi_schema.schema_path(openapi_schema.code_version()).exists()
+        )
+
+    def test_precomputed_schema_is_loaded_without_generating(self):
+        call_command("precompute_schema", stdout=io.StringIO())
+
+        with patch("Apis.openapi_schema.generate_schema") as generate:
+            response = self.client.get(reverse("schema"))
+
+        generate.assert_not_called()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(
+            response["Content-Type"].startswith("application/vnd.oai.openapi")
+        )
+        self.assertIn(b"openapi: 3", response.content)
+
+    def test_json_format_has_no_charset_parameter(self):
+        response = self.client.get(reverse("schema"), {"format": "json"})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "application/vnd.oai.openapi+json")
+        self.assertIn("/api/v1/createpayment/", json.loads(response.content)["paths"])
+
+    def test_source_fingerprint_follows_schema_modules_content(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        views = os.path.join(root.name, "views.py")
+        other = os.path.join(root.name, "tasks.py")
+        for path in (views, other):
+            with open(path, "w") as f:
+                f.write("VALUE = 1\n")
+        fingerprint = openapi_schema.source_fingerprint(root.name)
+
+        os.utime(views, (0, 0))
+        with open(other, "a") as f:
+            f.write("VALUE = 2\n")
+        unchanged = openapi_schema.source_fingerprint(root.name)
+        with open(views, "a") as f:
+            f.write("VALUE = 2\n")
+
+        self.assertEqual(unchanged, fingerprint)
+        self.assertNotEqual(openapi_schema.source_fingerprint(root.name), fingerprint)
+
+
+class MerchantAPIKeyTests(APITestCase):
+    """
+    Test API key authentication of the payment endpoint and its verified-key cache.
+    """
+
+    def setUp(self):
+        self.merchant = ClientModel.objects.create_user(
+            email="merchant@example.com",
+            password="password123",
+            house_address=Address.objects.create(city="Test City", country="TC"),
+        )
+        verified_keys.clear()
+        self.addCleanup(verified_keys.clear)
+        self.request_data = {"email": "merchant@example.com", "currency": "NGN"}
+
+    @patch("Apis.views.initiate_payment")
+    def test_verified_key_makes_no_query_until_revoked(self, mock_initiate_payment):
+        mock_initiate_payment.return_value = {
+            "transaction_ref": "ref-1",
+            "gateway_response": {"status": "success"},
+        }
+        api_key, raw_key = MerchantAPIKey.issue(
+            self.merchant, "checkout", [SCOPE_PAYMENTS_CREATE]
+        )
+        self.client.credentials(HTTP_AUTHORIZATION=f"Api-Key {raw_key}")
+        url = reverse("create-payment")
+
+        first = self.client.post(url, self.request_data, format="json")
+        with self.assertNumQueries(0):
+            cached = self.client.post(url, self.request_data, format="json")
+        api_key.revoke()
+        revoked = self.client.post(url, self.request_data, format="json")
+
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(cached.status_code, status.HTTP_200_OK)
+        self.assertEqual(revoked.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(revoked["WWW-Authenticate"], "Api-Key")
+
+    def test_requests_without_key_or_scope_are_rejected(self):
+        _, raw_key = MerchantAPIKey.issue(self.merchant, "read only", [])
+        url = reverse("create-payment")
+
+        anonymous = self.client.post(url, self.request_data, format="json")
+        self.client.credentials(HTTP_AUTHORIZATION=f"Api-Key {raw_key}")
+        unscoped = self.client.post(url, self.request_data, format="json")
+        self.client.credentials(HTTP_AUTHORIZATION="Api-Key mk_unknown")
+        unknown = self.client.post(url, self.request_data, format="json")
+
+        self.assertEqual(anonymous.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(unscoped.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(unknown.status_code, status.HTTP_401_UNAUTHORIZED)
+        with self.assertRaises(ValueError):
+            MerchantAPIKey.issue(self.merchant, "bad", ["payments:refund"])
+
+
+class RateLimitingTests(APITestCase):
+    """
+    Test the token buckets shared by workers and the 429s of the payment endpoint.
+    """
+
+    def setUp(self):
+        workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(workdir.cleanup)
+        self.path = f"{workdir.name}/buckets"
+        merchant = ClientModel.objects.create_user(
+            email="limited@example.com",
+            password="password123",
+            house_address=Address.objects.create(city="Test City", country="TC"),
+        )
+        _, raw_key = MerchantAPIKey.issue(merchant, "limited", [SCOPE_PAYMENTS_CREATE])
+        self.client.credentials(HTTP_AUTHORIZATION=f"Api-Key {raw_key}")
+        cache.clear()
+
+    def test_shared_buckets_are_seen_by_every_mapping(self):
+        worker = SharedTokenBuckets(self.path, 16)
+        other_worker = SharedTokenBuckets(self.path, 1024)
+
+        admitted = [worker.try_acquire("client:a", 1.0, 2) for _ in range(2)]
+        wait = other_worker.try_acquire("client:a", 1.0, 2)
+
+        self.assertEqual(admitted, [0.0, 0.0])
+        self.assertEqual(other_worker.slots, 16)
+        self.assertGreater(wait, 0.9)
+        self.assertLessEqual(wait, 1.0)
+        # Keys beyond the table's capacity reuse the least recently used slots
+        for index in range(64):
+            self.assertEqual(worker.try_acquire(f"client:{index}", 1.0, 1), 0.0)
+
+    def test_unusable_bucket_files_are_refused(self):
+        truncated = f"{self.path}-truncated"
+        with open(truncated, "wb") as f:
+            f.write(b"\0" * SharedTokenBuckets._slot.size)
+        link = f"{self.path}-link"
+        os.symlink(truncated, link)
+
+        with self.assertRaisesMessage(OSError, "too small"):
+            SharedTokenBuckets(truncated, 16)
+        with self.assertRaises(OSError):
+            SharedTokenBuckets(link, 16)
+        with self.assertRaises(ValueError):
+            SharedTokenBuckets(f"{self.path}-empty", 0)
+
+    @patch("Apis.views.initiate_payment")
+    def test_empty_bucket_answers_429_with_retry_after(self, mock_initiate_payment):
+        mock_initiate_payment.return_value = {
+            "transaction_ref": "ref-1",
+            "gateway_response": {"status": "success"},
+        }
+        url = reverse("create-payment")
+        limits = {
+            "api_key": {"RATE": 100.0, "BURST": 100},
+            "client": {"RATE": 0.1, "BURST": 1},
+        }
+
+        for backend in ("shared_memory", "cache"):
+            with self.subTest(backend=backend), override_settings(
+                RATE_LIMITS=limits,
+                RATE_LIMIT_BACKEND=backend,
+                RATE_LIMIT_SHARED_MEMORY_PATH=self.path,
+            ):
+                cache.clear()
+                email = f"{backend}@example.com"
+                first = self.client.post(url, {"email": email}, format="json")
+                limited = self.client.post(url, {"email": email}, format="json")
+                other = self.client.post(
+                    url, {"email": f"other-{email}"}, format="json"
+                )
+
+                self.assertEqual(first.status_code, status.HTTP_200_OK)
+                self.assertEqual(limited.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+                self.assertEqual(limited["Retry-After"], "10")
+                self.assertEqual(other.status_code, status.HTTP_200_OK)
+        self.assertEqual(mock_initiate_payment.call_count, 4)
+
+
+class VelocityPreCheckTests(APITestCase):
+    """
+    Test the velocity rules evaluated before a payment reaches a gateway.
+    """
+
+    def setUp(self):
+        reset_pre_checks()
+
+    rules = {
+        "payments_per_client": {"LIMIT": 2, "WINDOW_SECONDS": 60},
+        "amount_per_client": {"LIMIT": 1000, "WINDOW_SECONDS": 3600},
+        "clients_per_bank_token": {"LIMIT": 2, "WINDOW_SECONDS": 86400},
+    }
+
+    def attempt(self, client_id, amount=100.0, bank_token=None):
+        return PaymentAttemptDTO(
+            client_id=client_id,
+            amount=amount,
+            currency="NGN",
+            gateway_name="PayStack",
+            bank_token=bank_token,
+        )
+
+    @patch("Apis.pre_checks_ports_and_adapters.time.time")
+    def test_rules_reject_until_the_window_slides(self, mock_time):
+        mock_time.return_value = 1_000_000.0
+        pre_check = VelocityPreCheckAdapter(self.rules)
+
+        for client_id in (1, 1, 2):
+            pre_check.evaluate(self.attempt(client_id, bank_token="tok_1"))
+        with self.assertRaises(PaymentRejectedError) as too_many:
+            pre_check.evaluate(self.attempt(1))
+        with self.assertRaises(PaymentRejectedError) as too_much:
+            pre_check.evaluate(self.attempt(2, amount=950.0))
+        with self.assertRaises(PaymentRejectedError) as shared_token:
+            pre_check.evaluate(self.attempt(3, bank_token="tok_1"))
+        mock_time.return_value += 60
+        pre_check.evaluate(self.attempt(1))
+
+        self.assertEqual(too_many.exception.rule, "payments_per_client")
+        self.assertTrue(59 < too_many.exception.retry_after <= 60)
+        self.assertEqual(too_much.exception.rule, "amount_per_client")
+        self.assertTrue(3540 < too_much.exception.retry_after <= 3600)
+        self.assertEqual(shared_token.exception.rule, "clients_per_bank_token")
+
+    def test_counters_are_restored_from_the_last_save(self):
+        pre_check = VelocityPreCheckAdapter(self.rules)
+        for _ in range(2):
+            pre_check.evaluate(self.attempt(1, bank_token="tok_secret"))
+        pre_check.persist()
+
+        with self.assertRaises(PaymentRejectedError):
+            VelocityPreCheckAdapter(self.rules).evaluate(self.attempt(1))
+        self.assertEqual(VelocityWindow.objects.count(), 3)
+        self.assertFalse(VelocityWindow.objects.filter(key__contains="tok").exists())
+
+    @patch.object(PayStackAdapter, "process_payment")
+    @patch("Apis.services.random.random", return_value=0.1)
+    def test_rejected_payment_never_reaches_the_gateway(
+        self, mock_random, mock_process_payment
+    ):
+        mock_process_payment.return_value = GatewayProcessPaymentResponseDTO(
+            success=True, gateway_ref="gw_ref_123", raw_response={"status": True}
+        )
+        address = Address.objects.create(city="Test City", country="TC")
+        user = ClientModel.objects.create_user(
+            email="velocity@example.com", password="password123", house_address=address
+        )
+        Orders.objects.create(
+            client=user,
+            total_amount=1500.00,
+            shipping_address=address,
+            billing_address=address,
+        )
+        api_key, _ = MerchantAPIKey.issue(user, "tests", [SCOPE_PAYMENTS_CREATE])
+        self.client.force_authenticate(user=user, token=api_key)
+        pre_check = VelocityPreCheckAdapter(
+            {"payments_per_client": {"LIMIT": 1, "WINDOW_SECONDS": 60}}
+        )
+
+        with patch("Apis.services.get_pre_checks", return_value=[pre_check]):
+            responses = [
+                self.client.post(
+                    reverse("create-payment"),
+                    {"email": user.email, "bank_token": "tok_1"},
+                    format="json",
+                )
+                for _ in range(2)
+            ]
+
+        self.assertEqual(responses[0].status_code, status.HTTP_200_OK)
+        self.assertEqual(responses[1].status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(responses[1].data["rule"], "payments_per_client")
+        self.assertEqual(responses[1]["Retry-After"], "60")
+        self.assertEqual(PaymentTransaction.objects.filter(client=user).count(), 1)
+        mock_process_payment.assert_called_once()
+        self.assertEqual(mock_process_payment.call_args[0][0].bank_token, "tok_1")
+
+
+class WebhookSignatureTests(TestCase):
+    """
+    Test that webhooks are authenticated on the raw body before being parsed.
+    """
+
+    @override_settings(PAYSTACK_SECRET_KEY="sk_test_secret")
+    @patch("Apis.views.update_model_from_webhook")
+    def test_paystack_signature_is_checked_before_parsing(self, mock_update_model):
+        mock_update_model.return_value = {"status": "Success"}
+        body = b'{"event": "charge.success", "data": {"reference": "ref-1"}}'
+        headers = webhook_signatures.signature_headers("PayStack", body)
+
+        signed = self.client.post(
+            reverse("webhook"), body, content_type="application/json", headers=headers
+        )
+        with patch.object(
+            json_codec.FastJSONParser, "parse"
+        ) as parse, self.assertNumQueries(0):
+            tampered = self.client.post(
+                reverse("webhook"),
+                body.replace(b"ref-1", b"ref-2"),
+                content_type="application/json",
+                headers=headers,
+            )
+
+        self.assertEqual(signed.status_code, status.HTTP_200_OK)
+        mock_update_model.assert_called_once_with(
+            {"event": "charge.success", "data": {"reference": "ref-1"}}, "PayStack"
+        )
+        self.assertEqual(tampered.status_code, status.HTTP_401_UNAUTHORIZED)
+        parse.assert_not_called()
+
+    @override_settings(FLUTTERWAVE_SECRET_HASH=WEBHOOK_SECRET_HASH)
+    def test_missing_or_wrong_signature_is_rejected(self):
+        def rejected():
+            return metrics.WEBHOOKS_REJECTED.snapshot()["samples"].get("[]", 0.0)
+
+        rejected_before = rejected()
+        unsigned = self.client.post(
+            reverse("webhook"), {}, content_type="application/json"
+        )
+        wrong_hash = self.client.post(
+            reverse("webhook"),
+            {},
+            content_type="application/json",
+            headers={"verif-hash": "guessed"},
+        )
+        with override_settings(PAYSTACK_SECRET_KEY=None):
+            unconfigured = self.client.post(
+                reverse("webhook"),
+                {},
+                content_type="application/json",
+                headers={"x-paystack-signature": "0" * 128},
+            )
+
+        for response in (unsigned, wrong_hash, unconfigured):
+            self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(rejected() - rejected_before, 3)
+
+
+@override_settings(
+    PAYSTACK_SECRET_KEY="sk_test_secret", FLUTTERWAVE_SECRET_HASH=WEBHOOK_SECRET_HASH
+)
+class WebhookSchemaTests(TestCase):
+    """
+    Test the per-gateway webhook routes and their payload schemas.
+    """
+
+    def post(self, url_name, payload, gateway_name):
+        body = json.dumps(payload).encode()
+        return self.client.post(
+            reverse(url_name),
+            body,
+            content_type="application/json",
+            headers=webhook_signatures.signature_headers(gateway_name, body),
+        )
+
+    def test_gateway_route_dispatches_to_its_adapter(self):
+        address = Address.objects.create(city="Test City", country="TC")
+        user = ClientModel.objects.create_user(
+            email="schema@example.com", password="password123", house_address=address
+        )
+        order = Orders.objects.create(
+            client=user,
+            total_amount=1500.00,
+            shipping_address=address,
+            billing_address=address,
+        )
+        transaction = PaymentTransaction.objects.create(
+            client=user,
+            order=order,
+            amount=1500,
+            transaction_ref=str(uuid.uuid4()),
+            gateway_name="PayStack",
+        )
+        payload = {
+            "event": "charge.success",
+            "data": {
+                "reference": transaction.transaction_ref,
+                "status": "success",
+                "amount": 150000,
+                "customer": {"customer_code": "CUS_1"},
+            },
+        }
+
+        wrong_route = self.post("webhook-flutterwave", payload, "PayStack")
+        response = self.post("webhook-paystack", payload, "PayStack")
+
+        self.assertEqual(wrong_route.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        transaction.refresh_from_db()
+        self.assertEqual(transaction.status, "success")
+        self.assertEqual(transaction.gateway_ref, "CUS_1")
+
+    def test_malformed_events_fail_before_any_query(self):
+        reference = str(uuid.uuid4())
+        malformed = [
+            ("webhook-paystack", "PayStack", {"event": "charge.success"}),
+            (
+                "webhook-paystack",
+                "PayStack",
+                {
+                    "event": "charge.success",
+                    "data": {
+                        "reference": reference,
+                        "status": "success",
+                        "amount": 100,
+                        "customer": "CUS_1",
+                    },
+                },
+            ),
+            (
+                "webhook-flutterwave",
+                "FlutterWave",
+                {
+                    "event": "charge.completed",
+                    "data": {"tx_ref": reference, "status": "successful"},
+                },
+            ),
+            ("webhook-flutterwave", "FlutterWave", ["charge.completed"]),
+        ]
+
+        for url_name, gateway_name, payload in malformed:
+            with self.subTest(payload=payload), self.assertNumQueries(0):
+                response = self.post(url_name, payload, gateway_name)
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+                self.assertIn(f"Invalid {gateway_name} webhook", response.data["error"])
+
+        unknown = self.post(
+            "webhook-flutterwave",
+            {
+                "event": "charge.completed",
+                "data": {"tx_ref": reference, "status": "successful", "amount": 1},
+            },
+            "FlutterWave",
+        )
+        self.assertEqual(unknown.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class GatewayRegistryTests(TestCase):
+    """
+    Test the gateway adapters configured by PAYMENT_GATEWAYS.
+    """
+
+    @override_settings(
+        GATEWAY_SIMULATOR_ENABLED=False,
+        PAYMENT_GATEWAYS={
+            "PayStack": "Apis.paystack_adapter.PayStackAdapter",
+            "Rave": "Apis.flutterwave_adapter.FlutterWaveAdapter",
+        },
+    )
+    def test_adapters_are_looked_up_by_name(self):
+        self.assertEqual(gateway_names(), ["PayStack", "Rave"])
+        self.assertIsInstance(services.get_gateway_adapter("Rave"), FlutterWaveAdapter)
+        with self.assertRaisesMessage(ValueError, "Unknown payment gateway"):
+            services.get_gateway_adapter("FlutterWave")
+
+    @override_settings(
+        PAYMENT_GATEWAYS={"Rave": "Apis.flutterwave_adapter.FlutterWaveAdapter"}
+    )
+    @patch("Apis.services.random.random", return_value=0.1)
+    def test_payments_are_routed_to_configured_gateways(self, mock_random):
+        with patch(
+            "Apis.services.get_gateway_adapter", side_effect=ValueError("stop")
+        ) as get_gateway_adapter, self.assertRaisesMessage(ValueError, "stop"):
+            services.initiate_payment({"email": "x@example.com", "currency": "NGN"})
+
+        get_gateway_adapter.assert_called_once_with("Rave")
+
+    def test_credentials_are_read_per_instance(self):
+        with override_settings(
+            PAYSTACK_SECRET_KEY="sk_first", FLUTTERWAVE_SECRET_KEY="FLWSECK_first"
+        ):
+            paystack, flutterwave = PayStackAdapter(), FlutterWaveAdapter()
+        with override_settings(FLUTTERWAVE_SECRET_KEY="FLWSECK_rotated"):
+            rotated = FlutterWaveAdapter()
+
+        self.assertEqual(paystack.headers["Authorization"], "Bearer sk_first")
+        self.assertEqual(flutterwave.headers["Authorization"], "Bearer FLWSECK_first")
+        self.assertEqual(rotated.headers["Authorization"], "Bearer FLWSECK_rotated")
+        self.assertEqual(
+            PayStackAdapter("sk_merchant").headers["Authorization"],
+            "Bearer sk_merchant",
+        )
+
+
+@override_settings(FLUTTERWAVE_SECRET_HASH=WEBHOOK_SECRET_HASH)
+class WebOnlyMiddlewareTests(TestCase):
+    """
+    Test that /api/ requests skip the browser middleware and other routes do not.
+    """
+
+    @patch("Apis.views.update_model_from_webhook")
+    def test_api_requests_skip_web_only_middleware(self, mock_update_model):
+        mock_update_model.return_value = {"status": "Success"}
+        self.client.cookies["sessionid"] = "not-a-session"
+
+        api_response = self.client.post(
+            reverse("webhook"),
+            {},
+            content_type="application/json",
+            headers=SIGNED_WEBHOOK_HEADERS,
+        )
+        admin_response = self.client.get(reverse("admin:login"))
+
+        self.assertEqual(api_response.status_code, status.HTTP_200_OK)
+        self.assertNotIn("Cookie", api_response.get("Vary", ""))
+        self.assertEqual(admin_response.status_code, status.HTTP_200_OK)
+        self.assertEqual(admin_response["X-Frame-Options"], "DENY")
+        self.assertIn("csrftoken", admin_response.cookies)
+
+    def test_schema_pages_cannot_be_framed(self):
+        for name in ("swagger-ui", "redoc"):
+            with self.subTest(page=name):
+                response = self.client.get(reverse(name))
+
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertEqual(response["X-Frame-Options"], "DENY")
+
+
+@override_settings(FLUTTERWAVE_SECRET_HASH=WEBHOOK_SECRET_HASH)
+class SimulatedGatewayTests(TestCase):
+    """
+    Test the gateway simulator's determinism, timeouts and webhook emission.
+    """
+
+    def setUp(self):
+        reset_pre_checks()
+
+    def payment_details(self, deadline=None):
+        return PaymentDetails(
+            tx_ref=str(uuid.uuid4()),
+            amount=1500.0,
+            currency="NGN",
+            client_email="sim@example.com",
+            client_name="Sim User",
+            deadline=deadline,
+        )
+
+    def test_same_seed_draws_same_fates(self):
+        def draws():
+            profile = GatewaySimulationProfile(
+                latency=LatencyDistribution("lognormal", median_ms=100, sigma=0.5),
+                error_rate=0.3,
+                seed=42,
+            )
+            return [profile.draw() for _ in range(20)]
+
+        self.assertEqual(draws(), draws())
+
+    def test_latency_beyond_deadline_times_out(self):
+        profile = GatewaySimulationProfile(
+            latency=LatencyDistribution("constant", ms=500)
+        )
+        adapter = SimulatedGatewayAdapter("PayStack", profile=profile)
+
+        with self.assertRaises(requests.exceptions.ReadTimeout):
+            adapter.process_payment(self.payment_details(Deadline.after(0.05)))
+
+    @override_settings(GATEWAY_SIMULATOR_ENABLED=True)
+    def test_emitted_webhook_settles_transaction(self):
+        address = Address.objects.create(city="Test City", country="TC")
+        user = ClientModel.objects.create_user(
+            email="sim@example.com", password="password123", house_address=address
+        )
+        Orders.objects.create(
+            client=user,
+            total_amount=1500.00,
+            shipping_address=address,
+            billing_address=address,
+        )
+        profile = GatewaySimulationProfile(webhook_delay_seconds=0, seed=1)
+        delivered = []
+        webhook_sent = threading.Event()
+
+        def capture_webhook(payload, gateway_name):
+            delivered.append((payload, gateway_name))
+            webhook_sent.set()
+
+        with patch(
+            "Apis.simulated_gateway.get_simulation_profile", return_value=profile
+        ), patch("Apis.simulated_gateway.post_webhook", capture_webhook), patch(
+            "Apis.services.random.random", return_value=0.9
+        ):
+            result = services.initiate_payment({"email": user.email, "currency": "NGN"})
+            self.assertTrue(webhook_sent.wait(5))
+            payload, gateway_name = delivered[0]
+            body = json.dumps(payload).encode()
+            response = self.client.post(
+                reverse("webhook"),
+                body,
+                content_type="application/json",
+                headers=webhook_signatures.signature_headers(gateway_name, body),
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        transaction = PaymentTransaction.objects.get(
+            transaction_ref=result["transaction_ref"]
+        )
+        self.assertEqual(transaction.gateway_name, "FlutterWave")
+        self.assertTrue(transaction.gateway_ref.startswith("SIM-"))
+
+
+class StubGatewayTests(TestCase):
+    """
+    Test the adapters against the stub gateways of the load test harness.
+    """
+
+    def test_adapters_read_gateway_refs_from_stub_charges(self):
+        for gateway, adapter_class, endpoint in (
+            ("paystack", PayStackAdapter, "PAYSTACK_CHARGE_ENDPOINT"),
+            ("flutterwave", FlutterWaveAdapter, "FLUTTERWAVE_BANK_TRANSFER_ENDPOINT"),
+        ):
+            stub = StubGatewayServer(gateway, latency_ms=0, jitter_ms=0)
+            stub.start_in_background()
+            self.addCleanup(stub.server_close)
+            self.addCleanup(stub.shutdown)
+            details = PaymentDetails(
+                tx_ref=str(uuid.uuid4()),
+                amount=1500.0,
+                currency="NGN",
+                client_email="stub@example.com",
+                client_name="Stub User",
+            )
+
+            with self.subTest(gateway=gateway), override_settings(
+                **{endpoint: stub.settings_environment()[endpoint]}
+            ):
+                response = adapter_class().process_payment(details)
+
+                self.assertTrue(response.success)
+                self.assertIsNotNone(response.gateway_ref)
+
+
+class InMemoryClientRepositoryAdapterTests(TestCase):
+    """
+    Test the core payment flow against the in-memory repository adapter.
+    """
+
+    def test_initiate_then_webhook_updates_transaction(self):
+        repository = InMemoryClientRepositoryAdapter()
+        client = repository.add_client("memory@example.com", "Memory User")
+        repository.add_order(client.id, 1000.0)
+        latest_order_id = repository.add_order(client.id, 1500.0)
+        gateway_adapter = Mock(spec=PaymentGatewayInterface)
+        gateway_adapter.process_payment.return_value = GatewayProcessPaymentResponseDTO(
+            success=True, gateway_ref="gw_ref_1", raw_response={}
+        )
+        service = PaymentServiceCore(gateway_adapter, repository)
+
+        response = service.initiate_payment(
+            InitialPaymentRequestDTO(
+                client_email=client.email,
+                currency="NGN",
+                payment_gateway_name="MockGateway",
+            )
+        )
+        gateway_adapter.handle_webhook.return_value = GatewayWebhookEventDTO(
+            internal_transaction_ref=response.transaction_ref,
+            gateway_ref="gw_ref_1",
+            new_status="success",
+            amount=1500.0,
+        )
+        transaction = service.update_model_from_webhook({})
+
+        self.assertEqual(transaction.order_id, latest_order_id)
+        self.assertEqual(transaction.amount, 1500.0)
+        self.assertEqual(transaction.status, "success")
+        self.assertIsNone(repository.get_client_by_email("missing@example.com"))
+
+
+class SyntheticDataTests(TestCase):
+    """
+    Test the synthetic dataset generator command.
+    """
+
+    def generate(self, seed):
+        call_command(
+            "generate_synthetic_data",
+            clients=30,
+            products=10,
+            seed=seed,
+            batch_size=8,
+            stdout=io.StringIO(),
+        )
+        return list(
+            PaymentTransaction.objects.order_by("id").values_list(
+                "transaction_ref", "status", "gateway_name", "amount"
+            )
+        )
+
+    def test_same_seed_generates_same_consistent_data(self):
+        first = self.generate(seed=3)
+
+        self.assertEqual(get_user_model().objects.count(), 30)
+        self.assertTrue(first)
+        for order in Orders.objects.all()[:20]:
+            generated_total = order.total_amount
+            order.calculate_total_amount()
+            self.assertEqual(generated_total, order.total_amount)
+            self.assertEqual(
+                order.status,
+                order.payment_transaction.order_by("-created_at")[0].status,
+            )
+
+        PaymentTransaction.objects.all().delete()
+        OrderItem.objects.all().delete()
+        Orders.objects.all().delete()
+        get_user_model().objects.all().delete()
+        Products.objects.all().delete()
+        self.assertEqual(self.generate(seed=3), first)
@@ -0,0 +1,65 @@
+from abc import ABC, abstractmethod
+from typing import Optional
+from django.conf import settings
+from rest_framework.throttling import BaseThrottle
+from . import metrics
+from .models import MerchantAPIKey
+from .rate_limiting import token_buckets
+
+
+class TokenBucketThrottle(BaseThrottle, ABC):
+    """
+    Admits requests while the token bucket of their key has tokens left, with
+    the rate and burst of RATE_LIMITS[scope]. Requests without a key are not
+    limited. Denied requests get a 429 whose Retry-After is when the bucket
+    will have refilled enough.
+    """
+
+    scope: str = None
+
+    @abstractmethod
+    def get_key(self, request, view) -> Optional[str]:
+        """The key whose bucket the request draws from, or None to not limit it."""
+        pass
+
+    def allow_request(self, request, view):
+        self._wait = 0.0
+        if not settings.RATE_LIMIT_ENABLED:
+            return True
+        key = self.get_key(request, view)
+        if key is None:
+            return True
+        limit = settings.RATE_LIMITS[self.scope]
+        self._wait = token_buckets().try_acquire(
+            f"{self.scope}:{key}", limit["RATE"], limit["BURST"]
+        )
+        if self._wait:
+            metrics.REQUESTS_RATE_LIMITED.inc(self.scope)
+            return False
+        return True
+
+    def wait(self):
+        return self._wait
+
+
+class APIKeyRateThrottle(TokenBucketThrottle):
+    """Limits each merchant API key, across all of its clients."""
+
+    scope = "api_key"
+
+    def get_key(self, request, view):
+        if isinstance(request.auth, MerchantAPIKey):
+            return request.auth.prefix
+        return None
+
+
+class ClientRateThrottle(TokenBucketThrottle):
+    """Limits each client, by the email the payment is made for."""
+
+    scope = "client"
+
+    def get_key(self, request, view):
+        email = request.data.get("email") if hasattr(request.data, "get") else None
+        if isinstance(email, str) and email.strip():
+            return email.strip().lower()
+        return None
@@ -0,0 +1,224 @@
+import functools
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections import deque
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+TRACEPARENT_RE = re.compile(
+    r"^[0-9a-f]{2}-(?P<trace_id>[0-9a-f]{32})-[0-9a-f]{16}-(?P<flags>[0-9a-f]{2})$"
+)
+
+
+@dataclass
+class SpanRecord:
+    """A finished span as handed to the exporter.
+    - trace_id: Id shared by every span of the request.
+    - span_id: Id of this span.
+    - parent_id: Id of the enclosing span, None for the root span.
+    - name: What the span measured, e.g. PaymentServiceCore.initiate_payment.
+    - start: Wall clock start time (epoch seconds).
+    - duration: Duration in seconds.
+    - attributes: Extra key/value details.
+    - error: Exception class name if the span ended with an exception.
+    """
+
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str]
+    name: str
+    start: float
+    duration: float = 0.0
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+
+
+class InMemoryCollector:
+    """Keeps the most recent spans in memory, e.g. for tests or a debug endpoint."""
+
+    def __init__(self, max_spans: int = 10000):
+        self.spans = deque(maxlen=max_spans)
+
+    def export(self, span: SpanRecord):
+        self.spans.append(span)
+
+    def trace(self, trace_id: str) -> List[SpanRecord]:
+        return [span for span in list(self.spans) if span.trace_id == trace_id]
+
+    def clear(self):
+        self.spans.clear()
+
+
+class JsonLinesFileExporter:
+    """Appends every finished span to a local file as one JSON object per line."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = None
+
+    def export(self, span: SpanRecord):
+        line = json.dumps(asdict(span), default=str) + "\n"
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, "a", encoding="utf-8", buffering=1)
+            self._file.write(line)
+
+
+class _Tracer:
+    def __init__(self):
+        self.sample_rate = 0.0
+        self.exporter = None
+
+
+_tracer = _Tracer()
+_current_trace_id: ContextVar[Optional[str]] = ContextVar("trace_id", default=None)
+_current_span: ContextVar[Optional["Span"]] = ContextVar("span", default=None)
+
+
+def configure(sample_rate: float, exporter=None):
+    """
+    Sets the fraction of requests that are traced and where their spans go.
+    A sample rate of 0 (or no exporter) disables tracing entirely.
+    """
+    _tracer.sample_rate = sample_rate if exporter is not None else 0.0
+    _tracer.exporter = exporter
+
+
+def get_exporter():
+    return _tracer.exporter
+
+
+class Span:
+    """A timed section of a sampled trace. Use through span() or traced()."""
+
+    __slots__ = ("record", "_started", "_token")
+
+    def __init__(self, name: str, trace_id: str, parent: Optional["Span"], attributes):
+        self.record = SpanRecord(
+            trace_id=trace_id,
+            span_id=uuid.uuid4().hex[:16],
+            parent_id=parent.record.span_id if parent is not None else None,
+            name=name,
+            start=time.time(),
+            attributes=attributes,
+        )
+        self._started = 0.0
+        self._token = None
+
+    def set_attribute(self, key: str, value: Any):
+        self.record.attributes[key] = value
+
+    def __enter__(self):
+        self._token = _current_span.set(self)
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.record.duration = time.perf_counter() - self._started
+        if exc_type is not None:
+            self.record.error = exc_type.__name__
+        _current_span.reset(self._token)
+        try:
+            _tracer.exporter.export(self.record)
+        except Exception as e:
+            logger.warning("Could not export span %s: %s", self.record.name, e)
+        return False
+
+
+class _NoopSpan:
+    """Returned when the current request is not sampled; does nothing."""
+
+    __slots__ = ()
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def start_trace(traceparent: Optional[str] = None, request_id: Optional[str] = None):
+    """
+    Starts the trace of an incoming request.
+    The trace id is taken from a W3C traceparent header or an X-Request-ID header
+    when present, and generated otherwise.
+    :return: (trace_id, sampled, token) - pass token to end_trace().
+    """
+    trace_id = None
+    upstream_sampled = False
+    if traceparent:
+        match = TRACEPARENT_RE.match(traceparent.strip().lower())
+        if match:
+            trace_id = match.group("trace_id")
+            upstream_sampled = int(match.group("flags"), 16) & 1 == 1
+    if trace_id is None and request_id:
+        trace_id = request_id[:64]
+    if trace_id is None:
+        trace_id = uuid.uuid4().hex
+
+    sample_rate = _tracer.sample_rate
+    sampled = sample_rate > 0 and (
+        upstream_sampled or sample_rate >= 1 or random.random() < sample_rate
+    )
+    token = _current_trace_id.set(trace_id if sampled else None)
+    return trace_id, sampled, token
+
+
+def end_trace(token):
+    _current_trace_id.reset(token)
+
+
+def current_trace_id() -> Optional[str]:
+    """Trace id of the current request, None when it is not sampled."""
+    return _current_trace_id.get()
+
+
+def span(name: str, **attributes):
+    """
+    Context manager timing a section of the current trace.
+    When the request is not sampled this returns a shared no-op object, so the
+    cost is a single context variable lookup.
+    """
+    trace_id = _current_trace_id.get()
+    if trace_id is None:
+        return NOOP_SPAN
+    return Span(name, trace_id, _current_span.get(), attributes)
+
+
+def traced(func=None, *, name: Optional[str] = None):
+    """
+    Decorator running the function inside a span named after its qualified name.
+    Usable as @traced or @traced(name="...").
+    """
+
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            trace_id = _current_trace_id.get()
+            if trace_id is None:
+                return func(*args, **kwargs)
+            with Span(span_name, trace_id, _current_span.get(), {}):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    if func is not None:
+        return decorator(func)
+    return decorator
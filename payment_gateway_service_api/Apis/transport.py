@@ -0,0 +1,117 @@
+import os
+import threading
+import time
+from typing import Callable, Optional, Tuple, TypeVar
+from django.conf import settings
+import requests
+from requests.adapters import HTTPAdapter
+from . import tracing
+from .metrics import GATEWAY_CALL_LATENCY
+from .resilience import (
+    Deadline,
+    GatewayRetryableError,
+    get_bulkhead,
+    get_call_policy,
+)
+
+T = TypeVar("T")
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+
+def get_http_session() -> requests.Session:
+    """
+    Returns the process-wide pooled HTTP session used by the gateway adapters.
+    Reusing one session keeps TCP/TLS connections to the gateways alive across
+    requests instead of paying a new handshake per call. The session is rebuilt
+    after a fork so Gunicorn workers never share sockets with the master.
+    """
+    global _session, _session_pid
+    pid = os.getpid()
+    if _session is not None and _session_pid == pid:
+        return _session
+    with _session_lock:
+        if _session is None or _session_pid != pid:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=settings.HTTP_POOL_CONNECTIONS,
+                pool_maxsize=settings.HTTP_POOL_MAXSIZE,
+            )
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+            _session_pid = pid
+    return _session
+
+
+def gateway_call(
+    gateway_name: str,
+    send: Callable[[Tuple[float, float]], T],
+    idempotent: bool = False,
+    deadline: Optional[Deadline] = None,
+    **span_attributes,
+) -> T:
+    """
+    Runs send((connect_timeout, read_timeout)) as a call to a payment gateway.
+    Each attempt runs inside the gateway's bulkhead with the timeouts of its call
+    policy, and the policy decides whether a failed attempt is retried.
+    :param idempotent: True for calls that are safe to repeat, e.g. verifications.
+    :param deadline: Deadline of the incoming request, if any.
+    :param span_attributes: Extra attributes for the call's tracing span.
+    :raises requests.exceptions.RequestException: For failed calls.
+    """
+    policy = get_call_policy(gateway_name)
+    bulkhead = get_bulkhead(gateway_name)
+    deadline = deadline or Deadline.after(policy.deadline_budget)
+
+    started = time.perf_counter()
+    outcome = "error"
+    with tracing.span(f"gateway.{gateway_name}", **span_attributes) as call_span:
+        try:
+            result = policy.execute(
+                send, idempotent=idempotent, deadline=deadline, slot=bulkhead.slot
+            )
+            outcome = "success"
+            return result
+        except GatewayRetryableError:
+            outcome = "rejected"
+            raise
+        except requests.exceptions.Timeout:
+            outcome = "timeout"
+            raise
+        finally:
+            call_span.set_attribute("outcome", outcome)
+            GATEWAY_CALL_LATENCY.observe(
+                time.perf_counter() - started, gateway_name, outcome
+            )
+
+
+def gateway_request(
+    gateway_name: str,
+    method: str,
+    url: str,
+    idempotent: bool = False,
+    deadline: Optional[Deadline] = None,
+    **kwargs,
+) -> requests.Response:
+    """
+    Sends a request to a payment gateway on the pooled session, see gateway_call.
+    :raises requests.exceptions.RequestException: For failed calls, including
+        non-2xx responses.
+    """
+
+    def send(timeout):
+        response = get_http_session().request(method, url, timeout=timeout, **kwargs)
+        response.raise_for_status()
+        return response
+
+    return gateway_call(
+        gateway_name,
+        send,
+        idempotent=idempotent,
+        deadline=deadline,
+        method=method,
+        url=url,
+    )
@@ -4,4 +4,14 @@ from .views import InitiatePaymentView, HandleWebhookView
 urlpatterns = [
     path("v1/createpayment/", InitiatePaymentView.as_view(), name="create-payment"),
     path("v1/webhook/", HandleWebhookView.as_view(), name="webhook"),
+    path(
+        "v1/webhook/paystack/",
+        HandleWebhookView.as_view(gateway_name="PayStack"),
+        name="webhook-paystack",
+    ),
+    path(
+        "v1/webhook/flutterwave/",
+        HandleWebhookView.as_view(gateway_name="FlutterWave"),
+        name="webhook-flutterwave",
+    ),
 ]
@@ -0,0 +1,120 @@
+import functools
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional
+from django.conf import settings
+from django.core.cache import caches
+import logging
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = ("success", "failed")
+
+
+class VerificationCache:
+    """
+    Caches raw gateway verification responses keyed by gateway and reference.
+    Terminal results (success/failed) never change and are kept for a long time,
+    pending results only briefly so that a settled payment is picked up soon.
+    Entries live in a Django cache, so with a shared backend the sweeper, support
+    tools and merchant requests all reuse the same verification.
+    """
+
+    def __init__(
+        self,
+        cache_alias: str = "default",
+        terminal_ttl: int = 24 * 60 * 60,
+        pending_ttl: int = 15,
+    ):
+        self.cache_alias = cache_alias
+        self.terminal_ttl = terminal_ttl
+        self.pending_ttl = pending_ttl
+        # Verification in flight per key, so concurrent misses share one call
+        self._in_flight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    def make_key(self, gateway_name: str, transaction_ref: str) -> str:
+        return f"payment-verification:{gateway_name}:{transaction_ref}"
+
+    def get_or_fetch(
+        self,
+        gateway_name: str,
+        transaction_ref: str,
+        fetch: Callable[[str], Optional[Dict[str, Any]]],
+        get_status: Callable[[str, Dict[str, Any]], str],
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Returns the cached verification for the reference, calling `fetch` on a miss.
+        Concurrent misses for the same reference in this process wait for the
+        first call instead of each hitting the gateway, and share its result or
+        exception. Misses for other references never wait on it.
+        """
+        key = self.make_key(gateway_name, transaction_ref)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        with self._lock:
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = self._in_flight[key] = Future()
+        if not leader:
+            return future.result()
+
+        try:
+            # A call that finished since the first lookup may have cached it
+            raw_verification = self.cache.get(key)
+            if raw_verification is None:
+                raw_verification = fetch(transaction_ref)
+                if raw_verification:
+                    status = get_status(transaction_ref, raw_verification)
+                    ttl = (
+                        self.terminal_ttl
+                        if status in TERMINAL_STATUSES
+                        else self.pending_ttl
+                    )
+                    self.cache.set(key, raw_verification, ttl)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(raw_verification)
+            return raw_verification
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+
+    def invalidate(self, gateway_name: str, transaction_ref: str):
+        """Drops the cached verification, e.g. after a webhook changed the status."""
+        self.cache.delete(self.make_key(gateway_name, transaction_ref))
+
+
+verification_cache = VerificationCache(
+    cache_alias=settings.VERIFICATION_CACHE_ALIAS,
+    terminal_ttl=settings.VERIFICATION_CACHE_TERMINAL_TTL_SECONDS,
+    pending_ttl=settings.VERIFICATION_CACHE_PENDING_TTL_SECONDS,
+)
+
+
+def cached_verification(verify_payment):
+    """
+    Decorator for PaymentGatewayInterface.verify_payment implementations.
+    Serves repeated verifications from the verification cache, using the adapter's
+    gateway_name and parse_verification to key and classify the response.
+    """
+
+    @functools.wraps(verify_payment)
+    def wrapper(self, transaction_ref: str):
+        return verification_cache.get_or_fetch(
+            self.gateway_name,
+            transaction_ref,
+            lambda ref: verify_payment(self, ref),
+            lambda ref, raw: self.parse_verification(ref, raw).status,
+        )
+
+    return wrapper
@@ -1,13 +1,25 @@
 import logging
+import math
 import requests
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.http import parse_etags
 from drf_spectacular.utils import extend_schema
+from drf_spectacular.views import SCHEMA_KWARGS, SpectacularAPIView
+from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.views import APIView
+from . import memory_diagnostics, metrics, openapi_schema, webhook_signatures
+from .authentication import HasAPIKeyScope, MerchantAPIKeyAuthentication
+from .models import SCOPE_PAYMENTS_CREATE
+from .pre_checks_ports_and_adapters import PaymentRejectedError
+from .resilience import GatewayRetryableError, bulkhead_stats
+from .slow_queries import slow_query_log
+from .structured_logging import log_payload
+from .throttling import APIKeyRateThrottle, ClientRateThrottle
 from .serializers import BankTransferSerializers, BankTransferOutputSerializers
 from .services import initiate_payment, update_model_from_webhook
-import traceback
-
 
 logger = logging.getLogger(__name__)
 
@@ -21,8 +33,15 @@ class HandleWebhookView(APIView):
     various response statuses based on the outcome of the processing.
     The view is designed to be flexible and can handle different payment gateways
     by using the appropriate service function to update the model based on the webhook data.
+    Routed with a `gateway_name`, it only accepts that gateway's webhooks;
+    otherwise the gateway is the one whose signature the webhook carries.
     """
 
+    gateway_name = None
+    # Gateways are not users of the service: webhooks are authenticated by
+    # their signature instead
+    authentication_classes = []
+
     @extend_schema(
         request=None,
         responses={
@@ -48,11 +67,27 @@ class HandleWebhookView(APIView):
         Returns:
             Response: A DRF Response object with the status of the processing.
         """
+        # Checked on the raw bytes, so forged or junk requests are turned away
+        # before any parsing or database access
+        gateway_name = webhook_signatures.verify_signature(
+            request.headers, request.body, self.gateway_name
+        )
+        if gateway_name is None:
+            metrics.WEBHOOKS_REJECTED.inc()
+            return Response(
+                {"error": "Invalid webhook signature"},
+                status=status.HTTP_401_UNAUTHORIZED,
+            )
+
         data = request.data
-        logger.info(f"Received webhook data: {data}")
+        logger.info(
+            "Received webhook event %s",
+            data.get("event") if isinstance(data, dict) else None,
+        )
+        log_payload(logger, "webhook", "Webhook payload: %s", data)
 
         try:
-            response_dto = update_model_from_webhook(data)
+            response_dto = update_model_from_webhook(data, gateway_name)
             if not response_dto:
                 logger.warning("Transaction not found for the provided reference.")
                 return Response(
@@ -61,7 +96,7 @@ class HandleWebhookView(APIView):
             logger.info("Webhook processed successfully.")
             return Response(response_dto, status=status.HTTP_200_OK)
         except ValueError as e:
-            logger.error(f"ValueError occurred: {str(e)}")
+            logger.error("ValueError occurred: %s", e)
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
 
@@ -74,6 +109,15 @@ class InitiatePaymentView(APIView):
     or appropriate error messages in case of failure.
     """
 
+    # Merchants call this server to server with an API key, which is verified
+    # from an in-process cache in the steady state (see Apis.authentication)
+    authentication_classes = [MerchantAPIKeyAuthentication]
+    permission_classes = [HasAPIKeyScope]
+    required_scopes = [SCOPE_PAYMENTS_CREATE]
+    # Checked in shared memory before the payment reaches a gateway (see
+    # Apis.rate_limiting)
+    throttle_classes = [APIKeyRateThrottle, ClientRateThrottle]
+
     @extend_schema(
         request=BankTransferSerializers,
         responses={200: BankTransferOutputSerializers},
@@ -102,23 +146,162 @@ class InitiatePaymentView(APIView):
             output_response_dict = initiate_payment(validated_data)
             output_serializer = BankTransferOutputSerializers(output_response_dict)
             logger.info(
-                f"Payment initiated successfully: {output_response_dict['transaction_ref']}"
+                "Payment initiated successfully: %s",
+                output_response_dict["transaction_ref"],
             )
             return Response(output_serializer.data, status=status.HTTP_200_OK)
 
         except ValueError as e:
-            logger.error(f"ValueError occurred: {str(e)}")
+            logger.error("ValueError occurred: %s", e)
             return Response({"error": str(e)}, status=status.HTTP_404_NOT_FOUND)
+        except PaymentRejectedError as e:
+            logger.warning("Payment rejected by %s: %s", e.rule, e)
+            return Response(
+                {"error": "Payment rejected", "rule": e.rule, "detail": str(e)},
+                status=status.HTTP_429_TOO_MANY_REQUESTS,
+                headers={"Retry-After": str(math.ceil(e.retry_after))},
+            )
+        except GatewayRetryableError as e:
+            logger.warning("Payment gateway unavailable: %s", e)
+            return Response(
+                {"error": "Payment gateway is busy, retry later", "detail": str(e)},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={"Retry-After": str(math.ceil(e.retry_after))},
+            )
         except requests.exceptions.RequestException as e:
-            logger.error(f"Payment gateway communication error: {str(e)}")
+            logger.error("Payment gateway communication error: %s", e)
             return Response(
                 {"error": "Payment gateway communication error:", "detail": str(e)},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
         except Exception as e:
-            logger.error(f"An unexpected error occurred: {str(e)}")
-            logger.error(traceback.format_exc())
+            logger.exception("An unexpected error occurred: %s", e)
             return Response(
                 {"error": "An internal error occurred", "detail": str(e)},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
+
+
+class GatewayBulkheadStatusView(APIView):
+    """
+    Admin-only endpoint exposing the occupancy of each gateway bulkhead:
+    calls in flight, calls queued and the number of rejected calls.
+    """
+
+    permission_classes = [IsAdminUser]
+
+    @extend_schema(
+        request=None,
+        responses={200: {"description": "Bulkhead statistics per gateway."}},
+        summary="Gateway Bulkhead Status",
+        description="Returns the concurrency, queue and rejection counts of each gateway bulkhead in this worker.",
+    )
+    def get(self, request, *args, **kwargs):
+        return Response(bulkhead_stats(), status=status.HTTP_200_OK)
+
+
+class SlowQueryLogView(APIView):
+    """
+    Admin-only endpoint listing the slow queries recorded by this worker,
+    grouped by normalized SQL fingerprint with the code that issued them.
+    """
+
+    permission_classes = [IsAdminUser]
+
+    @extend_schema(
+        request=None,
+        responses={200: {"description": "Slow queries grouped by fingerprint."}},
+        summary="Slow Query Log",
+        description="Returns the slow queries recorded in this worker, aggregated by SQL fingerprint, and the most recent ones.",
+    )
+    def get(self, request, *args, **kwargs):
+        return Response(
+            {
+                "threshold_ms": slow_query_log.threshold_ms,
+                "fingerprints": slow_query_log.aggregate(),
+                "recent": slow_query_log.recent(50),
+            },
+            status=status.HTTP_200_OK,
+        )
+
+
+class MemoryDiagnosticsView(APIView):
+    """
+    Admin-only endpoint reporting this worker's memory, open files and database
+    connections, with the allocation sites that grew since the baseline when
+    tracemalloc is enabled. POST takes a new baseline.
+    """
+
+    permission_classes = [IsAdminUser]
+
+    @extend_schema(
+        request=None,
+        responses={200: {"description": "Memory, file and connection usage."}},
+        summary="Memory Diagnostics",
+        description="Returns the traced memory, open file and database connection counts of this worker, and its top allocation sites since the baseline.",
+    )
+    def get(self, request, *args, **kwargs):
+        try:
+            limit = int(request.query_params.get("limit", 25))
+        except ValueError:
+            return Response(
+                {"error": "limit must be an integer"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return Response(
+            memory_diagnostics.memory_report(limit), status=status.HTTP_200_OK
+        )
+
+    @extend_schema(
+        request=None,
+        responses={204: {"description": "Baseline snapshot taken."}},
+        summary="Reset Memory Baseline",
+        description="Takes a new tracemalloc snapshot that later allocation growth is compared against.",
+    )
+    def post(self, request, *args, **kwargs):
+        memory_diagnostics.reset_baseline()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class CachedSchemaView(SpectacularAPIView):
+    """
+    OpenAPI schema served from memory. It is generated once per code version
+    (see Apis.openapi_schema), rendered once per format and sent with an ETag
+    and long cache headers, so the Swagger and Redoc pages no longer make a
+    worker introspect every view. Requests for another version or language fall
+    back to generating the schema.
+    """
+
+    @extend_schema(**SCHEMA_KWARGS)
+    def get(self, request, *args, **kwargs):
+        if self.api_version or request.version or request.GET.get("lang"):
+            return super().get(request, *args, **kwargs)
+        renderer = request.accepted_renderer
+        body, etag = openapi_schema.rendered_schema(renderer)
+        headers = {
+            "ETag": etag,
+            "Cache-Control": (
+                f"public, max-age={settings.OPENAPI_SCHEMA_MAX_AGE_SECONDS}"
+            ),
+            "Vary": "Accept",
+        }
+        if etag in parse_etags(request.headers.get("If-None-Match", "")):
+            return HttpResponse(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        headers["Content-Disposition"] = (
+            f'inline; filename="{self._get_filename(request, None)}"'
+        )
+        content_type = renderer.media_type
+        if renderer.charset:
+            content_type = f"{content_type}; charset={renderer.charset}"
+        return HttpResponse(body, content_type=content_type, headers=headers)
+
+
+def metrics_view(request):
+    """
+    Exposes request, gateway, database and webhook metrics in the Prometheus
+    text format. In multiprocess mode the numbers cover every worker.
+    """
+    return HttpResponse(
+        metrics.render_text(metrics.collect()),
+        content_type="text/plain; version=0.0.4; charset=utf-8",
+    )
@@ -0,0 +1,82 @@
+from typing import Any, Dict
+
+# Only the fields the adapters read are described: the rest of the event,
+# which can be large (PayStack sends the whole authorization and log history),
+# is never walked by the validator.
+PAYSTACK_WEBHOOK_SCHEMA = {
+    "type": "object",
+    "required": ["event", "data"],
+    "properties": {
+        "event": {"type": "string"},
+        "data": {
+            "type": "object",
+            "required": ["reference", "status", "amount"],
+            "properties": {
+                "reference": {"type": "string", "minLength": 1},
+                "status": {"type": "string"},
+                # In kobo
+                "amount": {"type": "integer", "minimum": 0},
+                "customer": {
+                    "type": ["object", "null"],
+                    "properties": {"customer_code": {"type": ["string", "null"]}},
+                },
+            },
+        },
+    },
+}
+
+FLUTTERWAVE_WEBHOOK_SCHEMA = {
+    "type": "object",
+    "required": ["event", "data"],
+    "properties": {
+        "event": {"type": "string"},
+        "data": {
+            "type": "object",
+            "required": ["tx_ref", "status", "amount"],
+            "properties": {
+                "tx_ref": {"type": "string", "minLength": 1},
+                "status": {"type": "string"},
+                "amount": {"type": "number", "minimum": 0},
+                "flw_ref": {"type": ["string", "null"]},
+            },
+        },
+    },
+}
+
+WEBHOOK_SCHEMAS = {
+    "PayStack": PAYSTACK_WEBHOOK_SCHEMA,
+    "FlutterWave": FLUTTERWAVE_WEBHOOK_SCHEMA,
+}
+
+# Built on the first webhook of each gateway rather than at import, which keeps
+# jsonschema out of worker startup; validating then only walks the precompiled
+# schema
+_validators = {}
+
+
+def _validator(gateway_name: str):
+    validator = _validators.get(gateway_name)
+    if validator is None:
+        from jsonschema import Draft7Validator
+
+        validator = Draft7Validator(WEBHOOK_SCHEMAS[gateway_name])
+        _validators[gateway_name] = validator
+    return validator
+
+
+def validate_webhook(gateway_name: str, payload: Any) -> Dict[str, Any]:
+    """
+    Returns the `data` object of a webhook event of the gateway, or raises a
+    ValueError naming the first field that does not match its schema. The
+    offending value is left out of the message, which may be echoed back.
+    """
+    error = next(_validator(gateway_name).iter_errors(payload), None)
+    if error is not None:
+        if error.validator == "required":
+            problem = error.message
+        else:
+            problem = f"{error.validator} {error.validator_value!r} not satisfied"
+        raise ValueError(
+            f"Invalid {gateway_name} webhook at {error.json_path}: {problem}"
+        )
+    return payload["data"]
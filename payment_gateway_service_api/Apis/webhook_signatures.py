@@ -0,0 +1,59 @@
+import hashlib
+import hmac
+from typing import Dict, Mapping, Optional
+from django.conf import settings
+
+PAYSTACK_SIGNATURE_HEADER = "x-paystack-signature"
+FLUTTERWAVE_SIGNATURE_HEADER = "verif-hash"
+
+
+def paystack_signature(body: bytes) -> str:
+    """HMAC-SHA512 of the raw body keyed with the PayStack secret key, as hex."""
+    return hmac.new(
+        settings.PAYSTACK_SECRET_KEY.encode(), body, hashlib.sha512
+    ).hexdigest()
+
+
+def verify_signature(
+    headers: Mapping[str, str], body: bytes, gateway_name: Optional[str] = None
+) -> Optional[str]:
+    """
+    Name of the gateway whose signature the webhook carries and matches, or
+    None. PayStack signs the raw body with HMAC-SHA512 of the secret key,
+    FlutterWave sends the secret hash configured on its dashboard. Only the
+    headers and the raw bytes are looked at, so a forged request costs no
+    parsing, and a gateway whose secret is not configured is never accepted.
+    With `gateway_name`, only that gateway's signature is accepted.
+    """
+    if gateway_name in (None, "PayStack"):
+        signature = headers.get(PAYSTACK_SIGNATURE_HEADER)
+        if signature is not None:
+            if settings.PAYSTACK_SECRET_KEY and hmac.compare_digest(
+                signature.encode(), paystack_signature(body).encode()
+            ):
+                return "PayStack"
+            return None
+    if gateway_name in (None, "FlutterWave"):
+        secret_hash = headers.get(FLUTTERWAVE_SIGNATURE_HEADER)
+        if secret_hash is not None:
+            if settings.FLUTTERWAVE_SECRET_HASH and hmac.compare_digest(
+                secret_hash.encode(), settings.FLUTTERWAVE_SECRET_HASH.encode()
+            ):
+                return "FlutterWave"
+    return None
+
+
+def signature_headers(gateway_name: str, body: bytes) -> Dict[str, str]:
+    """
+    Headers the gateway would send with `body`, for the gateway simulator and
+    the benchmarks, which deliver webhooks like the real gateways.
+    """
+    if gateway_name == "PayStack":
+        if not settings.PAYSTACK_SECRET_KEY:
+            raise ValueError("PAYSTACK_SECRET_KEY is not set")
+        return {PAYSTACK_SIGNATURE_HEADER: paystack_signature(body)}
+    if gateway_name == "FlutterWave":
+        if not settings.FLUTTERWAVE_SECRET_HASH:
+            raise ValueError("FLUTTERWAVE_SECRET_HASH is not set")
+        return {FLUTTERWAVE_SIGNATURE_HEADER: settings.FLUTTERWAVE_SECRET_HASH}
+    raise ValueError(f"Unknown gateway {gateway_name}")
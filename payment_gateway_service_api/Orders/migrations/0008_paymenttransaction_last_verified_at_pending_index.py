@@ -0,0 +1,32 @@
+# Generated by Django 5.2 on 2026-10-19 01:35
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("Orders", "0007_alter_paymenttransaction_client_and_more"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="paymenttransaction",
+            name="last_verified_at",
+            field=models.DateTimeField(
+                blank=True,
+                help_text="When the pending transaction sweeper last verified this transaction.",
+                null=True,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="paymenttransaction",
+            index=models.Index(
+                condition=models.Q(("status", "pending")),
+                fields=["created_at"],
+                name="pending_transaction_idx",
+            ),
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import Q
 from django.dispatch import receiver
 from django.db.models.signals import post_save, post_delete
 from django.core.validators import MinValueValidator
@@ -64,7 +65,8 @@ class Orders(models.Model):
 
     def calculate_total_amount(self):
         total = sum(
-            item.product.price * item.quantity for item in self.order_line.all()
+            item.product.price * item.quantity
+            for item in self.order_line.select_related("product")
         )
         self.total_amount = total
 
@@ -117,6 +119,11 @@ class PaymentTransaction(models.Model):
         help_text="Payment gateway transaction reference.",
     )
     gateway_name = models.CharField(max_length=50, help_text="Payment gateway name.")
+    last_verified_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="When the pending transaction sweeper last verified this transaction.",
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -124,6 +131,14 @@ class PaymentTransaction(models.Model):
         verbose_name = "Payment Transaction"
         verbose_name_plural = "Payment Transactions"
         ordering = ["-created_at"]
+        indexes = [
+            # Partial index: only pending rows are ever claimed by the sweeper
+            models.Index(
+                fields=["created_at"],
+                condition=Q(status="pending"),
+                name="pending_transaction_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.gateway_name} - {self.transaction_ref} - {self.status}"
@@ -1,5 +1,6 @@
 from django.forms import ValidationError
 from django.test import TestCase
+from Apis.query_budget import query_budget
 from .models import Products, Orders, OrderItem, Address
 from django.contrib.auth import get_user_model
 
@@ -73,6 +74,25 @@ class OrdersTestCase(TestCase):
         self.assertEqual(self.order_item.quantity, 2)
         self.assertEqual(OrderItem.objects.count(), 1)
 
+    def test_order_item_save_query_budget(self):
+        """
+        Test that saving an order item recalculates the order total in a fixed
+        number of queries, however many items the order already has
+        """
+        for quantity in (1, 2):
+            OrderItem.objects.create(
+                product=self.product, order=self.order_1, quantity=quantity
+            )
+
+        # insert, fetch items with their products, update the order total
+        with query_budget(3):
+            OrderItem.objects.create(
+                product=self.product, order=self.order_1, quantity=3
+            )
+
+        self.order_1.refresh_from_db()
+        self.assertEqual(self.order_1.total_amount, 600)
+
     def test_order_item_str(self):
         """
         Test the string representation of an order item
@@ -1,4 +1,5 @@
 from django.test import TestCase
+from Apis.query_budget import query_budget
 from .models import Products
 
 
@@ -69,6 +70,16 @@ class ProductsModelTest(TestCase):
             "CHECK constraint failed: quantity_greater_than_zero",
         )
 
+    @query_budget(1)
+    def test_available_products_query_budget(self):
+        """
+        Test that listing available products takes a single query.
+        """
+        self.assertEqual(
+            [p.name for p in Products.objects.filter(is_available=True)],
+            ["Test Product 1"],
+        )
+
     def test_product_availability(self):
         """
         Test the availability of a product.
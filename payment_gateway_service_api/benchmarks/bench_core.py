@@ -0,0 +1,151 @@
+"""
+Microbenchmarks of the core layer, isolated from the database and the network.
+
+PaymentServiceCore runs against InMemoryClientRepositoryAdapter and a gateway
+adapter that answers instantly, so the numbers are the cost of the core itself:
+DTO creation, uuid generation, logging and tracing hooks. From the project
+directory:
+
+    python -m benchmarks.bench_core --iterations 20000 --output core.json
+"""
+
+import argparse
+import itertools
+import json
+import logging
+import os
+import platform
+import statistics
+import time
+import uuid
+from datetime import datetime, timezone
+
+from .load_test import git_commit
+
+
+def setup_django():
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret-key")
+    os.environ.setdefault(
+        "DJANGO_SETTINGS_MODULE", "payment_gateway_service_api.settings"
+    )
+    import django
+
+    django.setup()
+
+
+def measure(func, iterations: int, repeats: int) -> dict:
+    """Runs func `iterations` times per repeat and reports the cost per call."""
+    per_call = []
+    for _ in range(repeats):
+        started = time.perf_counter_ns()
+        for _ in range(iterations):
+            func()
+        per_call.append((time.perf_counter_ns() - started) / iterations)
+    return {
+        "iterations": iterations,
+        "repeats": repeats,
+        "best_ns": round(min(per_call), 1),
+        "median_ns": round(statistics.median(per_call), 1),
+    }
+
+
+def benchmarks(iterations: int):
+    from Apis.core_logic import InitialPaymentRequestDTO, PaymentServiceCore
+    from Apis.payments_ports_and_adapters import (
+        GatewayProcessPaymentResponseDTO,
+        GatewayWebhookEventDTO,
+        PaymentGatewayInterface,
+    )
+    from Apis.repositories_ports_and_adapters import InMemoryClientRepositoryAdapter
+
+    class InstantGatewayAdapter(PaymentGatewayInterface):
+        gateway_name = "Instant"
+        response = GatewayProcessPaymentResponseDTO(
+            success=True, gateway_ref="gw_ref", raw_response={"status": "success"}
+        )
+
+        def process_payment(self, payment_details):
+            return self.response
+
+        def handle_webhook(self, raw_webhook_data):
+            data = raw_webhook_data["data"]
+            return GatewayWebhookEventDTO(
+                internal_transaction_ref=data["tx_ref"],
+                gateway_ref="gw_ref",
+                new_status="success",
+                amount=data["amount"],
+            )
+
+        def verify_payment(self, transaction_ref):
+            return {}
+
+        def parse_verification(self, transaction_ref, raw_verification):
+            return None
+
+    repository = InMemoryClientRepositoryAdapter()
+    client = repository.add_client("bench@example.com", "Bench User")
+    repository.add_order(client.id, 1500.0)
+    service = PaymentServiceCore(InstantGatewayAdapter(), repository)
+    request = InitialPaymentRequestDTO(
+        client_email=client.email, currency="NGN", payment_gateway_name="Instant"
+    )
+
+    # Transactions for the webhook benchmark to update
+    refs = [
+        service.initiate_payment(request).transaction_ref for _ in range(iterations)
+    ]
+    webhooks = itertools.cycle(
+        [{"data": {"tx_ref": ref, "amount": 1500.0}} for ref in refs]
+    )
+    logger = logging.getLogger("benchmarks.bench_core")
+    amount = 1500.0
+
+    return {
+        "initiate_payment": lambda: service.initiate_payment(request),
+        "update_model_from_webhook": lambda: service.update_model_from_webhook(
+            next(webhooks)
+        ),
+        "initial_request_dto": lambda: InitialPaymentRequestDTO(
+            client_email=client.email, currency="NGN", payment_gateway_name="Instant"
+        ),
+        "uuid4_str": lambda: str(uuid.uuid4()),
+        # Disabled log calls still build their f-string message
+        "log_disabled_fstring": lambda: logger.debug(
+            f"Charging {amount} for {client.email}"
+        ),
+        "log_disabled_lazy": lambda: logger.debug(
+            "Charging %s for %s", amount, client.email
+        ),
+        "repository_lookup": lambda: repository.get_client_by_email(client.email),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--output", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    setup_django()
+    # Keep the INFO level configured in settings, but drop the output
+    logging.getLogger().handlers = [logging.NullHandler()]
+
+    results = {}
+    for name, func in benchmarks(args.iterations).items():
+        results[name] = measure(func, args.iterations, args.repeats)
+        print(f"{name:<28} best {results[name]['best_ns'] / 1000:>9.3f} us/call")
+
+    if args.output:
+        report = {
+            "commit": git_commit(),
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "results": results,
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
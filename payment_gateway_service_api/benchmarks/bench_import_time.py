@@ -0,0 +1,111 @@
+"""
+Import time of a worker booting, as measured by python -X importtime.
+
+Each run is a fresh interpreter doing what a Gunicorn worker does before it
+serves its first request: loading the WSGI application, which sets Django up,
+then the URLconf, which imports the views and everything behind them. Bytecode
+is compiled by a warm-up run first. The run with the median wall time is
+broken down by top-level package and by module, using the time spent in each
+module itself, so a slow dependency is charged once however deep it is pulled
+in. From the project directory:
+
+    python -m benchmarks.bench_import_time --repeats 10 --output imports.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+
+from .load_test import PROJECT_DIR, git_commit
+
+BOOT = (
+    "import payment_gateway_service_api.wsgi\n"
+    "from django.urls import get_resolver\n"
+    "get_resolver().url_patterns\n"
+)
+
+
+def boot_once() -> dict:
+    env = dict(os.environ)
+    env.setdefault("SECRET_KEY", "benchmark-secret-key")
+    env.setdefault("DJANGO_SETTINGS_MODULE", "payment_gateway_service_api.settings")
+    started = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", BOOT],
+        cwd=PROJECT_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    wall_ms = (time.perf_counter() - started) * 1000
+    modules = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or line.endswith("imported package"):
+            continue
+        self_us, _, name = line[len("import time:") :].split("|")
+        modules[name.strip()] = int(self_us) / 1000
+    return {"wall_ms": wall_ms, "modules": modules}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--output", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    boot_once()
+    runs = sorted(
+        (boot_once() for _ in range(args.repeats)), key=lambda r: r["wall_ms"]
+    )
+    median = runs[len(runs) // 2]
+    packages = defaultdict(float)
+    for name, self_ms in median["modules"].items():
+        packages[name.split(".")[0]] += self_ms
+    results = {
+        "repeats": args.repeats,
+        "wall_ms": {
+            "best": runs[0]["wall_ms"],
+            "median": statistics.median(run["wall_ms"] for run in runs),
+        },
+        "import_ms": sum(median["modules"].values()),
+        "modules_imported": len(median["modules"]),
+        "packages_ms": dict(
+            sorted(packages.items(), key=lambda item: item[1], reverse=True)[: args.top]
+        ),
+        "slowest_modules_ms": dict(
+            sorted(median["modules"].items(), key=lambda item: item[1], reverse=True)[
+                : args.top
+            ]
+        ),
+    }
+    print(
+        f"boot {results['wall_ms']['median']:.1f} ms median, "
+        f"{results['wall_ms']['best']:.1f} ms best; "
+        f"{results['modules_imported']} modules imported in "
+        f"{results['import_ms']:.1f} ms"
+    )
+    for name, self_ms in results["packages_ms"].items():
+        print(f"{name:<32} {self_ms:>8.1f} ms")
+
+    if args.output:
+        report = {
+            "commit": git_commit(),
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "results": results,
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""
+JSON decoding and encoding cost of realistic PayStack and FlutterWave payloads.
+
+Compares the standard library with orjson for the gateway responses the adapters
+decode and the webhook bodies the API parses, and DRF's JSONParser/JSONRenderer
+with Apis.json_codec's FastJSONParser/FastJSONRenderer. From the project
+directory:
+
+    python -m benchmarks.bench_json --iterations 20000 --output json.json
+"""
+
+import argparse
+import io
+import json
+import platform
+from datetime import datetime, timezone
+
+from .bench_core import measure, setup_django
+from .load_test import git_commit
+
+
+def paystack_charge_response() -> dict:
+    return {
+        "status": True,
+        "message": "Charge attempted",
+        "data": {
+            "id": 4099260516,
+            "domain": "live",
+            "status": "send_otp",
+            "reference": "0d5e2a4f-3b8c-4f1e-9d7a-1a2b3c4d5e6f",
+            "amount": 150000,
+            "message": None,
+            "gateway_response": "Approved",
+            "paid_at": None,
+            "created_at": "2026-10-19T10:15:02.000Z",
+            "channel": "bank",
+            "currency": "NGN",
+            "ip_address": "102.89.34.11",
+            "metadata": {"custom_fields": [], "referrer": "https://shop.example"},
+            "fees": None,
+            "customer": {
+                "id": 180063193,
+                "first_name": "Adaeze",
+                "last_name": "Okafor",
+                "email": "adaeze@example.com",
+                "customer_code": "CUS_2j1v4kq0jv1ah8b",
+                "phone": "+2348012345678",
+                "metadata": None,
+                "risk_action": "default",
+            },
+            "authorization": {
+                "authorization_code": "AUTH_xm9tt3yqwz",
+                "bin": "000000",
+                "last4": "0000",
+                "channel": "bank",
+                "bank": "Zenith Bank",
+                "country_code": "NG",
+                "reusable": False,
+                "account_name": "ADAEZE OKAFOR",
+            },
+            "display_text": "Please enter the OTP sent to 0801***5678",
+        },
+    }
+
+
+def paystack_webhook() -> dict:
+    data = paystack_charge_response()["data"]
+    data = {**data, "status": "success", "paid_at": "2026-10-19T10:16:40.000Z"}
+    data["log"] = {
+        "start_time": 1760868902,
+        "time_spent": 98,
+        "attempts": 1,
+        "errors": 0,
+        "success": True,
+        "mobile": False,
+        "input": [],
+        "history": [
+            {"type": "action", "message": f"Step {step} completed", "time": step * 7}
+            for step in range(12)
+        ],
+    }
+    data["plan"] = {}
+    data["subaccount"] = {}
+    data["requested_amount"] = 150000
+    return {"event": "charge.success", "data": data}
+
+
+def flutterwave_charge_response() -> dict:
+    return {
+        "status": "success",
+        "message": "Charge initiated",
+        "meta": {
+            "authorization": {
+                "transfer_reference": "MockFLWRef-1760868902123",
+                "transfer_account": "0067100155",
+                "transfer_bank": "Mock Bank",
+                "account_expiration": "2026-10-19T11:15:02.000Z",
+                "transfer_note": "Mock note",
+                "transfer_amount": "1521.00",
+                "mode": "banktransfer",
+            }
+        },
+    }
+
+
+def flutterwave_webhook() -> dict:
+    return {
+        "event": "charge.completed",
+        "data": {
+            "id": 285959875,
+            "tx_ref": "0d5e2a4f-3b8c-4f1e-9d7a-1a2b3c4d5e6f",
+            "flw_ref": "MockFLWRef-1760868902123",
+            "device_fingerprint": "62wd23423rq324323qew1",
+            "amount": 1500,
+            "currency": "NGN",
+            "charged_amount": 1521,
+            "app_fee": 21,
+            "merchant_fee": 0,
+            "processor_response": "Approved by Financial Institution",
+            "auth_model": "PIN",
+            "ip": "102.89.34.11",
+            "narration": "Payment for order",
+            "status": "successful",
+            "payment_type": "bank_transfer",
+            "created_at": "2026-10-19T10:15:02.000Z",
+            "account_id": 17321,
+            "customer": {
+                "id": 215604089,
+                "name": "Adaeze Okafor",
+                "phone_number": "+2348012345678",
+                "email": "adaeze@example.com",
+                "created_at": "2026-10-19T10:15:02.000Z",
+            },
+        },
+        "event.type": "BANK_TRANSFER_TRANSACTION",
+    }
+
+
+PAYLOADS = {
+    "paystack_charge_response": paystack_charge_response,
+    "paystack_webhook": paystack_webhook,
+    "flutterwave_charge_response": flutterwave_charge_response,
+    "flutterwave_webhook": flutterwave_webhook,
+}
+
+
+def benchmarks(payload: dict) -> tuple:
+    """Size of the encoded payload and the calls to time, by name."""
+    from rest_framework.parsers import JSONParser
+    from rest_framework.renderers import JSONRenderer
+    from Apis import json_codec
+
+    encoded = json.dumps(payload).encode()
+    cases = {
+        "stdlib_loads": lambda: json.loads(encoded),
+        "drf_parser": lambda: JSONParser().parse(io.BytesIO(encoded)),
+        "fast_parser": lambda: json_codec.FastJSONParser().parse(io.BytesIO(encoded)),
+        "stdlib_dumps": lambda: json.dumps(payload).encode(),
+        "drf_renderer": lambda: JSONRenderer().render(payload),
+        "fast_renderer": lambda: json_codec.FastJSONRenderer().render(payload),
+    }
+    if json_codec.HAS_ORJSON:
+        import orjson
+
+        cases["orjson_loads"] = lambda: orjson.loads(encoded)
+        cases["orjson_dumps"] = lambda: orjson.dumps(payload)
+    return len(encoded), cases
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--output", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    setup_django()
+    from Apis import json_codec
+
+    results = {}
+    for payload_name, build in PAYLOADS.items():
+        size, cases = benchmarks(build())
+        results[payload_name] = {"bytes": size}
+        print(f"{payload_name} ({size} bytes)")
+        for name, func in cases.items():
+            results[payload_name][name] = measure(func, args.iterations, args.repeats)
+            print(
+                f"  {name:<16} best "
+                f"{results[payload_name][name]['best_ns'] / 1000:>8.2f} us/call"
+            )
+
+    if args.output:
+        report = {
+            "commit": git_commit(),
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "orjson": json_codec.HAS_ORJSON,
+            "results": results,
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+Cost of logging per webhook request, before and after the structured pipeline.
+
+"before" replays the log calls a webhook request used to make: the whole body
+and the parsed event formatted eagerly with f-strings, written synchronously by
+a basicConfig style StreamHandler. "after" makes the current calls: lazy
+%-formatting, the payload only logged for the sampled fraction of requests
+(redacted and truncated), and JSON encoding and I/O on the QueueListener thread.
+Both write to a real file, optionally slowed down by --sink-latency-ms per
+write to stand in for a blocked pipe or a busy log collector. The time reported
+is what the request thread pays; the time the listener then needs to drain the
+queue is reported separately. From the project directory:
+
+    python -m benchmarks.bench_logging --iterations 5000 --output logging.json
+    python -m benchmarks.bench_logging --iterations 500 --sink-latency-ms 1
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from .bench_core import measure, setup_django
+from .load_test import git_commit
+
+
+def webhook_body() -> dict:
+    return {
+        "event": "charge.success",
+        "data": {
+            "id": 302961,
+            "reference": "4f1c7f0e-9a0c-4b8e-8a52-3f3c6c9d2a11",
+            "status": "success",
+            "amount": 150000,
+            "currency": "NGN",
+            "paid_at": "2026-10-19T10:00:00.000Z",
+            "channel": "bank",
+            "customer": {
+                "customer_code": "CUS_xnxdt6s1zg1f4nx",
+                "email": "customer@example.com",
+                "phone": None,
+            },
+            "authorization": {
+                "authorization_code": "AUTH_8dfhjjdt",
+                "bank": "Test Bank",
+                "account_name": "Customer Name",
+            },
+            "log": {"history": [{"type": "action", "time": t} for t in range(20)]},
+        },
+    }
+
+
+def before_calls(logger, body):
+    """The log calls of a webhook request before the structured pipeline."""
+    data = body["data"]
+    logger.info(f"Received webhook data: {body}")
+    logger.info(
+        f"Handling webhook: tx_ref={data['reference']}, status={data['status']}, "
+        f"gateway_ref={data['customer']['customer_code']}, amount={data['amount']}"
+    )
+    logger.info(f"Transaction found: {data['reference']}")
+    logger.info(f"Payment transaction updated: {data['reference']}")
+    logger.info(
+        f"Successfully updated model from webhook for transaction: {data['reference']}"
+    )
+    logger.info("Webhook processed successfully.")
+
+
+def after_calls(logger, body):
+    """The same request's log calls with lazy formatting and payload sampling."""
+    from Apis.structured_logging import log_payload
+
+    data = body["data"]
+    logger.info("Received webhook event %s", body.get("event"))
+    log_payload(logger, "webhook", "Webhook payload: %s", body)
+    logger.info(
+        "Handling webhook: tx_ref=%s, status=%s, gateway_ref=%s, amount=%s",
+        data["reference"],
+        data["status"],
+        data["customer"]["customer_code"],
+        data["amount"],
+    )
+    logger.info("Transaction found: %s", data["reference"])
+    logger.info("Payment transaction updated: %s", data["reference"])
+    logger.info(
+        "Successfully updated model from webhook for transaction: %s",
+        data["reference"],
+    )
+    logger.info("Webhook processed successfully.")
+
+
+class SlowStream:
+    """File stream whose writes take at least `latency` seconds."""
+
+    def __init__(self, path: str, latency: float):
+        self.file = open(path, "a", encoding="utf-8")
+        self.latency = latency
+
+    def write(self, text: str):
+        if self.latency:
+            time.sleep(self.latency)
+        return self.file.write(text)
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def run(name, handler, calls, args, body) -> dict:
+    from Apis.structured_logging import stop_listener
+
+    logger = logging.getLogger(f"benchmarks.bench_logging.{name}")
+    logger.handlers = [handler]
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    result = measure(lambda: calls(logger, body), args.iterations, args.repeats)
+
+    listener = getattr(handler, "listener", None)
+    if listener is not None:
+        started = time.perf_counter()
+        stop_listener(listener)
+        result["drain_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    handler.close()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=5000)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--sink-latency-ms", type=float, default=0.0)
+    parser.add_argument("--output", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+    from Apis.structured_logging import queue_handler
+
+    body = webhook_body()
+    directory = tempfile.mkdtemp(prefix="payments-logging-")
+    latency = args.sink_latency_ms / 1000
+    before_handler = logging.StreamHandler(
+        SlowStream(os.path.join(directory, "before.log"), latency)
+    )
+    before_handler.setFormatter(
+        logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    )
+    # The queue must hold a whole repeat, or records would be dropped and the
+    # cost of writing them never paid
+    after_handler = queue_handler(
+        SlowStream(os.path.join(directory, "after.log"), latency),
+        queue_size=args.iterations * args.repeats * 8,
+    )
+
+    results = {
+        "before": run("before", before_handler, before_calls, args, body),
+        "after": run("after", after_handler, after_calls, args, body),
+    }
+    for name, result in results.items():
+        drain = f", drain {result['drain_ms']} ms" if "drain_ms" in result else ""
+        print(f"{name:<8} best {result['best_ns'] / 1000:>8.2f} us/request{drain}")
+
+    if args.output:
+        report = {
+            "commit": git_commit(),
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "sink_latency_ms": args.sink_latency_ms,
+            "payload_sample_rates": settings.LOG_PAYLOAD_SAMPLE_RATES,
+            "results": results,
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Per-request cost of the middleware stack for server-to-server API calls.
+
+"full" is the stack every request ran before: sessions, CSRF, authentication,
+messages and clickjacking protection for /api/ too. "lean" is the current
+MIDDLEWARE, in which /api/ requests skip WEB_ONLY_MIDDLEWARE. Requests go
+through Django's handler to a view that returns an empty response, so the time
+is the middleware and URL resolution only; "no_middleware" is the floor of
+building the request and resolving the URL. From the project directory:
+
+    python -m benchmarks.bench_middleware --iterations 20000 --output middleware.json
+"""
+
+import argparse
+import json
+import platform
+from datetime import datetime, timezone
+
+from django.http import HttpResponse
+from django.urls import path
+from django.views.decorators.csrf import csrf_exempt
+
+from .bench_core import measure, setup_django
+from .load_test import git_commit
+
+FULL_STACK = [
+    "Apis.middleware.RequestMetricsMiddleware",
+    "Apis.middleware.TracingMiddleware",
+    "Apis.middleware.ProfilingMiddleware",
+    "django.middleware.security.SecurityMiddleware",
+    "django.contrib.sessions.middleware.SessionMiddleware",
+    "django.middleware.common.CommonMiddleware",
+    "django.middleware.csrf.CsrfViewMiddleware",
+    "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "django.contrib.messages.middleware.MessageMiddleware",
+    "django.middleware.clickjacking.XFrameOptionsMiddleware",
+]
+
+
+# Exempt like every DRF APIView
+@csrf_exempt
+def empty_view(request):
+    return HttpResponse(b"")
+
+
+# Used as ROOT_URLCONF while benchmarking
+urlpatterns = [
+    path("api/v1/empty/", empty_view),
+    path("admin/empty/", empty_view),
+]
+
+
+def stack_handler(middleware: list):
+    """A request handler running `middleware` in front of this module's URLs."""
+    from django.core.handlers.base import BaseHandler
+    from django.test import override_settings
+
+    with override_settings(MIDDLEWARE=middleware, ROOT_URLCONF=__name__):
+        handler = BaseHandler()
+        handler.load_middleware()
+    return handler
+
+
+def run(handler, url: str, args) -> dict:
+    from django.test import RequestFactory, override_settings
+
+    request_factory = RequestFactory()
+
+    def call():
+        response = handler.get_response(
+            request_factory.post(url, HTTP_HOST="localhost")
+        )
+        assert response.status_code == 200, response.status_code
+
+    with override_settings(ROOT_URLCONF=__name__):
+        return measure(call, args.iterations, args.repeats)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--output", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+
+    full, lean = stack_handler(FULL_STACK), stack_handler(settings.MIDDLEWARE)
+    results = {
+        "no_middleware": run(stack_handler([]), "/api/v1/empty/", args),
+        "full_api": run(full, "/api/v1/empty/", args),
+        "lean_api": run(lean, "/api/v1/empty/", args),
+        "lean_admin": run(lean, "/admin/empty/", args),
+    }
+    for name, result in results.items():
+        print(f"{name:<14} best {result['best_ns'] / 1000:>8.2f} us/request")
+
+    if args.output:
+        report = {
+            "commit": git_commit(),
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "middleware": settings.MIDDLEWARE,
+            "web_only_middleware": settings.WEB_ONLY_MIDDLEWARE,
+            "results": results,
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Cost and accuracy of the token buckets behind the payment endpoint's 429s.
+
+- Cost: one check against an in-process TokenBucket, the shared-memory buckets
+  (one hot key, and keys spread over the table) and the cache buckets on the
+  default local-memory cache.
+- Accuracy: several processes take tokens from one shared-memory bucket that
+  barely refills. They should be admitted BURST times in total, not BURST
+  times each.
+
+From the project directory:
+
+    python -m benchmarks.bench_rate_limiting --iterations 50000 --output rl.json
+"""
+
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import tempfile
+from datetime import datetime, timezone
+
+from .bench_core import measure, setup_django
+from .load_test import git_commit
+
+
+def take_all(path: str, attempts: int, burst: int) -> int:
+    from Apis.rate_limiting import SharedTokenBuckets
+
+    buckets = SharedTokenBuckets(path, 1024)
+    return sum(
+        buckets.try_acquire("client:shared", 0.001, burst) == 0.0
+        for _ in range(attempts)
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=50000)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--processes", type=int, default=8)
+    parser.add_argument("--burst", type=int, default=1000)
+    parser.add_argument("--output", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    setup_django()
+    from Apis.rate_limiting import CacheTokenBuckets, SharedTokenBuckets, TokenBucket
+
+    workdir = tempfile.mkdtemp(prefix="payments-rate-limits-")
+    shared = SharedTokenBuckets(os.path.join(workdir, "buckets"), 65536)
+    cached = CacheTokenBuckets("default")
+    bucket = TokenBucket(1e9, 1e9)
+    keys = itertools.cycle([f"client:{index}@example.com" for index in range(10000)])
+
+    results = {}
+    for name, check in {
+        "in_process": lambda: bucket.try_acquire(),
+        "shared_memory_hot_key": lambda: shared.try_acquire("client:hot", 1e9, 1e9),
+        "shared_memory_many_keys": lambda: shared.try_acquire(next(keys), 1e9, 1e9),
+        "cache_locmem": lambda: cached.try_acquire("client:hot", 1e9, 1e9),
+    }.items():
+        results[name] = measure(check, args.iterations, args.repeats)
+        print(f"{name:<24} {results[name]['best_ns'] / 1000:>8.2f} us/check")
+
+    path = os.path.join(workdir, "contended")
+    attempts = args.burst
+    with multiprocessing.get_context("fork").Pool(args.processes) as pool:
+        admitted = pool.starmap(
+            take_all, [(path, attempts, args.burst)] * args.processes
+        )
+    results["processes_sharing_one_bucket"] = {
+        "processes": args.processes,
+        "attempts": attempts * args.processes,
+        "burst": args.burst,
+        "admitted": sum(admitted),
+    }
+    print(
+        f"{args.processes} processes, {attempts * args.processes} attempts on one "
+        f"bucket of {args.burst}: {sum(admitted)} admitted"
+    )
+
+    if args.output:
+        report = {
+            "commit": git_commit(),
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "results": results,
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
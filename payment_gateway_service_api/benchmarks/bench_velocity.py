@@ -0,0 +1,115 @@
+"""
+Cost of the velocity rules checked before a payment reaches a gateway.
+
+- queries: what the rules would cost as queries on PaymentTransaction, a COUNT
+  of the client's payments over the last minute and a SUM of their amounts over
+  the last hour, against a SQLite database filled by generate_synthetic_data.
+  Distinct clients per bank token cannot be queried, as tokens are not stored.
+- pre_check: VelocityPreCheckAdapter evaluating all three rules in process,
+  for the same clients and a bank token each, with limits high enough that
+  every payment is admitted.
+
+From the project directory:
+
+    python -m benchmarks.bench_velocity --clients 5000 --output velocity.json
+"""
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+from .bench_core import measure, setup_django
+from .load_test import git_commit
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--clients", type=int, default=5000)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--output", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="payments-velocity-")
+    os.environ["SQLITE_PATH"] = os.path.join(workdir, "velocity.sqlite3")
+    setup_django()
+    from django.core.management import call_command
+    from django.db.models import Sum
+    from Apis.pre_checks_ports_and_adapters import (
+        PaymentAttemptDTO,
+        VelocityPreCheckAdapter,
+    )
+    from Orders.models import PaymentTransaction
+
+    call_command("migrate", verbosity=0)
+    call_command(
+        "generate_synthetic_data",
+        clients=args.clients,
+        products=200,
+        days=1,
+        verbosity=0,
+    )
+    client_ids = list(
+        PaymentTransaction.objects.values_list("client_id", flat=True).distinct()
+    )
+    rng = random.Random(1)
+    clients = itertools.cycle(rng.sample(client_ids, len(client_ids)))
+
+    def queries():
+        client_id = next(clients)
+        now = datetime.now(timezone.utc)
+        PaymentTransaction.objects.filter(
+            client_id=client_id, created_at__gte=now - timedelta(minutes=1)
+        ).count()
+        PaymentTransaction.objects.filter(
+            client_id=client_id, created_at__gte=now - timedelta(hours=1)
+        ).aggregate(Sum("amount"))
+
+    unlimited = 10**12
+    pre_check = VelocityPreCheckAdapter(
+        {
+            "payments_per_client": {"LIMIT": unlimited, "WINDOW_SECONDS": 60},
+            "amount_per_client": {"LIMIT": unlimited, "WINDOW_SECONDS": 3600},
+            "clients_per_bank_token": {"LIMIT": unlimited, "WINDOW_SECONDS": 86400},
+        }
+    )
+
+    def evaluate():
+        client_id = next(clients)
+        pre_check.evaluate(
+            PaymentAttemptDTO(
+                client_id=client_id,
+                amount=1500.0,
+                currency="NGN",
+                gateway_name="PayStack",
+                bank_token=f"tok_{client_id % 1000}",
+            )
+        )
+
+    results = {
+        "transactions": PaymentTransaction.objects.count(),
+        "queries": measure(queries, args.iterations, args.repeats),
+        "pre_check": measure(evaluate, args.iterations * 10, args.repeats),
+    }
+    print(f"{results['transactions']} transactions")
+    for name in ("queries", "pre_check"):
+        print(f"{name:<10} {results[name]['best_ns'] / 1000:>10.2f} us/payment")
+
+    if args.output:
+        report = {
+            "commit": git_commit(),
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "results": results,
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Throughput of /api/v1/webhook/ under a flood of junk requests.
+
+Every request is a well-formed PayStack charge.success event for a reference
+that does not exist, as a flood of forged webhooks would be:
+
+- unsigned: no signature header, rejected before parsing.
+- forged_signature: an x-paystack-signature that does not match, rejected after
+  computing the HMAC of the body, still before parsing.
+- no_verification: the same requests with the signature check bypassed, as the
+  view handled them before: parsed, then looked up in the database.
+
+Requests go through Django's handler and the full middleware stack against a
+migrated SQLite database, from one thread, with DEBUG off as in production.
+Logging is disabled so the flood does not drown the output. From the project directory:
+
+    python -m benchmarks.bench_webhook_flood --iterations 2000 --output flood.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import secrets
+import tempfile
+import uuid
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+from .bench_core import measure, setup_django
+from .load_test import git_commit
+
+
+def junk_body() -> bytes:
+    return json.dumps(
+        {
+            "event": "charge.success",
+            "data": {
+                "reference": str(uuid.uuid4()),
+                "status": "success",
+                "amount": 150000,
+                "currency": "NGN",
+                "customer": {"customer_code": f"CUS_{secrets.token_hex(8)}"},
+                "log": {"history": [{"type": "action", "time": t} for t in range(40)]},
+            },
+        }
+    ).encode()
+
+
+def run(name: str, headers: dict, args) -> dict:
+    from django.core.handlers.base import BaseHandler
+    from django.db import connection
+    from django.test import RequestFactory
+    from django.test.utils import CaptureQueriesContext
+
+    handler = BaseHandler()
+    handler.load_middleware()
+    request_factory = RequestFactory()
+    bodies = [junk_body() for _ in range(64)]
+    statuses = {}
+    counter = iter(range(10**12))
+
+    def call():
+        request = request_factory.post(
+            "/api/v1/webhook/",
+            bodies[next(counter) % len(bodies)],
+            content_type="application/json",
+            headers=headers,
+            HTTP_HOST="localhost",
+        )
+        status_code = handler.get_response(request).status_code
+        statuses[status_code] = statuses.get(status_code, 0) + 1
+
+    with CaptureQueriesContext(connection) as queries:
+        call()
+    result = measure(call, args.iterations, args.repeats)
+    result["requests_per_second"] = round(1e9 / result["best_ns"], 1)
+    result["db_queries_per_request"] = len(queries.captured_queries)
+    result["statuses"] = {str(code): count for code, count in statuses.items()}
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--output", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="payments-flood-")
+    os.environ["SQLITE_PATH"] = os.path.join(workdir, "flood.sqlite3")
+    os.environ.setdefault("PAYSTACK_SECRET_KEY", "sk_test_flood")
+    os.environ["DEBUG"] = "False"
+    setup_django()
+    from django.core.management import call_command
+
+    call_command("migrate", verbosity=0)
+    logging.disable(logging.CRITICAL)
+
+    results = {
+        "unsigned": run("unsigned", {}, args),
+        "forged_signature": run(
+            "forged_signature", {"x-paystack-signature": secrets.token_hex(64)}, args
+        ),
+    }
+    with patch("Apis.webhook_signatures.verify_signature", return_value="PayStack"):
+        results["no_verification"] = run("no_verification", {}, args)
+    for name, result in results.items():
+        print(
+            f"{name:<18} {result['requests_per_second']:>10.1f} req/s  "
+            f"{result['db_queries_per_request']} queries/request  "
+            f"statuses={result['statuses']}"
+        )
+
+    if args.output:
+        report = {
+            "commit": git_commit(),
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "results": results,
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
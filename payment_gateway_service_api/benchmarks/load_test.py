@@ -0,0 +1,382 @@
+"""
+End-to-end load test of /api/v1/createpayment/ and /api/v1/webhook/.
+
+Starts stub PayStack and FlutterWave servers, a throwaway SQLite database with
+seeded clients and orders, and the app itself (runserver or gunicorn) pointed
+at the stubs. Each endpoint is then driven at fixed concurrency levels and the
+throughput, latency percentiles and database queries per request are written
+to a JSON file, so runs can be compared across commits. From the project
+directory:
+
+    python -m benchmarks.load_test --concurrency 1 4 16 --duration 10
+"""
+
+import argparse
+import json
+import os
+import platform
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+import requests
+
+from .stub_gateways import StubGatewayServer
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+RESULTS_DIR = PROJECT_DIR / "benchmarks" / "results"
+CREATE_PAYMENT_PATH = "/api/v1/createpayment/"
+WEBHOOK_PATH = "/api/v1/webhook/"
+# The app only accepts Host headers listed in ALLOWED_HOSTS
+HEADERS = {"Host": "localhost"}
+METRIC_LINE_RE = re.compile(r'^(\w+)\{view="([^"]*)"\} (\S+)$')
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def percentile(ordered, fraction: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=PROJECT_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def prepare_database(environment: dict, clients: int) -> dict:
+    """
+    Migrates the benchmark database and seeds clients, each with one order.
+    Returns the Authorization header of a merchant API key for createpayment.
+    """
+    os.environ.update(environment)
+    os.environ.setdefault(
+        "DJANGO_SETTINGS_MODULE", "payment_gateway_service_api.settings"
+    )
+    import django
+
+    django.setup()
+    from django.contrib.auth import get_user_model
+    from django.core.management import call_command
+    from clients.utils import Address
+    from Apis.models import API_KEY_SCOPES, MerchantAPIKey
+    from Orders.models import Orders
+
+    call_command("migrate", verbosity=0)
+    address = Address.objects.create(city="Lagos", country="NG")
+    for index in range(clients):
+        client = get_user_model().objects.create_user(
+            email=f"bench-{index}@example.com",
+            password="benchmark",
+            first_name="Bench",
+            last_name=str(index),
+            house_address=address,
+        )
+        Orders.objects.create(
+            client=client,
+            total_amount=1500,
+            shipping_address=address,
+            billing_address=address,
+        )
+    _, raw_key = MerchantAPIKey.issue(client, "benchmark", API_KEY_SCOPES)
+    return {"Authorization": f"Api-Key {raw_key}"}
+
+
+def webhook_payloads(limit=None):
+    """
+    Builds a successful webhook for every transaction created so far, or for the
+    latest `limit` ones, as (body, headers) pairs signed like the gateway would.
+    """
+    from Apis.webhook_signatures import signature_headers
+    from Orders.models import PaymentTransaction
+
+    payloads = []
+    now = datetime.now(timezone.utc).isoformat()
+    transactions = PaymentTransaction.objects.values_list(
+        "transaction_ref", "gateway_name", "amount"
+    )
+    if limit is not None:
+        transactions = transactions.order_by("-id")[:limit]
+    for ref, gateway_name, amount in transactions:
+        if gateway_name == "FlutterWave":
+            data = {
+                "tx_ref": ref,
+                "flw_ref": f"FLW-{ref[:8]}",
+                "status": "successful",
+                "amount": float(amount),
+                "created_at": now,
+            }
+            payload = {"event": "charge.completed", "data": data}
+        else:
+            data = {
+                "reference": ref,
+                "status": "success",
+                "amount": int(amount * 100),
+                "customer": {"customer_code": f"CUS_{ref[:8]}"},
+                "paid_at": now,
+            }
+            payload = {"event": "charge.success", "data": data}
+        body = json.dumps(payload).encode()
+        headers = {"Content-Type": "application/json"}
+        headers.update(signature_headers(gateway_name, body))
+        payloads.append((body, headers))
+    return payloads
+
+
+def start_server(args, port: int, environment: dict) -> subprocess.Popen:
+    if args.server == "gunicorn":
+        command = [
+            "gunicorn",
+            "payment_gateway_service_api.wsgi",
+            "--bind",
+            f"127.0.0.1:{port}",
+            "--workers",
+            str(args.workers),
+            "--threads",
+            str(args.threads),
+        ]
+    else:
+        command = [
+            sys.executable,
+            "manage.py",
+            "runserver",
+            f"127.0.0.1:{port}",
+            "--noreload",
+        ]
+    return subprocess.Popen(
+        command,
+        cwd=PROJECT_DIR,
+        env={**os.environ, **environment},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+def wait_until_ready(base_url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(f"{base_url}/metrics", headers=HEADERS, timeout=1).ok:
+                return
+        except requests.exceptions.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"App did not start on {base_url} within {timeout}s")
+
+
+def scrape_db_queries(base_url: str) -> dict:
+    """Returns {view: (sum, count)} of the http_request_db_queries histogram."""
+    text = requests.get(f"{base_url}/metrics", headers=HEADERS, timeout=10).text
+    totals = {}
+    for line in text.splitlines():
+        match = METRIC_LINE_RE.match(line)
+        if not match or not match.group(1).startswith("http_request_db_queries_"):
+            continue
+        name, view, value = match.groups()
+        current = totals.setdefault(view, [0.0, 0.0])
+        current[0 if name.endswith("_sum") else 1] = float(value)
+    return totals
+
+
+def run_level(base_url, path, payloads, concurrency, duration, headers=None):
+    """
+    Posts payloads round robin from `concurrency` threads for `duration` seconds.
+    Payloads are dicts sent as JSON, or (body, headers) pairs sent as they are.
+    """
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+    counter = iter(range(10**12))
+    stop_at = time.monotonic() + duration
+
+    def worker():
+        session = requests.Session()
+        session.headers.update(HEADERS)
+        session.headers.update(headers or {})
+        while time.monotonic() < stop_at:
+            with lock:
+                payload = payloads[next(counter) % len(payloads)]
+            started = time.perf_counter()
+            try:
+                if isinstance(payload, tuple):
+                    body, payload_headers = payload
+                    response = session.post(
+                        f"{base_url}{path}",
+                        data=body,
+                        headers=payload_headers,
+                        timeout=60,
+                    )
+                else:
+                    response = session.post(
+                        f"{base_url}{path}", json=payload, timeout=60
+                    )
+                status_code = response.status_code
+            except requests.exceptions.RequestException:
+                status_code = "connection_error"
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                statuses[str(status_code)] = statuses.get(str(status_code), 0) + 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for _ in range(concurrency):
+            executor.submit(worker)
+    wall_time = time.perf_counter() - started
+
+    ordered = sorted(latencies)
+    errors = sum(
+        count for status, count in statuses.items() if not status.startswith("2")
+    )
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "statuses": statuses,
+        "rps": round(len(latencies) / wall_time, 2),
+        "p50_ms": round(percentile(ordered, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(ordered, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(ordered, 0.99) * 1000, 2),
+        "max_ms": round(ordered[-1] * 1000, 2) if ordered else 0.0,
+    }
+
+
+def measure(base_url, view, path, payloads, concurrency, args, headers=None):
+    before = scrape_db_queries(base_url).get(view, [0.0, 0.0])
+    result = run_level(base_url, path, payloads, concurrency, args.duration, headers)
+    if args.server == "gunicorn" and args.workers > 1:
+        # Wait for every worker to flush its metrics, see Apis.metrics
+        time.sleep(args.metrics_flush_wait)
+    after = scrape_db_queries(base_url).get(view, [0.0, 0.0])
+    handled = after[1] - before[1]
+    result["endpoint"] = path
+    result["db_queries_per_request"] = (
+        round((after[0] - before[0]) / handled, 2) if handled else None
+    )
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument(
+        "--server", choices=("runserver", "gunicorn"), default="runserver"
+    )
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--metrics-flush-wait", type=float, default=6.0)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--output", help="Result file; defaults to benchmarks/results/")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="payments-bench-")
+    stubs = [
+        StubGatewayServer(
+            gateway, 0, args.latency_ms, args.jitter_ms, args.error_rate, seed=index
+        )
+        for index, gateway in enumerate(("paystack", "flutterwave"))
+    ]
+    environment = {
+        "SECRET_KEY": os.getenv("SECRET_KEY") or "benchmark-secret-key",
+        "SQLITE_PATH": os.path.join(workdir, "bench.sqlite3"),
+        # The benchmark drives every request with one API key and pays for
+        # the same clients many times a minute
+        "RATE_LIMIT_ENABLED": "0",
+        "VELOCITY_CHECKS_ENABLED": "0",
+        "METRICS_MULTIPROC_DIR": os.path.join(workdir, "metrics"),
+    }
+    for stub in stubs:
+        stub.start_in_background()
+        environment.update(stub.settings_environment())
+
+    api_key_headers = prepare_database(environment, args.clients)
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    server = start_server(args, port, environment)
+    try:
+        wait_until_ready(base_url)
+        started_at = datetime.now(timezone.utc)
+        results = []
+        create_payloads = [
+            {"email": f"bench-{index}@example.com", "currency": "NGN"}
+            for index in range(args.clients)
+        ]
+        for concurrency in args.concurrency:
+            result = measure(
+                base_url,
+                "create-payment",
+                CREATE_PAYMENT_PATH,
+                create_payloads,
+                concurrency,
+                args,
+                api_key_headers,
+            )
+            results.append(result)
+            print(json.dumps(result))
+
+        payloads = webhook_payloads()
+        for concurrency in args.concurrency if payloads else []:
+            result = measure(
+                base_url, "webhook", WEBHOOK_PATH, payloads, concurrency, args
+            )
+            results.append(result)
+            print(json.dumps(result))
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+        for stub in stubs:
+            stub.shutdown()
+
+    report = {
+        "commit": git_commit(),
+        "started_at": started_at.isoformat(),
+        "python": platform.python_version(),
+        "server": {
+            "kind": args.server,
+            "workers": args.workers if args.server == "gunicorn" else 1,
+            "threads": args.threads if args.server == "gunicorn" else None,
+        },
+        "stubs": {
+            "latency_ms": args.latency_ms,
+            "jitter_ms": args.jitter_ms,
+            "error_rate": args.error_rate,
+        },
+        "duration_per_level": args.duration,
+        "results": results,
+    }
+    output = (
+        Path(args.output)
+        if args.output
+        else (RESULTS_DIR / f"{started_at:%Y%m%dT%H%M%S}-{report['commit']}.json")
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
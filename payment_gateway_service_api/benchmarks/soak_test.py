@@ -0,0 +1,267 @@
+"""
+Soak test looking for memory growth and leaked files or database connections.
+
+Runs the load test setup (stub gateways, throwaway database, the app) for hours,
+alternating /api/v1/createpayment/ and /api/v1/webhook/ traffic. The app runs
+with tracemalloc enabled, and after every interval the runner samples its traced
+memory, RSS, open files and database connections from /ops/memory/. Growth is
+measured from a baseline taken once the warmup is over, so caches filling up
+early do not count. The run fails, with exit status 1, when any growth exceeds
+its threshold, and the report lists the allocation sites that grew the most.
+From the project directory:
+
+    python -m benchmarks.soak_test --hours 4 --interval 300 --concurrency 8
+"""
+
+import argparse
+import json
+import os
+import platform
+import secrets
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import requests
+
+from .load_test import (
+    CREATE_PAYMENT_PATH,
+    HEADERS,
+    RESULTS_DIR,
+    WEBHOOK_PATH,
+    free_port,
+    git_commit,
+    prepare_database,
+    run_level,
+    start_server,
+    wait_until_ready,
+    webhook_payloads,
+)
+from .stub_gateways import StubGatewayServer
+
+MEMORY_PATH = "/ops/memory/"
+ADMIN_EMAIL = "soak-admin@example.com"
+# Webhooks are replayed for the most recent transactions only
+WEBHOOK_PAYLOADS = 5000
+MB = 1024 * 1024
+
+
+def create_admin(password: str):
+    from django.contrib.auth import get_user_model
+    from clients.utils import Address
+
+    get_user_model().objects.create_superuser(
+        email=ADMIN_EMAIL,
+        password=password,
+        house_address=Address.objects.create(city="Lagos", country="NG"),
+    )
+
+
+def sample(base_url: str, auth, top: int) -> dict:
+    response = requests.get(
+        f"{base_url}{MEMORY_PATH}",
+        params={"limit": top},
+        headers=HEADERS,
+        auth=auth,
+        timeout=120,
+    )
+    response.raise_for_status()
+    return response.json()
+
+
+def growth(baseline: dict, current: dict) -> dict:
+    def diff(key, unit=1):
+        if baseline.get(key) is None or current.get(key) is None:
+            return None
+        return round((current[key] - baseline[key]) / unit, 2)
+
+    return {
+        "traced_mb": diff("traced_current_bytes", MB),
+        "rss_mb": diff("rss_bytes", MB),
+        "open_files": diff("open_files"),
+        "db_connections": diff("db_connections"),
+        "threads": diff("threads"),
+    }
+
+
+def check(result_growth: dict, args) -> list:
+    limits = {
+        "traced_mb": args.max_traced_growth_mb,
+        "rss_mb": args.max_rss_growth_mb,
+        "open_files": args.max_open_files_growth,
+        "db_connections": args.max_db_connections_growth,
+    }
+    return [
+        f"{name} grew by {result_growth[name]}, above the limit of {limit}"
+        for name, limit in limits.items()
+        if result_growth[name] is not None and result_growth[name] > limit
+    ]
+
+
+def summary(record: dict) -> dict:
+    """A sample without its allocation sites, for the time series."""
+    return {key: value for key, value in record.items() if key != "top_allocations"}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--hours", type=float, default=4.0)
+    parser.add_argument(
+        "--interval", type=float, default=300.0, help="Seconds between samples"
+    )
+    parser.add_argument("--warmup", type=float, default=600.0)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument(
+        "--server", choices=("runserver", "gunicorn"), default="runserver"
+    )
+    # /ops/memory/ reports the worker that serves it, so soak a single worker
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    parser.add_argument("--error-rate", type=float, default=0.01)
+    parser.add_argument("--max-traced-growth-mb", type=float, default=20.0)
+    parser.add_argument("--max-rss-growth-mb", type=float, default=100.0)
+    parser.add_argument("--max-open-files-growth", type=int, default=20)
+    parser.add_argument("--max-db-connections-growth", type=int, default=4)
+    parser.add_argument("--top", type=int, default=25, help="Allocation sites shown")
+    parser.add_argument("--output", help="Result file; defaults to benchmarks/results/")
+    args = parser.parse_args()
+    if args.server == "gunicorn" and args.workers > 1:
+        parser.error("--workers must be 1: samples would come from random workers")
+
+    workdir = tempfile.mkdtemp(prefix="payments-soak-")
+    stubs = [
+        StubGatewayServer(
+            gateway, 0, args.latency_ms, args.jitter_ms, args.error_rate, seed=index
+        )
+        for index, gateway in enumerate(("paystack", "flutterwave"))
+    ]
+    environment = {
+        "SECRET_KEY": os.getenv("SECRET_KEY") or "benchmark-secret-key",
+        "SQLITE_PATH": os.path.join(workdir, "soak.sqlite3"),
+        # The benchmark drives every request with one API key and pays for
+        # the same clients many times a minute
+        "RATE_LIMIT_ENABLED": "0",
+        "VELOCITY_CHECKS_ENABLED": "0",
+        "TRACEMALLOC_ENABLED": "1",
+    }
+    for stub in stubs:
+        stub.start_in_background()
+        environment.update(stub.settings_environment())
+
+    api_key_headers = prepare_database(environment, args.clients)
+    password = secrets.token_urlsafe(16)
+    create_admin(password)
+    auth = (ADMIN_EMAIL, password)
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    server = start_server(args, port, environment)
+
+    create_payloads = [
+        {"email": f"bench-{index}@example.com", "currency": "NGN"}
+        for index in range(args.clients)
+    ]
+    started_at = datetime.now(timezone.utc)
+    started = time.monotonic()
+    samples, traffic = [], []
+    baseline = latest = None
+    try:
+        wait_until_ready(base_url)
+        while time.monotonic() - started < args.warmup + args.hours * 3600:
+            phase = args.interval / 2
+            traffic.append(
+                run_level(
+                    base_url,
+                    CREATE_PAYMENT_PATH,
+                    create_payloads,
+                    args.concurrency,
+                    phase,
+                    api_key_headers,
+                )
+            )
+            payloads = webhook_payloads(limit=WEBHOOK_PAYLOADS)
+            if payloads:
+                traffic.append(
+                    run_level(base_url, WEBHOOK_PATH, payloads, args.concurrency, phase)
+                )
+
+            elapsed = time.monotonic() - started
+            if baseline is None and elapsed >= args.warmup:
+                # Sampling allocates a lot itself; let the RSS absorb that first
+                sample(base_url, auth, args.top)
+                requests.post(
+                    f"{base_url}{MEMORY_PATH}", headers=HEADERS, auth=auth, timeout=120
+                ).raise_for_status()
+                baseline = latest = sample(base_url, auth, args.top)
+            elif baseline is not None:
+                latest = sample(base_url, auth, args.top)
+            else:
+                continue
+            record = {"elapsed_s": round(elapsed, 1), **summary(latest)}
+            record["growth"] = growth(baseline, latest)
+            samples.append(record)
+            print(json.dumps(record))
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+        for stub in stubs:
+            stub.shutdown()
+
+    if baseline is None:
+        sys.exit("The run ended before the warmup; nothing was measured")
+    final_growth = growth(baseline, latest)
+    failures = check(final_growth, args)
+    report = {
+        "commit": git_commit(),
+        "started_at": started_at.isoformat(),
+        "python": platform.python_version(),
+        "server": {
+            "kind": args.server,
+            "threads": args.threads if args.server == "gunicorn" else None,
+        },
+        "stubs": {
+            "latency_ms": args.latency_ms,
+            "jitter_ms": args.jitter_ms,
+            "error_rate": args.error_rate,
+        },
+        "hours": args.hours,
+        "warmup_s": args.warmup,
+        "concurrency": args.concurrency,
+        "requests": sum(level["requests"] for level in traffic),
+        "errors": sum(level["errors"] for level in traffic),
+        "growth": final_growth,
+        "thresholds": {
+            "traced_mb": args.max_traced_growth_mb,
+            "rss_mb": args.max_rss_growth_mb,
+            "open_files": args.max_open_files_growth,
+            "db_connections": args.max_db_connections_growth,
+        },
+        "failures": failures,
+        "samples": samples,
+        "top_allocations": latest["top_allocations"],
+    }
+    output = (
+        Path(args.output)
+        if args.output
+        else (RESULTS_DIR / f"soak-{started_at:%Y%m%dT%H%M%S}-{report['commit']}.json")
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+
+    print(f"\nTop allocation sites since the baseline ({output}):")
+    for site in latest["top_allocations"][:10]:
+        print(
+            f"+{site['size_diff_bytes'] / 1024:.1f} KiB "
+            f"(+{site['count_diff']} blocks) " + site["traceback"][-1]
+        )
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""
+Local stand-ins for the PayStack and FlutterWave HTTP APIs used by the load test.
+
+Each stub answers the endpoints our adapters call with responses shaped like the
+real gateway's, after a configurable latency, and fails a configurable fraction
+of calls with HTTP 500. Run one on its own with:
+
+    python -m benchmarks.stub_gateways paystack --port 8091 --latency-ms 80
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+STUB_PAYSTACK_SECRET_KEY = "sk_test_stub_gateway"
+STUB_FLUTTERWAVE_SECRET_HASH = "stub-gateway-secret-hash"
+
+
+class StubGatewayHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status_code: int, body: dict):
+        payload = json.dumps(body).encode()
+        self.send_response(status_code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return {}
+        try:
+            return json.loads(self.rfile.read(length))
+        except ValueError:
+            return {}
+
+    def _handle(self, method: str):
+        body = self._read_json() if method == "POST" else {}
+        self.server.simulate_latency()
+        if self.server.should_fail():
+            self._send_json(500, {"status": "error", "message": "Injected failure"})
+            return
+        url = urlparse(self.path)
+        route = getattr(self, f"{self.server.gateway}_{method.lower()}")
+        status_code, response = route(url, body)
+        self._send_json(status_code, response)
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def paystack_post(self, url, body):
+        if url.path != "/charge":
+            return 404, {"status": False, "message": "Not found"}
+        return 200, {
+            "status": True,
+            "message": "Charge attempted",
+            "data": {"reference": body.get("reference"), "status": "pending"},
+        }
+
+    def paystack_get(self, url, body):
+        prefix = "/transaction/verify/"
+        if not url.path.startswith(prefix):
+            return 404, {"status": False, "message": "Not found"}
+        return 200, {
+            "status": True,
+            "message": "Verification successful",
+            "data": {
+                "id": random.randint(1, 10**9),
+                "reference": url.path[len(prefix) :],
+                "status": "success",
+                "amount": 150000,
+            },
+        }
+
+    def flutterwave_post(self, url, body):
+        if url.path != "/v3/charges":
+            return 404, {"status": "error", "message": "Not found"}
+        return 200, {
+            "status": "success",
+            "message": "Charge initiated",
+            "meta": {
+                "Authorization": {
+                    "transfer_reference": f"FLW-{uuid.uuid4().hex[:12]}",
+                    "mode": "banktransfer",
+                }
+            },
+        }
+
+    def flutterwave_get(self, url, body):
+        if url.path != "/v3/charges":
+            return 404, {"status": "error", "message": "Not found"}
+        tx_ref = parse_qs(url.query).get("tx_ref", [""])[0]
+        return 200, {
+            "status": "success",
+            "data": [
+                {
+                    "tx_ref": tx_ref,
+                    "flw_ref": f"FLW-{uuid.uuid4().hex[:12]}",
+                    "status": "successful",
+                    "amount": 1500,
+                }
+            ],
+        }
+
+
+class StubGatewayServer(ThreadingHTTPServer):
+    """
+    Threaded HTTP server impersonating one gateway.
+    - gateway: "paystack" or "flutterwave".
+    - latency_ms / jitter_ms: Mean and standard deviation of the response delay.
+    - error_rate: Fraction of calls answered with HTTP 500.
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        gateway: str,
+        port: int = 0,
+        latency_ms: float = 50.0,
+        jitter_ms: float = 10.0,
+        error_rate: float = 0.0,
+        seed=None,
+    ):
+        super().__init__(("127.0.0.1", port), StubGatewayHandler)
+        self.gateway = gateway
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def simulate_latency(self):
+        with self._random_lock:
+            delay = self._random.gauss(self.latency_ms, self.jitter_ms)
+        if delay > 0:
+            time.sleep(delay / 1000)
+
+    def should_fail(self) -> bool:
+        with self._random_lock:
+            return self._random.random() < self.error_rate
+
+    def settings_environment(self) -> dict:
+        """
+        Environment variables pointing the app's gateway settings at this stub,
+        with the secrets the benchmarks sign their webhooks with.
+        """
+        if self.gateway == "paystack":
+            return {
+                "PAYSTACK_CHARGE_ENDPOINT": f"{self.base_url}/charge",
+                "PAYSTACK_VERIFICATION_URL": f"{self.base_url}/transaction/verify/{{transaction_ref}}",
+                "PAYSTACK_SECRET_KEY": STUB_PAYSTACK_SECRET_KEY,
+            }
+        return {
+            "FLUTTERWAVE_BANK_TRANSFER_ENDPOINT": f"{self.base_url}/v3/charges?type=bank_transfer",
+            "FLUTTERWAVE_VERIFICATION_URL": f"{self.base_url}/v3/charges?tx_ref={{transaction_ref}}",
+            "FLW_SECRET_HASH": STUB_FLUTTERWAVE_SECRET_HASH,
+        }
+
+    def start_in_background(self) -> threading.Thread:
+        thread = threading.Thread(
+            target=self.serve_forever, name=f"stub-{self.gateway}", daemon=True
+        )
+        thread.start()
+        return thread
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("gateway", choices=("paystack", "flutterwave"))
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = StubGatewayServer(
+        args.gateway, args.port, args.latency_ms, args.jitter_ms, args.error_rate
+    )
+    for name, value in server.settings_environment().items():
+        print(f"{name}={value}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
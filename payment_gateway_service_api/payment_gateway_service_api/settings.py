@@ -13,12 +13,7 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 from pathlib import Path
 from dotenv import load_dotenv
 import os
-import logging
-
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-)
+import tempfile
 
 load_dotenv()
 
@@ -33,7 +28,7 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = os.getenv("SECRET_KEY")
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = os.getenv("DEBUG", "True") == "True"
 
 # NGROK URL changes
 ALLOWED_HOSTS = [
@@ -46,18 +41,123 @@ ALLOWED_HOSTS = [
 FLUTTERWAVE_PUBLIC_KEY = os.getenv("FLW_PUBLIC_KEY")
 FLUTTERWAVE_SECRET_KEY = os.getenv("FLW_SECRET_KEY")
 FLUTTERWAVE_ENCRYPTION_KEY = os.getenv("FLW_ENCRYPTION_KEY")
+# Secret hash set on the FlutterWave dashboard, sent back in the verif-hash
+# header of every webhook. Webhooks are rejected while it is not set.
+FLUTTERWAVE_SECRET_HASH = os.getenv("FLW_SECRET_HASH")
 # FLUTTERWAVE ENDPOINTS
-FLUTTERWAVE_BANK_TRANSFER_ENDPOINT = (
-    "https://api.flutterwave.com/v3/charges?type=bank_transfer"
+# Gateway URLs can be overridden from the environment, e.g. to point them at the
+# stub gateways of the load test harness (see benchmarks/load_test.py).
+FLUTTERWAVE_BANK_TRANSFER_ENDPOINT = os.getenv(
+    "FLUTTERWAVE_BANK_TRANSFER_ENDPOINT",
+    "https://api.flutterwave.com/v3/charges?type=bank_transfer",
 )
 # FLUTTERWAVE VERIFICATION URL
-FLUTTERWAVE_VERIFICATION_URL = (
-    "https://api.flutterwave.com/v3/charges?tx_ref={transaction_ref}"
+FLUTTERWAVE_VERIFICATION_URL = os.getenv(
+    "FLUTTERWAVE_VERIFICATION_URL",
+    "https://api.flutterwave.com/v3/charges?tx_ref={transaction_ref}",
 )
 
 # PAYSTACK API
 PAYSTACK_PUBLIC_KEY = os.getenv("PAYSTACK_PUBLIC_KEY")
 PAYSTACK_SECRET_KEY = os.getenv("PAYSTACK_SECRET_KEY")
+# PAYSTACK ENDPOINTS
+PAYSTACK_CHARGE_ENDPOINT = os.getenv(
+    "PAYSTACK_CHARGE_ENDPOINT", "https://api.paystack.co/charge"
+)
+# PAYSTACK VERIFICATION URL
+PAYSTACK_VERIFICATION_URL = os.getenv(
+    "PAYSTACK_VERIFICATION_URL",
+    "https://api.paystack.co/transaction/verify/{transaction_ref}",
+)
+
+# PAYMENT GATEWAYS
+# Adapter class of each gateway_name stored on PaymentTransaction, imported by
+# each worker the first time the gateway is used. Adapters read their
+# credentials from the settings above when they are created.
+PAYMENT_GATEWAYS = {
+    "PayStack": "Apis.paystack_adapter.PayStackAdapter",
+    "FlutterWave": "Apis.flutterwave_adapter.FlutterWaveAdapter",
+}
+
+# GATEWAY SIMULATOR
+# Set GATEWAY_SIMULATOR_ENABLED=1 to replace every gateway by a
+# SimulatedGatewayAdapter with the profile below (per gateway, or "default").
+# Accepted payments are followed by a webhook to GATEWAY_SIMULATOR_WEBHOOK_URL,
+# signed like the real gateway, so the gateway secrets must be set.
+# Set GATEWAY_SIMULATOR_SEED for reproducible runs.
+GATEWAY_SIMULATOR_ENABLED = os.getenv("GATEWAY_SIMULATOR_ENABLED", "0") == "1"
+GATEWAY_SIMULATOR_WEBHOOK_URL = os.getenv(
+    "GATEWAY_SIMULATOR_WEBHOOK_URL", "http://localhost:8000/api/v1/webhook/"
+)
+GATEWAY_SIMULATOR_SEED = (
+    int(os.getenv("GATEWAY_SIMULATOR_SEED"))
+    if os.getenv("GATEWAY_SIMULATOR_SEED")
+    else None
+)
+GATEWAY_SIMULATOR_PROFILES = {
+    "default": {
+        "LATENCY": {"DISTRIBUTION": "lognormal", "MEDIAN_MS": 150, "SIGMA": 0.6},
+        "TIMEOUT_RATE": 0.005,
+        "ERROR_RATE": 0.01,
+        "DECLINE_RATE": 0.02,
+        "FAILED_PAYMENT_RATE": 0.05,
+        "WEBHOOK_DELAY_SECONDS": 2.0,
+        "SEED": GATEWAY_SIMULATOR_SEED,
+    },
+}
+
+# POOLED HTTP TRANSPORT FOR GATEWAY CALLS
+HTTP_POOL_CONNECTIONS = 10
+HTTP_POOL_MAXSIZE = 20
+
+# GATEWAY BULKHEADS
+# Each gateway gets its own concurrency limit and wait queue so a slow gateway
+# cannot tie up every worker thread.
+GATEWAY_BULKHEADS = {
+    "default": {"MAX_CONCURRENT": 10, "MAX_QUEUE": 10},
+    "FlutterWave": {"MAX_CONCURRENT": 10, "MAX_QUEUE": 10},
+    "PayStack": {"MAX_CONCURRENT": 10, "MAX_QUEUE": 10},
+}
+# Time budget for the gateway leg of a payment request
+GATEWAY_REQUEST_DEADLINE_SECONDS = 20
+
+# GATEWAY CALL POLICIES
+# Connect/read timeouts, retry backoff and the deadline budget of calls made
+# without a request deadline (e.g. verifications). Read timeouts adapt to
+# P99_MULTIPLIER x the observed p99, clamped to [MIN_READ_TIMEOUT, MAX_READ_TIMEOUT].
+GATEWAY_CALL_POLICIES = {
+    "default": {
+        "CONNECT_TIMEOUT": 3.05,
+        "READ_TIMEOUT": 10.0,
+        "MIN_READ_TIMEOUT": 2.0,
+        "MAX_READ_TIMEOUT": 30.0,
+        "P99_MULTIPLIER": 2.0,
+        "DEADLINE_BUDGET": 20.0,
+        "MAX_ATTEMPTS": 3,
+        "BACKOFF_BASE": 0.1,
+        "BACKOFF_CAP": 2.0,
+    },
+}
+
+# GATEWAY VERIFICATION CACHE
+VERIFICATION_CACHE_ALIAS = "default"
+# success/failed never change, pending may settle at any moment
+VERIFICATION_CACHE_TERMINAL_TTL_SECONDS = 24 * 60 * 60
+VERIFICATION_CACHE_PENDING_TTL_SECONDS = 15
+
+# PENDING TRANSACTION SWEEPER
+SWEEPER_BATCH_SIZE = 100
+# Only transactions pending for longer than this are verified
+SWEEPER_STALE_AFTER_SECONDS = 15 * 60
+# A claimed transaction is not claimed again before this has passed
+SWEEPER_REVERIFY_AFTER_SECONDS = 10 * 60
+SWEEPER_MAX_WORKERS = 8
+SWEEPER_INTERVAL_SECONDS = 60
+# Maximum verification calls per second for each gateway
+SWEEPER_GATEWAY_RATE_LIMITS = {
+    "FlutterWave": 10,
+    "PayStack": 10,
+}
 
 
 # Application definition
@@ -79,14 +179,29 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "Apis.middleware.RequestMetricsMiddleware",
+    "Apis.middleware.TracingMiddleware",
+    "Apis.middleware.ProfilingMiddleware",
     "django.middleware.security.SecurityMiddleware",
-    "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
+    "Apis.middleware.WebOnlyMiddleware",
+    "django.middleware.clickjacking.XFrameOptionsMiddleware",
+]
+
+# Server-to-server requests under API_PATH_PREFIXES skip WEB_ONLY_MIDDLEWARE,
+# which WebOnlyMiddleware runs for every other route (admin, browsable API).
+# Clickjacking protection stays in MIDDLEWARE: the schema's Swagger and Redoc
+# pages are HTML served under /api/.
+API_PATH_PREFIXES = ["/api/"]
+WEB_ONLY_MIDDLEWARE = [
+    "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
-    "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
+# The admin checks look for these middleware in MIDDLEWARE only; they run for
+# the admin through WEB_ONLY_MIDDLEWARE.
+SILENCED_SYSTEM_CHECKS = ["admin.E408", "admin.E409", "admin.E410"]
 
 ROOT_URLCONF = "payment_gateway_service_api.urls"
 
@@ -108,8 +223,17 @@ TEMPLATES = [
 
 WSGI_APPLICATION = "payment_gateway_service_api.wsgi.application"
 
+# Bodies are parsed and rendered with orjson when it is installed (see
+# Apis/json_codec.py). The browsable API is only rendered when DEBUG is on.
 REST_FRAMEWORK = {
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
+    "DEFAULT_PARSER_CLASSES": [
+        "Apis.json_codec.FastJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
+    "DEFAULT_RENDERER_CLASSES": ["Apis.json_codec.FastJSONRenderer"]
+    + (["rest_framework.renderers.BrowsableAPIRenderer"] if DEBUG else []),
 }
 
 SPECTACULAR_SETTINGS = {
@@ -119,13 +243,166 @@ SPECTACULAR_SETTINGS = {
     "SERVE_INCLUDE_SCHEMA": False,
 }
 
+# OPENAPI SCHEMA
+# /api/schema/ is generated once per code version and served from memory.
+# CODE_VERSION (e.g. the deployed commit) names the version; when unset, a
+# fingerprint of the content of the urls, views, serializers, models,
+# authentication and settings modules is used. `manage.py precompute_schema` writes
+# the schema to OPENAPI_SCHEMA_DIR ahead of time; otherwise the first worker to
+# serve it generates and writes it there.
+CODE_VERSION = os.getenv("CODE_VERSION")
+OPENAPI_SCHEMA_DIR = os.getenv("OPENAPI_SCHEMA_DIR", str(BASE_DIR / "schema_cache"))
+OPENAPI_SCHEMA_MAX_AGE_SECONDS = 24 * 60 * 60
+
+# MERCHANT API KEYS
+# Keys verified against the database are trusted by each process for
+# API_KEY_CACHE_TTL_SECONDS. Revoking, changing or deleting a key bumps a version
+# counter in the API_KEY_CACHE_ALIAS cache, which each process reads at most
+# every API_KEY_VERSION_CHECK_SECONDS to drop the keys it verified. With a cache
+# shared by the workers revocations apply within seconds; with the default
+# per-process cache, other workers pick them up when the TTL expires.
+API_KEY_CACHE_ALIAS = "default"
+API_KEY_CACHE_TTL_SECONDS = 30
+API_KEY_VERSION_CHECK_SECONDS = 2
+API_KEY_CACHE_MAX_ENTRIES = 10000
+
+# RATE LIMITING
+# Payment requests are admitted while the token buckets of their API key and of
+# their client's email have tokens: each refills at RATE per second up to
+# BURST. "shared_memory" keeps the buckets in a file mapped by every worker of
+# the host, "cache" keeps them in RATE_LIMIT_CACHE_ALIAS, for several hosts
+# sharing a cache such as Redis.
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "1") == "1"
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "shared_memory")
+RATE_LIMIT_SHARED_MEMORY_PATH = os.getenv(
+    "RATE_LIMIT_SHARED_MEMORY_PATH",
+    os.path.join(tempfile.gettempdir(), "payment-gateway-rate-limits"),
+)
+# Number of buckets the file holds; the least recently used ones are reused
+RATE_LIMIT_SHARED_MEMORY_SLOTS = 65536
+RATE_LIMIT_CACHE_ALIAS = "default"
+RATE_LIMITS = {
+    "api_key": {"RATE": 20.0, "BURST": 100},
+    "client": {"RATE": 0.5, "BURST": 10},
+}
+
+# PAYMENT PRE-CHECKS
+# Run in order before a transaction is created and the gateway called; any may
+# reject the payment. Set VELOCITY_CHECKS_ENABLED=0 to skip the velocity rules.
+PAYMENT_PRE_CHECKS = (
+    ["Apis.pre_checks_ports_and_adapters.VelocityPreCheckAdapter"]
+    if os.getenv("VELOCITY_CHECKS_ENABLED", "1") == "1"
+    else []
+)
+# Limits over sliding windows. Amounts are in the currency of the orders.
+VELOCITY_RULES = {
+    "payments_per_client": {"LIMIT": 10, "WINDOW_SECONDS": 60},
+    "amount_per_client": {"LIMIT": 5_000_000, "WINDOW_SECONDS": 60 * 60},
+    "clients_per_bank_token": {"LIMIT": 3, "WINDOW_SECONDS": 24 * 60 * 60},
+}
+# How often each worker saves its velocity counters, so that they survive
+# restarts (e.g. 30). 0, the default, never saves them.
+VELOCITY_PERSIST_INTERVAL_SECONDS = float(
+    os.getenv("VELOCITY_PERSIST_INTERVAL_SECONDS", "0")
+)
+
+# METRICS
+# Set METRICS_MULTIPROC_DIR to a directory shared by all Gunicorn workers to
+# have /metrics aggregate every worker. Each worker flushes its counters there
+# and folds them into metrics-aggregate.json when it exits; call
+# Apis.metrics.mark_process_dead from Gunicorn's child_exit hook to also fold
+# those of killed workers.
+METRICS_MULTIPROC_DIR = os.getenv("METRICS_MULTIPROC_DIR")
+METRICS_FLUSH_INTERVAL_SECONDS = 5
+
+# TRACING
+# Fraction of requests whose spans are recorded; 0 disables tracing. Requests
+# arriving with a sampled W3C traceparent header are always recorded when > 0.
+TRACING_SAMPLE_RATE = float(os.getenv("TRACING_SAMPLE_RATE", "0"))
+# "memory" keeps the latest TRACING_MAX_SPANS spans in process, "file" appends
+# them as JSON lines to TRACING_FILE_PATH.
+TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "memory")
+TRACING_FILE_PATH = os.getenv("TRACING_FILE_PATH", str(BASE_DIR / "spans.jsonl"))
+TRACING_MAX_SPANS = 10000
+
+# PROFILING
+# Requests are profiled when they carry a signed X-Profile header (generate one
+# with `manage.py inspect_profiles token`) or are picked by PROFILING_SAMPLE_RATE.
+PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", "0"))
+# "cprofile" (deterministic) or "sampler" (statistical, lower overhead)
+PROFILING_MODE = os.getenv("PROFILING_MODE", "cprofile")
+PROFILING_SAMPLER_INTERVAL_SECONDS = 0.005
+PROFILING_TOKEN_MAX_AGE_SECONDS = 3600
+PROFILING_DIR = os.getenv("PROFILING_DIR", str(BASE_DIR / "profiles"))
+PROFILING_MAX_PROFILES = 200
+PROFILING_TOP_FRAMES = 200
+
+# SLOW QUERIES
+# Queries taking at least this many milliseconds are kept, with their call site,
+# in a per-process ring buffer of SLOW_QUERY_LOG_SIZE entries (see /ops/slow-queries/).
+# Set SLOW_QUERY_THRESHOLD_MS to "none", or to an empty value, to disable the capture.
+SLOW_QUERY_THRESHOLD_MS = (
+    None
+    if os.getenv("SLOW_QUERY_THRESHOLD_MS", "100").strip().lower() in ("", "none")
+    else float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "100"))
+)
+SLOW_QUERY_LOG_SIZE = 500
+
+# LOGGING
+# Records are enqueued by the request threads and written, as JSON lines or as
+# text (LOG_FORMAT), by a background QueueListener. When LOG_QUEUE_SIZE records
+# are waiting, new ones are dropped and counted in log_records_dropped_total.
+# Payloads logged with Apis.structured_logging.log_payload are only written for
+# the fraction of calls set per route in LOG_PAYLOAD_SAMPLE_RATES, with the
+# values of LOG_REDACTED_KEYS replaced and truncated to LOG_PAYLOAD_MAX_CHARS.
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+LOG_QUEUE_SIZE = 10000
+LOG_PAYLOAD_MAX_CHARS = 2000
+LOG_PAYLOAD_SAMPLE_RATES = {
+    "default": float(os.getenv("LOG_PAYLOAD_SAMPLE_RATE", "0.01")),
+    "webhook": float(os.getenv("LOG_WEBHOOK_PAYLOAD_SAMPLE_RATE", "0.05")),
+}
+LOG_REDACTED_KEYS = {
+    "authorization",
+    "account_number",
+    "bvn",
+    "card",
+    "cvv",
+    "email",
+    "phone_number",
+    "pin",
+    "password",
+    "secret",
+    "token",
+}
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "queue": {
+            "()": "Apis.structured_logging.queue_handler",
+            "queue_size": LOG_QUEUE_SIZE,
+            "output_format": LOG_FORMAT,
+        },
+    },
+    "root": {"handlers": ["queue"], "level": LOG_LEVEL},
+}
+
+# MEMORY DIAGNOSTICS
+# Set TRACEMALLOC_ENABLED=1 to trace Python allocations from startup, keeping
+# TRACEMALLOC_FRAMES frames per allocation. /ops/memory/ then reports the
+# allocation sites that grew since startup (or since the last POST to it).
+TRACEMALLOC_ENABLED = os.getenv("TRACEMALLOC_ENABLED", "0") == "1"
+TRACEMALLOC_FRAMES = int(os.getenv("TRACEMALLOC_FRAMES", "10"))
+
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+        "NAME": os.getenv("SQLITE_PATH", BASE_DIR / "db.sqlite3"),
     }
 }
 
@@ -17,15 +17,12 @@ Including another URLconf
 
 from django.contrib import admin
 from django.urls import path, include
-from drf_spectacular.views import (
-    SpectacularAPIView,
-    SpectacularSwaggerView,
-    SpectacularRedocView,
-)
+from Apis.views import CachedSchemaView, metrics_view
+from drf_spectacular.views import SpectacularSwaggerView, SpectacularRedocView
 
 urlpatterns = [
     path("admin/", admin.site.urls),
-    path("api/schema/", SpectacularAPIView.as_view(), name="schema"),
+    path("api/schema/", CachedSchemaView.as_view(), name="schema"),
     path(
         "api/schema/swagger-ui/",
         SpectacularSwaggerView.as_view(url_name="schema"),
@@ -37,4 +34,6 @@ urlpatterns = [
         name="redoc",
     ),
     path("api/", include("Apis.urls")),
+    path("ops/", include("Apis.ops_urls")),
+    path("metrics", metrics_view, name="metrics"),
 ]